@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from attention_rules import analyze_csv, get_latest_csv
+from preferences import DEFAULT_PREFERENCES, PREFERENCES_FILE, compile_preferences, load_user_preferences
+
+'''
+Cache dos resultados da análise de atenção, compartilhado entre as execuções do dashboard.
+1.	Chave da análise: caminho, tamanho e data de modificação do CSV + hash do conteúdo do user_preferences.json
+	(analysis_key). Salvar preferências iguais não invalida o cache; qualquer mudança no CSV ou nas preferências, sim.
+2.	Cache LRU com um cálculo por chave em andamento (AnalysisCache): quem pede a mesma chave enquanto ela está
+	sendo calculada espera o resultado em vez de repetir a análise.
+3.	Análise do CSV mais recente pelo cache (cached_attention_data).
+Os DataFrames retornados são compartilhados entre sessões do navegador e não devem ser modificados.
+'''
+
+
+# 1. Chave da Análise
+def file_fingerprint(path):
+    """(caminho absoluto, tamanho, data de modificação em ns) do arquivo, ou None se ele não existir."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def read_preferences(preferences_file=PREFERENCES_FILE):
+    """
+    Lê o arquivo de preferências uma única vez e retorna (hash SHA-1 do conteúdo, preferências).
+    O hash e as preferências vêm dos mesmos bytes, então a chave nunca aponta para preferências diferentes das usadas.
+    """
+    if not os.path.exists(preferences_file):
+        load_user_preferences(preferences_file)  # Cria o arquivo com os valores padrão
+    try:
+        with open(preferences_file, "rb") as f:
+            content = f.read()
+    except OSError:
+        content = b""
+    try:
+        preferences = json.loads(content)
+    except ValueError:
+        print("Erro crítico ao carregar user_preferences.json. Usando configurações padrão.")
+        preferences = DEFAULT_PREFERENCES
+    return hashlib.sha1(content).hexdigest(), preferences
+
+
+def analysis_key(csv_path, preferences_digest, interval="30s"):
+    """Chave do resultado da análise de um CSV com as preferências de hash preferences_digest."""
+    fingerprint = file_fingerprint(csv_path)
+    if fingerprint is None:
+        return None
+    return fingerprint + (preferences_digest, interval)
+
+
+
+
+# 2. Cache LRU
+class AnalysisCache:
+    """
+    Guarda os resultados das últimas max_entries chaves, descartando a usada há mais tempo.
+    Cálculos de chaves diferentes rodam em paralelo; para a mesma chave, só um cálculo roda por vez.
+    Erros não são guardados: a próxima chamada tenta calcular de novo.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}  # Chave → trava do cálculo em andamento
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "waits": 0, "evictions": 0}
+
+    def get_or_compute(self, key, compute):
+        """Retorna o resultado guardado para a chave ou chama compute() (uma única vez por chave) e o guarda."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            key_lock = self._in_flight.get(key)
+            if key_lock is None:
+                key_lock = self._in_flight[key] = threading.Lock()
+            else:
+                self.stats["waits"] += 1
+
+        with key_lock:
+            # Outro visitante pode ter terminado o cálculo enquanto esperávamos a trava
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return self._entries[key]
+                self.stats["misses"] += 1
+            try:
+                result = compute()
+            except Exception:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                raise
+
+            with self._lock:
+                self._entries[key] = result
+                self._in_flight.pop(key, None)  # Só depois de guardar: quem chegar agora já encontra o resultado
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+            return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+
+
+# 3. Análise do CSV Mais Recente
+def cached_attention_data(cache, csv_path=None, preferences_file=PREFERENCES_FILE):
+    """
+    Mesmo resultado de process_attention_data, mas reaproveitando a análise enquanto o CSV e as preferências
+    não mudarem. csv_path: padrão, o CSV mais recente (get_latest_csv).
+    """
+    csv_path = csv_path if csv_path is not None else get_latest_csv()
+    if csv_path is None:
+        print("Nenhum arquivo CSV encontrado. Verifique se os dados estão sendo coletados.")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+    preferences_digest, preferences = read_preferences(preferences_file)
+    key = analysis_key(csv_path, preferences_digest)
+    if key is None:
+        print(f"Arquivo CSV não encontrado: {csv_path}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    try:
+        return cache.get_or_compute(key, lambda: analyze_csv(csv_path, compile_preferences(preferences)))
+    except Exception as e:
+        print(f" Erro ao processar os dados: {e}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
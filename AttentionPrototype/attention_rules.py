@@ -1,16 +1,23 @@
-import json
 import os
+import numpy as np
 import pandas as pd
 import time
 import glob
+from preferences import compile_preferences, get_preferences, load_user_preferences
+from profiling import debug_enabled, debug_print, stage
+from session_io import parse_v1_timestamps, read_session_csv
+from session_store import SessionStore
 
 ''' 
-1.	Função para carregar as preferências do usuário (load_user_preferences).
+1.	Função para carregar as preferências do usuário (load_user_preferences, get_preferences em preferences.py).
 2.	Função para verificar se a cabeça está alinhada com os monitores (is_head_position_valid).
 3.	Função para classificar o áudio do ambiente (classify_audio).
 4.	Função para classificar o estado de atenção (classify_state).
+	4.1 Versões colunares de classify_audio e classify_state para o DataFrame inteiro (classify_audio_vectorized, classify_state_vectorized).
 5.	Função para analisar a atenção em blocos de tempo (analyze_attention_in_blocks).
-6.	Monitoramento do CSV gerado em tempo real.
+	5.1 Agregação de todos os blocos em uma única passada (aggregate_blocks) e classificação dos blocos (classify_blocks).
+6.	Monitoramento do CSV gerado em tempo real (lendo apenas as linhas novas; ver stream_analyzer.py).
+7.	Processamento completo de uma sessão ou de um intervalo de tempo do armazenamento colunar (session_store.py).
 '''
 
 
@@ -28,35 +35,8 @@ def get_latest_csv():
         return None
 
 # 1. Carregar Preferências do Usuário
-def load_user_preferences():
-    """
-    Carrega as preferências do usuário a partir do JSON. 
-    Se o arquivo não existir, cria um com valores padrão.
-    """
-    preferences_file = "user_preferences.json"
-
-    # Se o arquivo não existir, cria um padrão
-    if not os.path.exists(preferences_file):
-        default_preferences = {
-            "Foco": ["Microsoft Excel", "GitHub Desktop"],
-            "Contexto": {
-                "UsandoFones": False,
-                "PreferenciaMusica": "Não afeta meu foco"
-            },
-            "Monitores": {"Monitor 1": "Frente"}
-        }
-        with open(preferences_file, "w", encoding="utf-8") as f:
-            json.dump(default_preferences, f, indent=4)
-        print("⚠️ Arquivo user_preferences.json não encontrado! Criando arquivo com configurações padrão.")
-
-    # Agora tenta carregar o arquivo
-    try:
-        with open(preferences_file, "r", encoding="utf-8") as f:
-            preferences = json.load(f)
-        return preferences
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("Erro crítico ao carregar user_preferences.json. Usando configurações padrão.")
-        return default_preferences
+# A leitura do JSON e o cache das preferências compiladas ficam em preferences.py.
+# load_user_preferences continua disponível por aqui para quem já importava deste módulo.
 
 
 
@@ -66,7 +46,7 @@ def is_head_position_valid(head_pose, monitor_preferences):
     Verifica se a posição da cabeça está alinhada com os monitores configurados.
     head_pose: string indicando a direção da cabeça (e.g., "Looking Left").
     OBS: "Looking Down" como uma posição válida para foco.
-    monitor_preferences: dict com a posição dos monitores.
+    monitor_preferences: dict com a posição dos monitores (ou o conjunto de posições já resolvido em CompiledPreferences).
     Retorna: True se a posição for válida, False caso contrário.
     """
     
@@ -87,7 +67,8 @@ def is_head_position_valid(head_pose, monitor_preferences):
     if head_pose == "No Face Detected":
         return False   
 
-    return any(head_position_map.get(head_pose, "") == position for position in monitor_preferences.values())
+    positions = monitor_preferences.values() if isinstance(monitor_preferences, dict) else monitor_preferences
+    return head_position_map.get(head_pose, "") in positions
 
 
 
@@ -100,12 +81,13 @@ def classify_audio(audio_group, active_window, audio_score, preferences):
     Classifica o impacto do áudio captado no estado de atenção.
     audio_group: Categoria do áudio (e.g., "Fala e Vozes", "Música").
     active_window: Software ativo no momento (e.g., "Zoom", "YouTube").
-    preferences: Configurações do usuário, incluindo fones e preferência musical.
+    preferences: Configurações do usuário, incluindo fones e preferência musical (dict ou CompiledPreferences).
     Retorna: "Foco", "Distração" ou "Neutro".
     """
 
-    usando_fones = preferences["Contexto"]["UsandoFones"]
-    preferencia_musica = preferences["Contexto"]["PreferenciaMusica"]
+    preferences = compile_preferences(preferences)
+    usando_fones = preferences.using_headphones
+    preferencia_musica = preferences.music_preference
 
     # Se o score for baixo (< 0.4), o áudio é considerado Neutro
     if audio_score < 0.4:
@@ -169,30 +151,28 @@ def classify_state(row, preferences):
     """
     Classifica o estado de atenção com base nos dados do momento.
     row: dict contendo os dados de coleta.
-    preferences: dict com as preferências do usuário.
+    preferences: preferências do usuário (dict ou CompiledPreferences).
     Retorna: estado de atenção (Atento, Distraído).
     """
     
+    preferences = compile_preferences(preferences)
+
     # Verificar janela ativa
     active_window = row.get("ActiveWindow", "")
     active_url = row.get("URL", "")  # Pode ser uma string vazia
-    focus_urls = preferences.get("FocoURLs", [])  # Lista de sites relevantes para foco
-    is_focus_software = active_window in preferences["Foco"] # Verifica se o software ativo está na lista de softwares de foco e retorna True ou False
+    is_focus_software = active_window in preferences.focus_apps # Verifica se o software ativo está na lista de softwares de foco e retorna True ou False
 
     # Se o Safari estiver ativo, considerar a URL para determinar se é um site de foco
     if active_window == "Safari":
-        if active_url:  
-            is_focus_software = any(domain in active_url for domain in focus_urls)  # Verifica se a URL contém algum domínio de foco
-        else:
-            is_focus_software = False  # Se não houver URL, assume-se que não é um site de foco
+        # Verifica se a URL contém algum domínio de foco (se não houver URL, assume-se que não é um site de foco)
+        is_focus_software = preferences.focus_urls.matches(active_url)
 
     # Adicionando o print para depuração:
     #print(f"Software ativo: {active_window}, URL ativa: {active_url}, É foco? {is_focus_software}")
 
     # Verificar direção da cabeça
     head_pose = row.get("HeadPose", "")
-    monitor_preferences = preferences.get("Monitores", {})
-    head_position_valid = is_head_position_valid(head_pose, monitor_preferences)
+    head_position_valid = is_head_position_valid(head_pose, preferences.monitor_positions)
 
     # Classificar impacto do áudio
     audio_group = row.get("AudioGroup", "Neutro") # Se a coluna AudioGroup estiver vazia ou não existir, ele retorna "Neutro" como valor padrão
@@ -219,6 +199,97 @@ def classify_state(row, preferences):
 
 
 
+# 4.1 Avaliação colunar (vetorizada) das regras de áudio e de atenção
+def _column(data, column, default):
+    """Retorna a coluna do DataFrame ou, se ela não existir, uma Series preenchida com o valor padrão (equivalente a row.get)."""
+    if column in data.columns:
+        return data[column]
+    return pd.Series(default, index=data.index)
+
+
+def _map_distinct(values, func, missing):
+    """
+    Avalia func uma única vez por valor distinto da coluna e propaga o resultado para todas as linhas.
+    values: Series (texto ou categórica).
+    func: função aplicada a cada valor distinto, retornando True ou False.
+    missing: resultado usado para valores ausentes (NaN).
+    Retorna: array booleano do NumPy com o resultado de cada linha.
+    """
+    codes, uniques = pd.factorize(values)
+    lookup = np.array([bool(func(value)) for value in uniques] + [missing], dtype=bool)
+    return lookup[codes]  # Códigos -1 (NaN) apontam para o último elemento (missing)
+
+
+def classify_audio_vectorized(data, preferences):
+    """
+    Versão colunar de classify_audio: classifica o impacto do áudio de todas as linhas de uma vez.
+    data: DataFrame com as colunas AudioGroup, ActiveWindow e AudioScore.
+    preferences: Configurações do usuário, incluindo fones e preferência musical (dict ou CompiledPreferences).
+    Retorna: Series com "Foco", "Distração" ou "Neutro" (mesmo resultado de classify_audio linha a linha).
+    """
+    preferences = compile_preferences(preferences)
+    usando_fones = preferences.using_headphones
+    preferencia_musica = preferences.music_preference
+
+    audio_group = _column(data, "AudioGroup", "Neutro")
+    active_window = _column(data, "ActiveWindow", "")
+    audio_score = pd.to_numeric(_column(data, "AudioScore", 0.0)).to_numpy(dtype=float)
+
+    # Máscaras booleanas equivalentes aos testes feitos em classify_audio
+    weak = audio_score < 0.4  # NaN não é "< 0.4", assim como na versão linha a linha
+    music = (audio_group == "Música").to_numpy(dtype=bool)
+    speech = (audio_group == "Fala e Vozes").to_numpy(dtype=bool)
+    meeting = active_window.isin(["zoom.us", "Meet", "Microsoft Teams"]).to_numpy(dtype=bool)
+    music_state = "Distração" if preferencia_musica == "Me distrai" else "Foco"
+
+    # A ordem das condições reproduz a ordem dos if/elif de classify_audio
+    if usando_fones:
+        conditions = [weak, music, speech & meeting, speech]
+        choices = ["Neutro", music_state, "Foco", "Distração"]
+    else:
+        noisy = audio_group.isin(["Ruídos Intrusivos", "Ruídos Mecânicos e Veiculares", "Outros Sons"]).to_numpy(dtype=bool)
+        conditions = [weak, speech & meeting, speech & (audio_score >= 0.85), speech, music, noisy & (audio_score >= 0.7)]
+        choices = ["Neutro", "Foco", "Distração", "Neutro", music_state, "Distração"]
+
+    return pd.Series(np.select(conditions, choices, default="Neutro"), index=data.index)
+
+
+def classify_state_vectorized(data, preferences):
+    """
+    Versão colunar de classify_state: calcula o estado de atenção de todas as linhas de uma vez,
+    usando máscaras booleanas e tabelas de consulta em vez de data.apply(..., axis=1).
+    data: DataFrame com os dados de coleta.
+    preferences: preferências do usuário (dict ou CompiledPreferences).
+    Retorna: Series com "Atento" ou "Distraído" (mesmo resultado de classify_state linha a linha).
+    """
+    preferences = compile_preferences(preferences)
+    active_window = _column(data, "ActiveWindow", "")
+    is_focus_software = active_window.isin(preferences.focus_apps).to_numpy(dtype=bool).copy()
+
+    # Se o Safari estiver ativo, a URL decide se é um site de foco (avaliada uma vez por URL distinta)
+    is_safari = (active_window == "Safari").to_numpy(dtype=bool)
+    if is_safari.any():
+        urls = _column(data, "URL", "")[is_safari]
+        is_focus_software[is_safari] = preferences.focus_urls.match_column(urls)
+
+    # Verificar direção da cabeça (avaliada uma vez por posição distinta)
+    monitor_positions = preferences.monitor_positions
+    head_position_valid = _map_distinct(
+        _column(data, "HeadPose", ""),
+        lambda head_pose: is_head_position_valid(head_pose, monitor_positions),
+        missing=is_head_position_valid("", monitor_positions),
+    )
+
+    # Classificar impacto do áudio
+    audio_state = classify_audio_vectorized(data, preferences).to_numpy()
+
+    # Mesmas regras de classify_state: só é "Atento" em software de foco, olhando para um local válido e sem áudio de distração
+    attentive = is_focus_software & head_position_valid & (audio_state != "Distração")
+    return pd.Series(np.where(attentive, "Atento", "Distraído"), index=data.index)
+
+
+
+
 #5. Função para contar trocas de software (indicativo de atenção alternada)
 def count_software_switches(data, focus_apps):
     """
@@ -235,6 +306,24 @@ def count_software_switches(data, focus_apps):
     return switches.sum()
 
 
+# Função para contar quantas linhas (amostras) cada software tem
+def count_software_rows(data, sort=True):
+    """
+    Conta quantas vezes cada software aparece, como data["ActiveWindow"].value_counts().
+    Em colunas categóricas, conta os códigos inteiros e só depois traduz para o nome do software
+    (categorias que não aparecem ficam de fora).
+    sort: ordena do mais usado para o menos usado; se False, mantém a ordem de primeira aparição.
+    """
+    active_window = data["ActiveWindow"]
+    if not isinstance(active_window.dtype, pd.CategoricalDtype):
+        return active_window.value_counts(sort=sort)
+
+    codes = active_window.cat.codes
+    counts = codes[codes >= 0].value_counts(sort=sort)
+    counts.index = pd.Index(active_window.cat.categories[counts.index].astype(object), name="ActiveWindow")
+    return counts
+
+
 # Função para calcular o tempo total de uso de cada software
 def calculate_software_usage(data, interval_seconds=5):
     """
@@ -242,7 +331,7 @@ def calculate_software_usage(data, interval_seconds=5):
     Cada linha equivale a um intervalo fixo de tempo (5 segundos).
     """
     # Conta quantas vezes cada software aparece
-    software_usage_counts = data["ActiveWindow"].value_counts()
+    software_usage_counts = count_software_rows(data)
 
     # Multiplica pelo tempo por entrada (5 segundos) e converte para minutos
     software_usage_time = (software_usage_counts * interval_seconds) / 60  
@@ -258,13 +347,14 @@ def calculate_software_usage(data, interval_seconds=5):
 switch_threshold=2: Limite de trocas de software para identificar atenção alternada 
 Neste caso, mais de 2 alternâncias de software em um bloco de tempo de 30 segundos considera atenção alternada
 '''
-def classify_block(row, software_switches, switch_threshold=3, previous_blocks=None):
+def classify_block(row, software_switches, switch_threshold=3, previous_blocks=None, preferences=None):
     """
     Classifica o tipo de atenção com base no estado do bloco.
     row: Uma linha do DataFrame agrupado por bloco.
     software_switches: Número de trocas de software no bloco (apenas softwares de foco).
     switch_threshold: Limite de trocas de software para identificar atenção alternada.
     previous_blocks: Lista dos últimos 3 blocos processados (para verificar atenção sustentada).
+    preferences: preferências do usuário já carregadas (se não informado, usa o cache de get_preferences).
     """
 
     # Definição inicial dos tipos de atenção
@@ -282,13 +372,13 @@ def classify_block(row, software_switches, switch_threshold=3, previous_blocks=N
         
         
     # 3. Atenção Seletiva → Se a pessoa estiver atenta, mas com som de distração (exceto reuniões e música que ajuda a focar)
-    user_preferences = load_user_preferences()
+    user_preferences = compile_preferences(preferences) if preferences is not None else get_preferences()
     if row["Atento (%)"] >= 60:
         # Se o som predominante for **Fala e Vozes** (mas não em reuniões)
         if row["Som Predominante"] == "Fala e Vozes" and row["Software Mais Usado"] not in ["zoom.us", "Meet", "Microsoft Teams"]:
             return "Atenção Seletiva"
         # Se o som predominante for **Música**, e o usuário configurou que "Me distrai"
-        if row["Som Predominante"] == "Música" and user_preferences["Contexto"]["PreferenciaMusica"] == "Me distrai":
+        if row["Som Predominante"] == "Música" and user_preferences.music_preference == "Me distrai":
             return "Atenção Seletiva"
         # Se o som predominante for **Ruídos Intrusivos** ou **Ruídos Mecânicos e Veiculares**, mas não for extremamente alto
         if row["Som Predominante"] in ["Ruídos Intrusivos", "Ruídos Mecânicos e Veiculares", "Outros Sons"]:
@@ -310,59 +400,183 @@ def classify_block(row, software_switches, switch_threshold=3, previous_blocks=N
 
 
 
-# 6. Analisar Atenção (em Blocos de Tempo)
-def analyze_attention_in_blocks(data, interval="30s", switch_threshold=3):
+# 5.1 Agregação dos blocos de tempo em uma única passada
+BLOCK_COLUMNS = [
+    "Atento (%)", "Distraído (%)", "Trocas de Software", "Software Mais Usado",
+    "Posição Cabeça Mais Comum", "Som Predominante", "Looking Down Count",
+]
+
+
+def _encode_sorted(values):
     """
-    Analisa os dados em blocos de tempo para calcular atenção.
-    Agora adiciona também o Tipo de Atenção (Atenção Alternada, Atenção Sustentada, etc.).
+    Converte uma coluna de texto (ou categórica) em códigos inteiros na ordem alfabética dos valores,
+    a mesma ordem que .mode() usa para desempatar. Valores ausentes recebem o código -1.
+    Retorna: (códigos, valores distintos ordenados).
     """
-    data["Timestamp"] = pd.to_datetime(data["Timestamp"])
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = np.asarray(values.cat.categories, dtype=object)
+        order = np.argsort(categories.astype(str), kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        codes = values.cat.codes.to_numpy(dtype=np.int64)
+        return np.where(codes >= 0, rank[np.maximum(codes, 0)], -1), categories[order]
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), np.asarray(uniques, dtype=object)
+
+
+def _block_mode(block, codes, uniques, n_blocks, default, mask=None):
+    """
+    Calcula o valor mais frequente (moda) de cada bloco a partir dos códigos inteiros.
+    Empates ficam com o menor código, isto é, o primeiro valor em ordem alfabética (como .mode()[0]).
+    Blocos sem nenhum valor recebem o valor padrão.
+    """
+    valid = codes >= 0
+    if mask is not None:
+        valid &= mask
+    n_values = max(len(uniques), 1)
+    counts = np.bincount(block[valid] * n_values + codes[valid], minlength=n_blocks * n_values)
+    counts = counts.reshape(n_blocks, n_values)
+    result = np.full(n_blocks, default, dtype=object)
+    has_values = counts.any(axis=1)
+    result[has_values] = uniques[counts[has_values].argmax(axis=1)]
+    return result
+
+
+def aggregate_blocks(data, interval="30s", focus_apps=(), start=None, end=None):
+    """
+    Agrega os dados em blocos de tempo em uma única passada agrupada sobre colunas codificadas como inteiros.
+    Substitui o resample(interval).apply(lambda → dict).apply(pd.Series) e produz as mesmas colunas:
+    percentuais de Atento/Distraído, trocas de software, software e posição da cabeça mais comuns,
+    som predominante e quantidade de olhadas para baixo.
+    data: DataFrame com Timestamp (coluna ou índice) e a coluna AttentionState já calculada.
+    interval: tamanho do bloco de tempo (ex.: "30s").
+    focus_apps: Lista de softwares que o usuário definiu como foco.
+    start: início do primeiro bloco (opcional). Por padrão, o bloco do primeiro registro, com origem à meia-noite do primeiro dia (como no resample).
+    end: fim (exclusivo) do último bloco (opcional). Por padrão, o fim do bloco do último registro.
+    Retorna: DataFrame indexado pelo início de cada bloco (blocos vazios incluídos, como no resample).
+    """
+    step = pd.Timedelta(interval)
+    timestamps = pd.DatetimeIndex(data.index if "Timestamp" not in data.columns else data["Timestamp"])
+    has_time = ~timestamps.isna()
+    if not has_time.all():
+        data, timestamps = data[has_time], timestamps[has_time]
+
+    if start is None:
+        if len(timestamps) == 0:
+            return pd.DataFrame(columns=BLOCK_COLUMNS, index=pd.DatetimeIndex([], name="Timestamp"))
+        # Índice do bloco de cada linha (mesma origem do resample: meia-noite do primeiro dia)
+        first_time = timestamps.min()
+        origin = first_time.normalize()
+        start = origin + ((first_time - origin) // step) * step
+    block = np.asarray((timestamps - start) // step, dtype=np.int64)
+    if end is not None:
+        n_blocks = int((end - start) // step)
+    elif len(block) > 0:
+        n_blocks = int(block.max()) + 1
+    else:
+        return pd.DataFrame(columns=BLOCK_COLUMNS, index=pd.DatetimeIndex([], name="Timestamp"))
+    inside = (block >= 0) & (block < n_blocks)
+    if not inside.all():
+        data, block = data[inside], block[inside]
+    samples = np.bincount(block, minlength=n_blocks)
+
+    # Percentuais de Atento/Distraído
+    state = data["AttentionState"].to_numpy()
+    looking_down = (data["HeadPose"] == "Olhando para Baixo").to_numpy(dtype=bool)
+    attentive = np.bincount(block, weights=(state == "Atento") & ~looking_down, minlength=n_blocks)
+    distracted = np.bincount(block, weights=state == "Distraído", minlength=n_blocks)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        attentive_pct = attentive / samples * 100
+        distracted_pct = distracted / samples * 100
+
+    # Trocas de software: início de cada sequência de um mesmo software de foco dentro do bloco
+    window_codes, window_values = _encode_sorted(data["ActiveWindow"])
+    order = np.argsort(block, kind="stable")  # Mantém a ordem original das linhas dentro de cada bloco
+    is_focus = data["ActiveWindow"].isin(focus_apps).to_numpy(dtype=bool)[order]
+    focus_block = block[order][is_focus]
+    focus_codes = window_codes[order][is_focus]
+    new_run = np.ones(len(focus_block), dtype=bool)
+    new_run[1:] = (focus_codes[1:] != focus_codes[:-1]) | (focus_block[1:] != focus_block[:-1])
+    switches = np.bincount(focus_block[new_run], minlength=n_blocks)
+
+    # Valores mais frequentes de cada bloco
+    head_codes, head_values = _encode_sorted(data["HeadPose"])
+    audio_codes, audio_values = _encode_sorted(data["AudioGroup"])
+    loud = (pd.to_numeric(data["AudioScore"]) >= 0.4).to_numpy(dtype=bool)
+    loud_count = np.bincount(block[loud], minlength=n_blocks)
+    predominant_sound = _block_mode(block, audio_codes, audio_values, n_blocks, "Irrelevante para Análise", mask=loud)
+    predominant_sound[loud_count <= 1] = "Irrelevante para Análise"  # Exigir pelo menos 2 ocorrências
+
+    return pd.DataFrame({
+        "Atento (%)": attentive_pct,
+        "Distraído (%)": distracted_pct,
+        "Trocas de Software": switches,
+        "Software Mais Usado": _block_mode(block, window_codes, window_values, n_blocks, "Desconhecido"),
+        "Posição Cabeça Mais Comum": _block_mode(block, head_codes, head_values, n_blocks, "Sem Detecção de Rosto"),
+        "Som Predominante": predominant_sound,
+        "Looking Down Count": np.bincount(block, weights=looking_down, minlength=n_blocks).astype(np.int64),
+    }, index=pd.date_range(start, periods=n_blocks, freq=step, name="Timestamp"))
+
+
+def classify_blocks(grouped, switch_threshold=3, previous_blocks=None, preferences=None):
+    """
+    Determina o Tipo de Atenção de cada bloco agregado, em ordem cronológica.
+    grouped: DataFrame gerado por aggregate_blocks.
+    switch_threshold: Limite de trocas de software para identificar atenção alternada.
+    previous_blocks: Lista dos últimos blocos já classificados (atualizada no lugar), para continuar uma análise anterior.
+    preferences: preferências do usuário (se não informado, usa o cache de get_preferences).
+    Retorna: Lista com o Tipo de Atenção de cada bloco.
+    """
+    if previous_blocks is None:
+        previous_blocks = []
+    if preferences is None:
+        preferences = get_preferences()
 
-    # Carregar preferências
-    preferences = load_user_preferences()
-    focus_apps = preferences["Foco"]
+    attention_types = []
+    for row in grouped[BLOCK_COLUMNS].to_dict("records"):
+        #print(f"Previous Blocks: {[b['Atento (%)'] for b in previous_blocks]}")
+        attention_type = classify_block(row, row["Trocas de Software"], switch_threshold, previous_blocks, preferences)
 
-    # Classificar estado de atenção
-    data["AttentionState"] = data.apply(lambda row: classify_state(row, preferences), axis=1)
+        # Se a pessoa olhou para baixo muitas vezes no bloco (3 ou mais), forçamos "Distração".
+        if row["Looking Down Count"] >= 3:
+            debug_print(f"DEBUG - Muitas olhadas para baixo detectadas ({row['Looking Down Count']}). Classificando como Distração.")
+            attention_type = "Distração"
 
-    # Lista para armazenar blocos anteriores
-    previous_blocks = []
+        attention_types.append(attention_type)
+        previous_blocks.append(row)  # Adiciona o bloco atual ao histórico
+        if len(previous_blocks) > 3:
+            previous_blocks.pop(0)  # Mantém apenas os últimos 3 blocos no histórico
 
-    # Agrupar os dados em blocos de tempo de 30 segundos
-    data.set_index("Timestamp", inplace=True)
-    grouped = data.resample(interval).apply(lambda x: {
-        #"Atento (%)": (x["AttentionState"] == "Atento").mean() * 100,
-        "Atento (%)": ((x["AttentionState"] == "Atento") & (x["HeadPose"] != "Olhando para Baixo")).mean() * 100,
-        "Distraído (%)": (x["AttentionState"] == "Distraído").mean() * 100,
-        "Trocas de Software": count_software_switches(x, focus_apps),
-        "Software Mais Usado": x["ActiveWindow"].mode()[0] if not x["ActiveWindow"].isna().all() else "Desconhecido",
-        "Posição Cabeça Mais Comum": x["HeadPose"].mode()[0] if not x["HeadPose"].isna().all() else "Sem Detecção de Rosto",
-        "Som Predominante": (
-            x.loc[x["AudioScore"] >= 0.4, "AudioGroup"].mode()[0]  
-            if len(x.loc[x["AudioScore"] >= 0.4, "AudioGroup"]) > 1  # Exigir pelo menos 2 ocorrências
-            else "Irrelevante para Análise"
-        ),
-        "Looking Down Count": (x["HeadPose"] == "Olhando para Baixo").sum()  # Conta quantas vezes olhou para baixo no bloco
-    }).apply(pd.Series)
+    return attention_types
 
-    
 
 
 
+# 6. Analisar Atenção (em Blocos de Tempo)
+def analyze_attention_in_blocks(data, interval="30s", switch_threshold=3, preferences=None):
+    """
+    Analisa os dados em blocos de tempo para calcular atenção.
+    Agora adiciona também o Tipo de Atenção (Atenção Alternada, Atenção Sustentada, etc.).
+    preferences: preferências do usuário já carregadas (se não informado, usa o cache de get_preferences).
+    """
+    # Timestamp ainda em texto (esquema v1): conversão vetorizada com o formato fixo, sem inferência de dia/mês
+    if not pd.api.types.is_datetime64_any_dtype(data["Timestamp"]):
+        data["Timestamp"] = parse_v1_timestamps(data["Timestamp"])
+
+    # Carregar preferências (o arquivo só é relido quando muda)
+    preferences = compile_preferences(preferences) if preferences is not None else get_preferences()
+    focus_apps = preferences.focus_apps
+
+    # Classificar estado de atenção (reaproveita a classificação se ela já foi feita em process_attention_data)
+    if "AttentionState" not in data.columns:
+        data["AttentionState"] = classify_state_vectorized(data, preferences)
+
+    # Agrupar os dados em blocos de tempo de 30 segundos (uma única passada sobre todas as linhas)
+    data.set_index("Timestamp", inplace=True)
+    grouped = aggregate_blocks(data, interval, focus_apps)
+
     # Chamar classify_block() para determinar o Tipo de Atenção
-    for index, row in grouped.iterrows():
-        #print(f"Previous Blocks: {[b['Atento (%)'] for b in previous_blocks]}")
-        attention_type = classify_block(row, row["Trocas de Software"], switch_threshold, previous_blocks)
-        
-        # Se a pessoa olhou para baixo muitas vezes no bloco (3 ou mais), forçamos "Distração".
-        if row["Looking Down Count"] >= 3:
-            print(f"DEBUG - Muitas olhadas para baixo detectadas ({row['Looking Down Count']}). Classificando como Distração.")
-            attention_type = "Distração"
-        
-        grouped.at[index, "Tipo de Atenção"] = attention_type
-        previous_blocks.append(row)  # Adiciona o bloco atual ao histórico
-        if len(previous_blocks) > 3:
-            previous_blocks.pop(0)  # Mantém apenas os últimos 3 blocos no histórico
+    grouped["Tipo de Atenção"] = classify_blocks(grouped, switch_threshold, preferences=preferences)
 
     return grouped
 
@@ -371,18 +585,18 @@ def analyze_attention_in_blocks(data, interval="30s", switch_threshold=3):
 
 # 7. Monitorar CSV em Tempo Real
 def monitor_csv_in_real_time(file_path, process_function, polling_interval=5):
-    last_processed_timestamp = None
+    """
+    Acompanha o CSV em tempo real e chama process_function apenas com as linhas novas.
+    Em vez de reler o arquivo inteiro a cada consulta, lê somente os bytes adicionados desde a última leitura.
+    """
+    from stream_analyzer import CsvTailReader  # Importação local para evitar importação circular
+
+    reader = CsvTailReader(file_path)
     while True:
         try:
-            data = pd.read_csv(file_path)
-            data["Timestamp"] = pd.to_datetime(data["Timestamp"], format="%H:%M:%S %d/%m/%Y")
-            if last_processed_timestamp:
-                new_data = data[data["Timestamp"] > last_processed_timestamp]
-            else:
-                new_data = data
+            new_data = reader.read_new_rows()
             if not new_data.empty:
                 process_function(new_data)
-                last_processed_timestamp = new_data["Timestamp"].max()
         except Exception as e:
             print(f"Erro ao monitorar o CSV: {e}")
         time.sleep(polling_interval)
@@ -420,61 +634,110 @@ def calculate_sound_impact(data, block_interval_seconds=30):
 
 
 # 8. Processar Dados de Atenção
-def process_attention_data():
+def analyze_session_data(data, preferences=None, interval="30s"):
     """
-    Processa os dados do CSV mais recente e retorna um DataFrame com os estados de atenção.
+    Executa a análise completa sobre dados já carregados: estados de atenção, blocos de tempo,
+    tempo de uso dos softwares e impacto do som.
+    data: DataFrame no formato de session_io.read_session_csv.
+    preferences: preferências do usuário (se não informado, usa o cache de get_preferences).
+    Retorna: os mesmos 3 DataFrames de process_attention_data.
     """
+    preferences = compile_preferences(preferences) if preferences is not None else get_preferences()
 
-    csv_path = get_latest_csv()  # Só tenta buscar um CSV aqui
-    
-    if csv_path is None:
-        print("Nenhum arquivo CSV encontrado. Verifique se os dados estão sendo coletados.")
-        return pd.DataFrame()  # Retorna um DataFrame vazio se não houver CSV
-    
+    # Classificar estado de atenção de todas as linhas (avaliação colunar)
+    with stage("classificação dos estados"):
+        data["AttentionState"] = classify_state_vectorized(data, preferences)
+
+    # Agrupar por blocos de tempo (30 segundos)
+    with stage("agregação em blocos"):
+        grouped = analyze_attention_in_blocks(data, interval=interval, preferences=preferences)
+
+    # Calcular tempo total dos softwares corretamente
+    with stage("uso dos softwares"):
+        software_usage_time = calculate_software_usage(data)
+
+    # Calcular impacto do som predominante na atenção/distração
+    with stage("impacto do som"):
+        sound_impact_data = calculate_sound_impact(grouped, block_interval_seconds=pd.Timedelta(interval).total_seconds())
+
+    return grouped, software_usage_time, sound_impact_data
+
+
+def process_attention_range(start=None, end=None, store=None, interval="30s"):
+    """
+    Processa as amostras entre start e end de todas as sessões do armazenamento colunar (session_store.py),
+    lendo apenas as linhas do intervalo em vez de reinterpretar os CSVs.
+    Retorna: os mesmos 3 DataFrames de process_attention_data.
+    """
+    store = store if store is not None else SessionStore()
     try:
-        print(f"Carregando dados de {csv_path}...")  # Log para depuração
-        data = pd.read_csv(csv_path)
+        data = store.read_range(start, end)
+        if data.empty:
+            print("Nenhuma amostra encontrada no intervalo solicitado.")
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return analyze_session_data(data, interval=interval)
+    except Exception as e:
+        print(f" Erro ao processar os dados: {e}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+
+def analyze_csv(csv_path, preferences=None):
+    """
+    Lê um CSV de sessão e executa a análise completa (sem tratar erros: quem chama decide o que fazer).
+    Retorna: os mesmos 3 DataFrames de process_attention_data.
+    """
+    preferences = compile_preferences(preferences) if preferences is not None else get_preferences()
 
-        # DEPURAÇÃO: Exibir as primeiras linhas do CSV carregado
+    debug_print(f"Carregando dados de {csv_path}...")  # Log para depuração
+    with stage("leitura do CSV"):
+        data = read_session_csv(csv_path, preferences)  # Colunas de texto como categóricas e AudioScore em float32
+
+    # DEPURAÇÃO (só com o perfilamento ativo): primeiras linhas, colunas, quantidade de registros e valores nulos
+    if debug_enabled():
         print("\n📊 Primeiras 5 linhas do CSV carregado:")
         print(data.head())
-
-        # DEPURAÇÃO: Mostrar as colunas disponíveis
         print("\n📝 Colunas disponíveis no DataFrame:")
         print(data.columns)
-
-        # DEPURAÇÃO: Contar registros e verificar colunas nulas
         print("\n📈 Quantidade de registros carregados:", len(data))
         print("\n🔍 Colunas com valores nulos:")
         print(data.isnull().sum())
 
+    # Estados de atenção, blocos de 30 segundos, uso dos softwares e impacto do som
+    grouped, software_usage_time, sound_impact_data = analyze_session_data(data, preferences)
 
-        data["Timestamp"] = pd.to_datetime(data["Timestamp"], format="%H:%M:%S %d/%m/%Y")
-        data["URL"] = data["URL"].fillna("Nenhuma URL") # Substituir valores vazios por um identificador padrão
-
-        # Carregar preferências do usuário
-        preferences = load_user_preferences()
-
-        # Classificar estado de atenção para cada linha
-        data["AttentionState"] = data.apply(lambda row: classify_state(row, preferences), axis=1)
-
-        # Agrupar por blocos de tempo (30 segundos)
-        grouped = analyze_attention_in_blocks(data, interval="30s")
-
-        # PRINT DOS RESULTADOS NO CONSOLE PARA TESTES
+    # DEPURAÇÃO: últimos blocos processados
+    if debug_enabled():
         print("\n Dados Processados:")
         print(grouped.tail(5))  # Mostra os últimos 5 registros no console
         print("\n")
 
-        #return grouped
-        # Calcular tempo total dos softwares corretamente
-        software_usage_time = calculate_software_usage(data)
+    return grouped, software_usage_time, sound_impact_data  # Retorna 3 DataFrames
 
-        # Calcular impacto do som predominante na atenção/distração
-        sound_impact_data = calculate_sound_impact(grouped)
 
-        return grouped, software_usage_time, sound_impact_data  # Retorna 3 DataFrames
+def process_attention_data(analyzer=None):
+    """
+    Processa os dados do CSV mais recente e retorna um DataFrame com os estados de atenção.
+    analyzer: StreamingAttentionAnalyzer opcional. Se informado, apenas as linhas novas do CSV são
+    processadas e os blocos já finalizados são reaproveitados, em vez de recalcular tudo.
+    """
+
+    if analyzer is not None:
+        try:
+            analyzer.poll()
+            return analyzer.results()
+        except Exception as e:
+            print(f" Erro ao processar os dados: {e}")
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
 
+    csv_path = get_latest_csv()  # Só tenta buscar um CSV aqui
+    
+    if csv_path is None:
+        print("Nenhum arquivo CSV encontrado. Verifique se os dados estão sendo coletados.")
+        return pd.DataFrame()  # Retorna um DataFrame vazio se não houver CSV
+    
+    try:
+        # Carregar preferências do usuário (compiladas e em cache; o arquivo só é relido quando muda)
+        return analyze_csv(csv_path, get_preferences())  # Retorna 3 DataFrames
     except Exception as e:
         print(f" Erro ao processar os dados: {e}")
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()  # Retorna DataFrames vazios em caso de erro
@@ -1,91 +1,209 @@
-# Mapeamento de classes para grupos funcionais
-class_to_group = {
-    # Fala e Vozes
-    "Speech": "Fala e Vozes", "Child speech, kid speaking": "Fala e Vozes",
-    "Conversation": "Fala e Vozes", "Narration, monologue": "Fala e Vozes",
-    "Babbling": "Fala e Vozes",
-    "Whoop": "Fala e Vozes",
-    "Whispering": "Fala e Vozes", "Laughter": "Fala e Vozes",
-    "Giggle": "Fala e Vozes", "Snicker": "Fala e Vozes",
-    "Belly laugh": "Fala e Vozes", "Chuckle, chortle": "Fala e Vozes",
-    "Crying, sobbing": "Fala e Vozes",
-    "Whimper": "Fala e Vozes", "Wail, moan": "Fala e Vozes",
-    "Choir": "Fala e Vozes", "Yodeling": "Fala e Vozes",
-    "Chant": "Fala e Vozes", "Mantra": "Fala e Vozes",
-    "Humming": "Fala e Vozes",
-    "Groan": "Fala e Vozes", "Grunt": "Fala e Vozes",
-    "Gasp": "Fala e Vozes", "Pant": "Fala e Vozes", "Snort": "Fala e Vozes",
-    "Cough": "Fala e Vozes", "Sneeze": "Fala e Vozes", "Hum": "Fala e Vozes",
-    
-    # Ruídos de Fundo Neutros
-    "Typing": "Ruídos de Fundo Neutros", "Computer keyboard": "Ruídos de Fundo Neutros",
-    "Rain": "Ruídos de Fundo Neutros", "Rustling leaves": "Ruídos de Fundo Neutros",
-    "Chirp": "Ruídos de Fundo Neutros", "Wind": "Ruídos de Fundo Neutros",
-    "Stream": "Ruídos de Fundo Neutros", "Waterfall": "Ruídos de Fundo Neutros",
-    "Background music": "Ruídos de Fundo Neutros", "Clicking": "Ruídos de Fundo Neutros", "Theme music": "Ruídos de Fundo Neutros",
-    "Chatter": "Ruídos de Fundo Neutros", "Hubbub, speech noise, speech babble": "Ruídos de Fundo Neutros",
-    "Children playing": "Ruídos de Fundo Neutros", "Bird song": "Ruídos de Fundo Neutros",
-    "Purr": "Ruídos de Fundo Neutros", "Meow": "Ruídos de Fundo Neutros",
-    "Rain on surface": "Ruídos de Fundo Neutros", "Ocean": "Ruídos de Fundo Neutros", 
-    "Tick": "Ruídos de Fundo Neutros", "Static": "Ruídos de Fundo Neutros", "Rustle": "Ruídos de Fundo Neutros",
-    "Creak": "Ruídos de Fundo Neutros", "Inside, small room": "Ruídos de Fundo Neutros",
-    "Writing": "Ruídos de Fundo Neutros",
-    
-    # Ruídos Intrusivos
-    "Yell": "Ruídos Intrusivos", "Bark": "Ruídos Intrusivos", "Crowd": "Ruídos Intrusivos",
-    "Scream": "Ruídos Intrusivos", "Siren": "Ruídos Intrusivos", "Car alarm": "Ruídos Intrusivos",
-    "Loud music": "Ruídos Intrusivos", "Explosion": "Ruídos Intrusivos",
-    "Thunderstorm": "Ruídos Intrusivos", "Train whistle": "Ruídos Intrusivos",
-    "Dog barking": "Ruídos Intrusivos", "Growling": "Ruídos Intrusivos",
-    "Police car (siren)": "Ruídos Intrusivos", "Ambulance (siren)": "Ruídos Intrusivos",
-    "Shout": "Ruídos Intrusivos", "Bellow": "Ruídos Intrusivos", "Yell": "Ruídos Intrusivos", 
-    "Children shouting": "Ruídos Intrusivos", "Screaming": "Ruídos Intrusivos",
-    "Telephone": "Ruídos Intrusivos", "Ringtone": "Ruídos Intrusivos",
-    "Explosion": "Ruídos Intrusivos", "Clap": "Ruídos Intrusivos", "Chime": "Ruídos Intrusivos",
-    "Whistle": "Ruídos Intrusivos", "Slap": "Ruídos Intrusivos", "Knock": "Ruídos Intrusivos", 
-    "Ping": "Ruídos Intrusivos", "Breaking": "Ruídos Intrusivos", "Jingle": "Ruídos Intrusivos",
-    "Bathtub (filling or washing)": "Ruídos Intrusivos", "Dishes, pots, and pans": "Ruídos Intrusivos",
-    
-    # Música
-    "Classical music": "Música", "Jazz": "Música", "Rock music": "Música",
-    "Guitar": "Música", "Choir": "Música", "Singing bowl": "Música",
-    "Electronic music": "Música", "Ambient music": "Música", "Pop music": "Música",
-    "Opera": "Música", "Flute": "Música", "Piano": "Música", "Violin, fiddle": "Música",
-    "Drum": "Música", "Snare drum": "Música", "Tambourine": "Música",
-    "Hip hop music": "Música", "Reggae": "Música", "Salsa music": "Música",
-    "Heavy metal": "Música", "Rhythm and blues": "Música", "Folk music": "Música", "Music": "Música",
-    "Singing": "Música", "Synthetic singing": "Música", "Rapping": "Música", "Whistling": "Música",
-    "Percussion": "Música",
-    
-    # Natureza e Ambiente
-    "Bird song": "Natureza e Ambiente", "Thunderstorm": "Natureza e Ambiente",
-    "Ocean": "Natureza e Ambiente", "Wind chime": "Natureza e Ambiente",
-    "Rustling leaves": "Natureza e Ambiente", "Raindrop": "Natureza e Ambiente",
-    "Stream": "Natureza e Ambiente", "Waves, surf": "Natureza e Ambiente",
-    "Animal calls": "Natureza e Ambiente", "Bird flight, flapping wings": "Natureza e Ambiente",
-    "Rumble": "Natureza e Ambiente", "Animal": "Natureza e Ambiente", "Bird": "Natureza e Ambiente",
-    "Bird vocalization, bird call, bird song": "Natureza e Ambiente",
-    
-    # Ruídos Mecânicos e Veiculares
-    "Engine": "Ruídos Mecânicos e Veiculares", "Train": "Ruídos Mecânicos e Veiculares",
-    "Helicopter": "Ruídos Mecânicos e Veiculares", "Drill": "Ruídos Mecânicos e Veiculares",
-    "Hammer": "Ruídos Mecânicos e Veiculares", "Vacuum cleaner": "Ruídos Mecânicos e Veiculares",
-    "Car": "Ruídos Mecânicos e Veiculares", "Bus": "Ruídos Mecânicos e Veiculares",
-    "Truck": "Ruídos Mecânicos e Veiculares", "Airplane": "Ruídos Mecânicos e Veiculares",
-    "Motorcycle": "Ruídos Mecânicos e Veiculares", "Vehicle": "Ruídos Mecânicos e Veiculares",
-    "Mechanical fan": "Ruídos Mecânicos e Veiculares",
-
-    # Ambiente Silencioso
-    "Silence": "Ambiente Silencioso", "Sigh": "Ambiente Silencioso", 
-    "Breathing": "Ambiente Silencioso", "Wheeze": "Ambiente Silencioso", "Throat clearing": "Ambiente Silencioso",
-    "Sniff": "Ambiente Silencioso", "White noise": "Ambiente Silencioso",
-    
-    # Outros Sons
-    "Sizzle": "Outros Sons",
-    "Distortion": "Outros Sons",
-    "Snoring": "Outros Sons", "Baby laughter": "Outros Sons", "Baby cry, infant cry": "Outros Sons",
+import os
+import zipfile
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+'''
+Grupos funcionais das classes de áudio do YAMNet.
+1.	Declaração dos grupos (AUDIO_GROUPS) e resolução explícita das classes listadas em mais de um grupo.
+2.	Mapeamento por nome (class_to_group, map_to_group), montado e verificado ao importar o módulo,
+	inclusive contra os rótulos embutidos no modelo (nomes fora da lista do YAMNet nunca seriam detectados).
+3.	Tabela compilada índice da classe no YAMNet (0-520) → id do grupo, para mapear colunas inteiras
+	e matrizes de scores com um único np.take (ClassGroupTable, get_class_group_table).
+'''
+
+
+UNCLASSIFIED = "Não Classificado"
+YAMNET_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "yamnet.tflite")
+
+
+# 1. Grupos Funcionais
+AUDIO_GROUPS = {
+    "Fala e Vozes": [
+        "Speech", "Child speech, kid speaking", "Conversation", "Narration, monologue", "Babbling", "Whoop",
+        "Whispering", "Laughter", "Giggle", "Snicker", "Belly laugh", "Chuckle, chortle", "Crying, sobbing",
+        "Whimper", "Wail, moan", "Choir", "Yodeling", "Chant", "Mantra", "Humming", "Groan", "Grunt", "Gasp",
+        "Pant", "Snort", "Cough", "Sneeze", "Hum",
+    ],
+    "Ruídos de Fundo Neutros": [
+        "Typing", "Computer keyboard", "Rain", "Rustling leaves", "Chirp, tweet", "Wind", "Stream", "Waterfall",
+        "Background music", "Clicking", "Theme music", "Chatter", "Hubbub, speech noise, speech babble",
+        "Children playing", "Purr", "Meow", "Rain on surface", "Ocean", "Tick", "Static",
+        "Rustle", "Creak", "Inside, small room", "Writing",
+    ],
+    "Ruídos Intrusivos": [
+        "Yell", "Bark", "Crowd", "Siren", "Car alarm", "Explosion", "Thunderstorm",
+        "Train whistle", "Bow-wow", "Growling", "Police car (siren)", "Ambulance (siren)", "Shout",
+        "Bellow", "Children shouting", "Screaming", "Telephone", "Ringtone", "Clapping", "Chime", "Whistle",
+        "Slap, smack", "Knock", "Ping", "Breaking", "Jingle, tinkle", "Bathtub (filling or washing)",
+        "Dishes, pots, and pans",
+    ],
+    "Música": [
+        "Classical music", "Jazz", "Rock music", "Guitar", "Choir", "Singing bowl", "Electronic music",
+        "Ambient music", "Pop music", "Opera", "Flute", "Piano", "Violin, fiddle", "Drum", "Snare drum",
+        "Tambourine", "Hip hop music", "Reggae", "Salsa music", "Heavy metal", "Rhythm and blues",
+        "Folk music", "Music", "Singing", "Synthetic singing", "Rapping", "Whistling", "Percussion",
+    ],
+    "Natureza e Ambiente": [
+        "Thunderstorm", "Ocean", "Wind chime", "Rustling leaves", "Raindrop", "Stream",
+        "Waves, surf", "Bird flight, flapping wings", "Rumble", "Animal", "Bird",
+        "Bird vocalization, bird call, bird song",
+    ],
+    "Ruídos Mecânicos e Veiculares": [
+        "Engine", "Train", "Helicopter", "Drill", "Hammer", "Vacuum cleaner", "Car", "Bus", "Truck",
+        "Fixed-wing aircraft, airplane", "Motorcycle", "Vehicle", "Mechanical fan",
+    ],
+    "Ambiente Silencioso": [
+        "Silence", "Sigh", "Breathing", "Wheeze", "Throat clearing", "Sniff", "White noise",
+    ],
+    "Outros Sons": [
+        "Sizzle", "Distortion", "Snoring", "Baby laughter", "Baby cry, infant cry",
+    ],
+}
+
+# Classes que aparecem em mais de um grupo: o grupo escolhido precisa estar declarado aqui
+# (os valores mantêm o resultado que o dicionário anterior produzia, onde a última ocorrência vencia)
+GROUP_CONFLICT_RESOLUTION = {
+    "Choir": "Música",
+    "Rustling leaves": "Natureza e Ambiente",
+    "Stream": "Natureza e Ambiente",
+    "Ocean": "Natureza e Ambiente",
+    "Thunderstorm": "Natureza e Ambiente",
 }
 
+
+# 2. Mapeamento por Nome
+def load_yamnet_labels(model_path=YAMNET_MODEL):
+    """Lê os nomes das 521 classes do YAMNet, na ordem dos índices, do arquivo de rótulos embutido no modelo."""
+    with zipfile.ZipFile(model_path) as model:
+        return model.read("yamnet_label_list.txt").decode("utf-8").splitlines()
+
+
+def build_class_to_group(groups, resolution, labels=None):
+    """
+    Monta o dicionário classe → grupo.
+    Lança ValueError se uma classe estiver em mais de um grupo sem resolução declarada, se a resolução
+    escolher um grupo onde a classe não está, se houver resolução para uma classe sem conflito ou, quando
+    labels (rótulos do YAMNet) for informado, se alguma classe não estiver entre os rótulos.
+    """
+    candidates = {}
+    for group, classes in groups.items():
+        for audio_class in classes:
+            candidates.setdefault(audio_class, [])
+            if group not in candidates[audio_class]:
+                candidates[audio_class].append(group)
+
+    mapping, errors = {}, []
+    for audio_class, class_groups in candidates.items():
+        if len(class_groups) == 1:
+            mapping[audio_class] = class_groups[0]
+        elif audio_class not in resolution:
+            errors.append(f"'{audio_class}' está em {class_groups} sem resolução declarada")
+        elif resolution[audio_class] not in class_groups:
+            errors.append(f"resolução de '{audio_class}' aponta para '{resolution[audio_class]}', fora de {class_groups}")
+        else:
+            mapping[audio_class] = resolution[audio_class]
+
+    for audio_class in resolution:
+        if len(candidates.get(audio_class, [])) < 2:
+            errors.append(f"resolução declarada para '{audio_class}', que não está em conflito")
+
+    if labels is not None:
+        known = set(labels)
+        unknown = [audio_class for audio_class in candidates if audio_class not in known]
+        if unknown:
+            errors.append(f"classes fora dos rótulos do YAMNet: {unknown}")
+
+    if errors:
+        raise ValueError("Mapeamento de grupos de áudio inválido: " + "; ".join(errors))
+    return mapping
+
+
+# Mapeamento de classes para grupos funcionais (verificado contra os rótulos quando o modelo está presente)
+class_to_group = build_class_to_group(
+    AUDIO_GROUPS, GROUP_CONFLICT_RESOLUTION,
+    load_yamnet_labels() if os.path.exists(YAMNET_MODEL) else None,
+)
+
 def map_to_group(audio_class):
     """Mapeia uma classe de áudio para seu grupo funcional."""
-    return class_to_group.get(audio_class, "Não Classificado")
\ No newline at end of file
+    return class_to_group.get(audio_class, UNCLASSIFIED)
+
+
+
+
+# 3. Tabela Compilada por Índice de Classe
+class ClassGroupTable:
+    """
+    Tabela índice da classe → id do grupo.
+    group_names[id] é o nome do grupo; o último id é "Não Classificado" (classes sem grupo ou desconhecidas).
+    """
+
+    def __init__(self, labels, mapping=None):
+        mapping = class_to_group if mapping is None else mapping
+        self.labels = list(labels)
+        self.group_names = sorted(set(mapping.values())) + [UNCLASSIFIED]
+        self.unclassified_id = len(self.group_names) - 1
+        group_ids = {group: group_id for group_id, group in enumerate(self.group_names)}
+        self.class_group_ids = np.array(
+            [group_ids[mapping.get(label, UNCLASSIFIED)] for label in self.labels], dtype=np.int16
+        )
+        self._label_ids = {label: index for index, label in enumerate(self.labels)}
+        self._mapping = mapping
+
+    def groups_of_indices(self, class_indices):
+        """Ids dos grupos de um array de índices de classe (um único np.take)."""
+        return self.class_group_ids.take(np.asarray(class_indices))
+
+    def top_groups(self, scores):
+        """Id do grupo da classe mais forte de cada linha de uma matriz de scores (janelas × 521 classes)."""
+        return self.class_group_ids.take(np.asarray(scores).argmax(axis=1))
+
+    def group_scores(self, scores, pooling="sum"):
+        """
+        Junta uma matriz de scores (janelas × 521 classes) por grupo.
+        pooling: "sum" (soma dos scores das classes do grupo) ou "max" (maior score entre as classes do grupo).
+        Retorna: matriz janelas × grupos, na ordem de group_names.
+        """
+        scores = np.asarray(scores, dtype=np.float32)
+        if pooling == "sum":
+            indicator = np.zeros((len(self.labels), len(self.group_names)), dtype=np.float32)
+            indicator[np.arange(len(self.labels)), self.class_group_ids] = 1
+            return scores @ indicator
+        if pooling == "max":
+            result = np.zeros((scores.shape[0], len(self.group_names)), dtype=np.float32)
+            np.maximum.at(result, (slice(None), self.class_group_ids), scores)
+            return result
+        raise ValueError('pooling must be "sum" or "max".')
+
+    def map_class_column(self, audio_class):
+        """
+        Recalcula a coluna AudioGroup a partir de uma coluna AudioClass (nomes de classe).
+        O grupo é calculado uma vez por classe distinta e propagado para as linhas com um np.take.
+        Retorna: Series categórica com o grupo de cada linha (valores ausentes viram "Não Classificado").
+        """
+        codes, uniques = pd.factorize(audio_class)
+        group_names = np.array(self.group_names, dtype=object)
+        lookup = np.array(
+            [self._group_id_of_name(value) for value in uniques] + [self.unclassified_id], dtype=np.int16
+        )
+        group_codes = lookup.take(codes)  # Códigos -1 (ausentes) apontam para o último elemento
+        index = audio_class.index if isinstance(audio_class, pd.Series) else None
+        return pd.Series(
+            pd.Categorical.from_codes(group_codes, categories=group_names), index=index, name="AudioGroup"
+        )
+
+    def _group_id_of_name(self, audio_class):
+        label_id = self._label_ids.get(audio_class)
+        if label_id is not None:
+            return int(self.class_group_ids[label_id])
+        # Classe fora da lista do YAMNet (ex.: dados antigos): usa o mapeamento por nome
+        group = self._mapping.get(audio_class, UNCLASSIFIED)
+        return self.group_names.index(group)
+
+
+@lru_cache(maxsize=1)
+def get_class_group_table(model_path=YAMNET_MODEL):
+    """Tabela compilada a partir dos rótulos do modelo, montada uma única vez."""
+    return ClassGroupTable(load_yamnet_labels(model_path))
@@ -1,23 +1,94 @@
 import argparse
+import os
 import time
+import wave
+import numpy as np
+import pandas as pd
 from mediapipe.tasks import python
 from mediapipe.tasks.python.audio.core import audio_record
 from mediapipe.tasks.python.components import containers
 from mediapipe.tasks.python import audio
-from threading import Event
+from threading import Event, Lock, Thread
+from audio_groups import get_class_group_table, map_to_group
+from metrics import NULL_METRICS
+
+
+DEFAULT_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "yamnet.tflite")
+MODEL_SAMPLE_RATE = 16000  # Taxa de amostragem esperada pelo YAMNet
+WINDOW_SAMPLES = 15600  # Tamanho da janela do YAMNet (0,975 s a 16 kHz)
+
+
+class AudioResultBuffer:
+    """
+    Buffer circular com os scores de cada janela classificada (uma linha por janela, uma coluna por classe).
+    Cada janela recebe um número de sequência crescente, usado para pedir "as janelas novas desde a última consulta".
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.class_names = {}  # Índice da classe no modelo → nome
+        self._scores = np.zeros((capacity, 0), dtype=np.float32)
+        self._timestamps = np.zeros(capacity, dtype=np.int64)
+        self._count = 0  # Total de janelas já gravadas (a sequência da última janela)
+        self._lock = Lock()
+
+    def add(self, result, timestamp_ms):
+        """Grava os scores de um AudioClassifierResult."""
+        categories = result.classifications[0].categories
+        with self._lock:
+            width = max((category.index for category in categories), default=-1) + 1
+            if width > self._scores.shape[1]:
+                grown = np.zeros((self.capacity, width), dtype=np.float32)
+                grown[:, :self._scores.shape[1]] = self._scores
+                self._scores = grown
+
+            row = self._count % self.capacity
+            self._scores[row] = 0
+            for category in categories:
+                self._scores[row, category.index] = category.score
+                self.class_names.setdefault(category.index, category.category_name)
+            self._timestamps[row] = timestamp_ms
+            self._count += 1
+
+    @property
+    def sequence(self):
+        return self._count
+
+    def since(self, sequence):
+        """
+        Janelas gravadas depois da sequência informada (no máximo as últimas `capacity`).
+        Retorna: (timestamps em ms, matriz de scores, sequência da última janela).
+        """
+        with self._lock:
+            first = max(sequence, self._count - self.capacity)
+            rows = np.arange(first, self._count) % self.capacity
+            return self._timestamps[rows].copy(), self._scores[rows].copy(), self._count
+
 
 class AudioService:
-    last_inference_time = None
-    interval_between_inference  = None
-    pause_time  = None
-    record  = None 
-    audio_data = None
-    classifier = None
     score_threshold = 0.5
     buffer_size = 15600
-    latest_result = None
-    result_ready = Event()
-    
+    history_windows = 256  # Janelas guardadas no buffer circular (~2 min com sobreposição de 0,5)
+
+    def __init__(self, metrics=None):
+        """metrics: CollectorMetrics que recebe a espera pelo áudio do microfone ("audio_wait") e a inferência ("audio_inference")."""
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.last_inference_time = None
+        self.interval_between_inference = None
+        self.pause_time = None
+        self.record = None
+        self.audio_data = None
+        self.classifier = None
+        self.latest_result = None
+        self.result_ready = Event()  # Por instância (antes era compartilhado entre todas as instâncias)
+        self.results = AudioResultBuffer(self.history_windows)
+        self._last_tick_sequence = 0
+        self._last_timestamp_ms = 0
+        self._stop_event = Event()
+        self._worker = None
+        self._submitted = {}  # timestamp_ms → instante do envio ao classificador, para medir a inferência
+        self.metrics.add_collector(lambda: {"audio_windows": self.results.sequence})
+
     def run(self, model: str, max_results: int, score_threshold: float, overlapping_factor: float) -> None:
         """Executa continuamente a inferência em dados de áudio adquiridos do dispositivo.
         Args:
@@ -38,7 +109,11 @@ class AudioService:
 
         # Função de callback para salvar os resultados no CSV
         def save_result(result: audio.AudioClassifierResult, timestamp_ms: int):
+            submitted = self._submitted.pop(timestamp_ms, None)
+            if submitted is not None:
+                self.metrics.observe("audio_inference", time.perf_counter() - submitted)
             self.latest_result = result,
+            self.results.add(result, timestamp_ms)
             self.result_ready.set()
 
 
@@ -77,13 +152,19 @@ class AudioService:
         self.audio_data = audio_data
         self.classifier = classifier
 
-    def startEngine(self):
+    def startEngine(self, model='yamnet.tflite', max_results=1, overlapping_factor=0.5, score_threshold=0.0, argv=None):
+        """
+        Inicia a classificação contínua do microfone.
+        Os argumentos podem vir da chamada ou da linha de comando (--model, --maxResults, ...); argumentos
+        de linha de comando de outros módulos (ex.: main.py) são ignorados em vez de interromper a execução.
+        argv: lista de argumentos a interpretar (padrão: sys.argv).
+        """
         parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
-        parser.add_argument('--model', help='Nome do modelo de classificação de áudio.', required=False, default='yamnet.tflite')
-        parser.add_argument('--maxResults', help='Número máximo de resultados a serem exibidos.', required=False, default=1)
-        parser.add_argument('--overlappingFactor', help='Fator de sobreposição entre inferências adjacentes. Valor entre (0, 1)', required=False, default=0.5)
-        parser.add_argument('--scoreThreshold', help='Limiar de pontuação dos resultados de classificação.', required=False, default=0.0)
-        args = parser.parse_args()
+        parser.add_argument('--model', help='Nome do modelo de classificação de áudio.', required=False, default=model)
+        parser.add_argument('--maxResults', help='Número máximo de resultados a serem exibidos.', required=False, default=max_results)
+        parser.add_argument('--overlappingFactor', help='Fator de sobreposição entre inferências adjacentes. Valor entre (0, 1)', required=False, default=overlapping_factor)
+        parser.add_argument('--scoreThreshold', help='Limiar de pontuação dos resultados de classificação.', required=False, default=score_threshold)
+        args, _ = parser.parse_known_args(argv)
 
         self.run(args.model, int(args.maxResults), float(args.scoreThreshold), float(args.overlappingFactor))
 
@@ -98,18 +179,201 @@ class AudioService:
             self.last_inference_time = now
 
             # Carrega e classifica os dados de áudio
-            data = self.record.read(self.buffer_size)
+            with self.metrics.time("audio_wait"):
+                data = self.record.read(self.buffer_size)
             self.audio_data.load_from_array(data)
             self.result_ready.clear()
-            print("laste_inference_time: ", self.last_inference_time)
-            print("interval_between_inference: ", self.interval_between_inference)
-            print("round: ", round(self.last_inference_time * 1000))
-            print("pause time: ", self.pause_time)
-            self.classifier.classify_async(self.audio_data, round(self.last_inference_time * 1000))
+            self._classify_async(round(self.last_inference_time * 1000))
         except KeyboardInterrupt:
             print("Processo interrompido pelo usuário.")
     
+    def _classify_async(self, timestamp_ms):
+        """Envia a janela ao classificador, guardando o instante do envio (o resultado chega em save_result)."""
+        if len(self._submitted) > 64:
+            self._submitted.clear()  # Resultados que nunca chegaram (ex.: descartados pelo classificador)
+        self._submitted[timestamp_ms] = time.perf_counter()
+        self.classifier.classify_async(self.audio_data, timestamp_ms)
+
     def stopRecording(self):
         self.record.stop_recording()
         print("Gravação de áudio encerrada.")
-    
\ No newline at end of file
+
+    # Classificação contínua em segundo plano
+    def start_continuous(self):
+        """
+        Classifica o microfone continuamente em uma thread própria, uma janela a cada interval_between_inference,
+        guardando os scores no buffer circular (ver aggregate_since_last_tick). Requer startEngine antes.
+        """
+        if self._worker is not None:
+            return
+        self._stop_event.clear()
+        self._worker = Thread(target=self._classification_loop, name="audio-classifier", daemon=True)
+        self._worker.start()
+
+    def _classification_loop(self):
+        next_inference = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                # O classificador exige timestamps estritamente crescentes
+                timestamp_ms = max(round(time.time() * 1000), self._last_timestamp_ms + 1)
+                self._last_timestamp_ms = timestamp_ms
+                self.last_inference_time = timestamp_ms / 1000
+                with self.metrics.time("audio_wait"):
+                    data = self.record.read(self.buffer_size)
+                self.audio_data.load_from_array(data)
+                self._classify_async(timestamp_ms)
+            except Exception as e:
+                print(f"Erro na classificação contínua do áudio: {e}")
+
+            # Agenda a próxima inferência pelo relógio (sem acumular atrasos); se atrasou, segue imediatamente
+            next_inference += self.interval_between_inference
+            delay = next_inference - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                next_inference = time.monotonic()
+
+    def aggregate_since_last_tick(self, pooling="mean"):
+        """
+        Junta (sem bloquear) todas as janelas classificadas desde a chamada anterior.
+        pooling: "mean" (média dos scores de cada classe) ou "max" (maior score de cada classe).
+        Retorna: dict com AudioClass, AudioScore e AudioGroup da classe mais forte, Windows (janelas usadas) e
+                 Distribution (as 5 classes mais fortes e seus scores), ou None se não houver janelas novas.
+        """
+        if pooling not in ("mean", "max"):
+            raise ValueError('pooling must be "mean" or "max".')
+        _, scores, sequence = self.results.since(self._last_tick_sequence)
+        self._last_tick_sequence = sequence
+        if len(scores) == 0:
+            return None
+
+        pooled = scores.mean(axis=0) if pooling == "mean" else scores.max(axis=0)
+        ranking = np.argsort(pooled)[::-1][:5]
+        audio_class = self.results.class_names.get(int(ranking[0]))
+        return {
+            "AudioClass": audio_class,
+            "AudioScore": float(pooled[ranking[0]]),
+            "AudioGroup": map_to_group(audio_class),
+            "Windows": len(scores),
+            "Distribution": {self.results.class_names.get(int(index)): float(pooled[index]) for index in ranking},
+        }
+
+    def stop(self):
+        """Para a classificação contínua, a gravação e o classificador."""
+        self._stop_event.set()
+        if self._worker is not None:
+            self._worker.join(timeout=2)
+            self._worker = None
+        if self.record is not None:
+            self.stopRecording()
+        if self.classifier is not None:
+            self.classifier.close()
+    
+
+
+
+# Classificação offline (arquivos WAV ou arrays NumPy)
+def load_wav(path):
+    """
+    Lê um arquivo WAV PCM (8, 16, 24 ou 32 bits) com a biblioteca padrão.
+    Retorna: (amostras mono em float32 entre -1 e 1, taxa de amostragem).
+    """
+    with wave.open(path, "rb") as wav_file:
+        sample_rate = wav_file.getframerate()
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        frames = wav_file.readframes(wav_file.getnframes())
+
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        values = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        values = np.where(values >= 1 << 23, values - (1 << 24), values)
+        samples = values.astype(np.float32) / (1 << 23)
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / (1 << 31)
+    else:
+        raise ValueError(f"Largura de amostra não suportada: {sample_width} bytes.")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)  # Mistura os canais em mono
+    return samples, sample_rate
+
+
+class OfflineAudioClassifier:
+    """
+    Classifica áudio gravado (arquivo WAV ou array NumPy) com o YAMNet em modo de clipes (AUDIO_CLIPS),
+    sem microfone. O áudio é dividido em janelas de 15600 amostras (a 16 kHz) com sobreposição configurável.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, max_results=1, score_threshold=0.0):
+        base_options = python.BaseOptions(model_asset_path=model)
+        options = audio.AudioClassifierOptions(
+            base_options=base_options,
+            running_mode=audio.RunningMode.AUDIO_CLIPS,
+            max_results=max_results,
+            score_threshold=score_threshold,
+        )
+        self.classifier = audio.AudioClassifier.create_from_options(options)
+
+    def _classify_clip(self, samples, sample_rate):
+        """Classifica um trecho formado por janelas inteiras e consecutivas; retorna (índice da classe, score) de cada janela."""
+        audio_data = containers.AudioData.create_from_array(samples.astype(np.float32), sample_rate)
+        windows = []
+        for result in self.classifier.classify(audio_data):
+            categories = result.classifications[0].categories
+            if categories:
+                windows.append((categories[0].index, categories[0].score))
+            else:
+                windows.append((-1, np.nan))  # Nenhuma classe acima do score_threshold
+        return windows
+
+    def classify(self, samples, sample_rate=MODEL_SAMPLE_RATE, overlapping_factor=0.5):
+        """
+        Classifica todas as janelas completas do áudio.
+        overlapping_factor: fração de sobreposição entre janelas vizinhas, em [0, 1).
+        Retorna: DataFrame com uma linha por janela: WindowStart (s), AudioClass, AudioScore e AudioGroup.
+        """
+        if not 0 <= overlapping_factor < 1:
+            raise ValueError('Overlapping factor must be between 0 (inclusive) and 1.')
+        samples = np.asarray(samples, dtype=np.float32)
+        window = int(round(WINDOW_SAMPLES * sample_rate / MODEL_SAMPLE_RATE))  # Janela na taxa do áudio de entrada
+        hop = max(1, int(round(window * (1 - overlapping_factor))))
+        starts = np.arange(0, len(samples) - window + 1, hop)
+
+        classes, scores = np.full(len(starts), -1, dtype=np.int16), np.full(len(starts), np.nan, dtype=np.float32)
+        if window % hop == 0:
+            # As janelas que começam em r, r + window, r + 2·window, ... formam um clipe contínuo:
+            # window / hop chamadas em modo de clipes cobrem todas as janelas
+            per_clip = window // hop
+            for offset in range(min(per_clip, len(starts))):
+                positions = np.arange(offset, len(starts), per_clip)
+                first = starts[offset]
+                clip = samples[first:first + len(positions) * window]
+                for position, (audio_class, score) in zip(positions, self._classify_clip(clip, sample_rate)):
+                    classes[position], scores[position] = audio_class, score
+        else:
+            for position, first in enumerate(starts):
+                (classes[position], scores[position]), = self._classify_clip(samples[first:first + window], sample_rate)
+
+        # Classe e grupo como categóricas a partir dos índices do modelo (grupo via tabela compilada, um np.take)
+        table = get_class_group_table()
+        classified = classes >= 0
+        group_ids = np.where(classified, table.groups_of_indices(np.where(classified, classes, 0)), -1)
+        return pd.DataFrame({
+            "WindowStart": starts / sample_rate,
+            "AudioClass": pd.Categorical.from_codes(classes, categories=table.labels),
+            "AudioScore": scores,
+            "AudioGroup": pd.Categorical.from_codes(group_ids, categories=table.group_names),
+        })
+
+    def classify_file(self, path, overlapping_factor=0.5):
+        """Classifica um arquivo WAV (ver classify)."""
+        samples, sample_rate = load_wav(path)
+        return self.classify(samples, sample_rate, overlapping_factor)
+
+    def close(self):
+        self.classifier.close()
@@ -0,0 +1,143 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from attention_rules import CSV_DIRECTORY, analyze_session_data, calculate_sound_impact
+from preferences import compile_preferences, get_preferences
+from session_io import read_session_csv
+
+'''
+Análise em lote de todas as sessões gravadas na pasta de dados.
+1.	Descoberta dos arquivos RawMultimodalData_*.csv (discover_session_files).
+2.	Análise completa de cada sessão em um pool de processos (analyze_all_sessions).
+3.	Junção dos resultados em tabelas por sessão e gerais.
+Uso: python batch_analysis.py --directory data --workers 4 --output resultados
+'''
+
+
+# 1. Descobrir as Sessões
+def discover_session_files(csv_directory=CSV_DIRECTORY):
+    """Retorna todos os arquivos de sessão da pasta (e subpastas), em ordem alfabética (= cronológica)."""
+    pattern = os.path.join(csv_directory, "**", "RawMultimodalData_*.csv")
+    return sorted(glob.glob(pattern, recursive=True))
+
+
+# 2. Analisar uma Sessão (executado em um processo do pool)
+def analyze_session_file(csv_path, preferences, interval="30s"):
+    """
+    Executa o pipeline completo (estados, blocos, uso dos softwares e impacto do som) para um arquivo.
+    preferences: dict com as preferências do usuário (enviado para o processo filho).
+    Retorna: (nome da sessão, resumo da sessão, blocos, tempo de uso dos softwares).
+    """
+    session = os.path.splitext(os.path.basename(csv_path))[0].replace("RawMultimodalData_", "")
+    preferences = compile_preferences(preferences)
+
+    data = read_session_csv(csv_path, preferences)
+    samples, start, end = len(data), data["Timestamp"].min(), data["Timestamp"].max()
+    grouped, software_usage_time, _ = analyze_session_data(data, preferences, interval)
+
+    block_seconds = pd.Timedelta(interval).total_seconds()
+    filled_blocks = grouped[grouped["Atento (%)"].notna()]  # Blocos vazios (sem amostras) ficam de fora das médias
+    summary = {
+        "Sessão": session,
+        "Amostras": samples,
+        "Início": start,
+        "Fim": end,
+        "Duração (min)": round(len(filled_blocks) * block_seconds / 60, 2),
+        "Atento (%)": filled_blocks["Atento (%)"].mean(),
+        "Distraído (%)": filled_blocks["Distraído (%)"].mean(),
+        "Trocas de Software": int(grouped["Trocas de Software"].sum()),
+    }
+    for attention_type, count in filled_blocks["Tipo de Atenção"].value_counts().items():
+        summary[f"Blocos - {attention_type}"] = int(count)
+
+    return session, summary, grouped, software_usage_time
+
+
+# 3. Analisar Todas as Sessões
+def analyze_all_sessions(csv_directory=CSV_DIRECTORY, max_workers=None, interval="30s", preferences=None):
+    """
+    Analisa todas as sessões da pasta em paralelo, uma sessão por processo.
+    max_workers: quantidade de processos (padrão: número de núcleos da máquina).
+    preferences: preferências a aplicar em todas as sessões (se não informado, usa get_preferences()).
+    Retorna: dict com as tabelas
+        "sessoes": resumo de cada sessão,
+        "geral": resumo de todas as sessões juntas,
+        "blocos": todos os blocos de tempo, com a coluna Sessão,
+        "softwares": tempo de uso (min) de cada software por sessão e no total,
+        "som": impacto do som predominante considerando todas as sessões.
+    """
+    preferences = compile_preferences(preferences) if preferences is not None else get_preferences()
+    csv_paths = discover_session_files(csv_directory)
+    if not csv_paths:
+        print(f"Nenhum arquivo de sessão encontrado em {csv_directory}.")
+        return {name: pd.DataFrame() for name in ("sessoes", "geral", "blocos", "softwares", "som")}
+
+    summaries, blocks, usage = [], [], {}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(analyze_session_file, path, preferences.raw, interval): path for path in csv_paths}
+        for future in as_completed(futures):
+            try:
+                session, summary, grouped, software_usage_time = future.result()
+            except Exception as e:
+                print(f"Erro ao analisar {futures[future]}: {e}")
+                continue
+            summaries.append(summary)
+            blocks.append(grouped.assign(Sessão=session))
+            usage[session] = software_usage_time
+
+    if not summaries:
+        return {name: pd.DataFrame() for name in ("sessoes", "geral", "blocos", "softwares", "som")}
+
+    session_summary = pd.DataFrame(summaries).sort_values("Sessão").set_index("Sessão")
+    block_type_columns = [column for column in session_summary.columns if column.startswith("Blocos - ")]
+    session_summary[block_type_columns] = session_summary[block_type_columns].fillna(0).astype(int)
+    all_blocks = pd.concat(blocks).sort_index()
+
+    software_usage = pd.DataFrame(usage).fillna(0.0)
+    software_usage = software_usage[sorted(software_usage.columns)]
+    software_usage["Total"] = software_usage.sum(axis=1)
+    software_usage = software_usage.sort_values("Total", ascending=False)
+
+    filled_blocks = all_blocks[all_blocks["Atento (%)"].notna()]
+    overall_summary = pd.DataFrame([{
+        "Sessões": len(session_summary),
+        "Amostras": int(session_summary["Amostras"].sum()),
+        "Duração (min)": round(session_summary["Duração (min)"].sum(), 2),
+        "Atento (%)": filled_blocks["Atento (%)"].mean(),
+        "Distraído (%)": filled_blocks["Distraído (%)"].mean(),
+        "Trocas de Software": int(session_summary["Trocas de Software"].sum()),
+    }])
+
+    return {
+        "sessoes": session_summary,
+        "geral": overall_summary,
+        "blocos": all_blocks,
+        "softwares": software_usage,
+        "som": calculate_sound_impact(all_blocks, block_interval_seconds=pd.Timedelta(interval).total_seconds()),
+    }
+
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reanalisa todas as sessões gravadas em paralelo.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--directory", default=CSV_DIRECTORY, help="Pasta com os arquivos RawMultimodalData_*.csv.")
+    parser.add_argument("--workers", type=int, default=None, help="Quantidade de processos (padrão: número de núcleos).")
+    parser.add_argument("--interval", default="30s", help="Tamanho dos blocos de tempo.")
+    parser.add_argument("--output", default=None, help="Pasta onde salvar as tabelas em CSV (opcional).")
+    args = parser.parse_args()
+
+    results = analyze_all_sessions(args.directory, args.workers, args.interval)
+    print(results["sessoes"].to_string())
+    print(results["geral"].to_string(index=False))
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        for name, table in results.items():
+            table.to_csv(os.path.join(args.output, f"{name}.csv"))
+        print(f"Tabelas salvas em {args.output}.")
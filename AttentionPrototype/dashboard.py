@@ -2,19 +2,61 @@ import datetime
 import json
 import streamlit as st
 from streamlit_option_menu import option_menu
-from attention_rules import process_attention_data  # processar dados de atenção
-from attention_rules import get_latest_csv
+from attention_rules import CSV_DIRECTORY, get_latest_csv
+from analysis_cache import AnalysisCache, cached_attention_data, read_preferences  # processar dados de atenção (com cache)
+from stream_analyzer import StreamingAttentionAnalyzer, StreamingSummary
+from preferences import save_user_preferences
+from session_io import read_session_csv
+from downsampling import downsample_frame
+from rollups import (
+    LEVEL_LABELS,
+    RollupStore,
+    choose_level,
+    rollup_attention_means,
+    rollup_blocks,
+    rollup_software_usage,
+    rollup_sound_impact,
+)
+from session_store import SessionStore
+from profiling import debug_print, profiled, profiling_enabled_by_env, profiling_session, stage
 import subprocess
 import os
 import signal
 import time
 import plotly.graph_objects as go
 import plotly.express as px
+import numpy as np
 import pandas as pd
 
 
 
 PID_FILE = "process.pid"  # Arquivo para salvar o PID do processo de coleta
+ANALYSIS_CACHE_ENTRIES = 8  # Análises (CSV + preferências) mantidas em memória
+TIMELINE_MAX_POINTS = 2000  # Acima disso, a linha do tempo é reduzida com o LTTB (downsampling.py)
+LIVE_REFRESH_SECONDS = 30  # Intervalo de atualização do modo ao vivo (duração de um bloco)
+
+attention_colors = {
+    "Atenção": "#66C2A5",  # Verde suave
+    "Atenção Alternada": "#8DA0CB",  # Azul lavanda
+    "Atenção Sustentada": "#228B22",  # Verde escuro, enfatiza o alto foco
+    "Atenção Seletiva": "#FFD92F",  # Amarelo claro (atenção com ruidos de fundo)
+    "Distração": "#eb5f53",  # avermelhado
+    "Neutro": "#B3B3B3"  # Cinza neutro
+}
+
+
+@st.cache_resource
+def get_analysis_cache():
+    """Cache das análises, único no servidor: compartilhado entre as execuções e as sessões do navegador."""
+    return AnalysisCache(max_entries=ANALYSIS_CACHE_ENTRIES)
+
+
+@st.cache_resource(max_entries=2)
+def get_rollup_store(preferences_digest, _preferences):
+    """Agregados do histórico (rollups.py) para um conteúdo das preferências, lidos do disco na primeira vez."""
+    rollups = RollupStore(preferences=_preferences, preferences_digest=preferences_digest)
+    rollups.load()
+    return rollups
 
 
 # Dicionário com categorias, softwares e descrições
@@ -115,8 +157,7 @@ def configure_preferences():
                 },
                 "FocoURLs": [url.strip() for url in focus_urls if url.strip()]
             }
-            with open("user_preferences.json", "w") as f:
-                json.dump(preferences, f, indent=4)
+            save_user_preferences(preferences)
             st.success("Preferências salvas com sucesso!")
 
 
@@ -160,8 +201,8 @@ def start_data_collection():
         st.success("Exemplo de dados carregado com sucesso!")
 
         try:
-            # Carregar os dados do CSV
-            data = pd.read_csv(csv_path)
+            # Carregar os dados do CSV (colunas de texto como categóricas)
+            data = read_session_csv(csv_path)
 
             # Verifica se há dados no CSV antes de exibir
             if data.empty:
@@ -185,9 +226,9 @@ def start_data_collection():
 # 3. Página de Análise dos Dados
 def analyze_data():
     st.title("Análise dos Dados Atencionais")
-    print("--------------------------------------------------------")
-    print("DATA", datetime.datetime.now())
-    print("--------------------------------------------------------")
+    debug_print("--------------------------------------------------------")
+    debug_print("DATA", datetime.datetime.now())
+    debug_print("--------------------------------------------------------")
 
     # Criar colunas para alinhar botão e última atualização
     col1, col2 = st.columns([1, 1.5])
@@ -201,6 +242,8 @@ def analyze_data():
         if st.button("Analisar Dados Recentes"):
             st.session_state["show_graph"] = True  # Define variável de estado
             st.session_state["last_update"] = datetime.datetime.now().strftime('%H:%M:%S %d/%m/%Y')
+        live_mode = st.toggle(f"Ao vivo (atualiza a cada {LIVE_REFRESH_SECONDS} s)", key="live_mode")
+        history_mode = st.toggle("Histórico de todas as sessões", key="history_mode", disabled=live_mode)
 
     # Mostrar a última atualização ao lado
     with col2:
@@ -217,101 +260,34 @@ def analyze_data():
                 unsafe_allow_html=True
             )
 
+    # Modo ao vivo: só o fragmento é reexecutado, acrescentando os blocos que fecharam desde a última atualização
+    if live_mode:
+        live_attention_view()
+        return
+
+    # Histórico: semanas ou meses lidos dos agregados pré-calculados, na resolução que cabe no intervalo
+    if history_mode:
+        history_attention_view()
+        return
+
     # Se o botão foi pressionado, exibir o gráfico
     if st.session_state.get("show_graph", False):
         # Criar um espaço para atualizar dinamicamente o gráfico
         graph_placeholder = st.empty()
 
-        # Obtém os dados processados do attention_rules.py
-        data, software_usage_time, sound_impact_data = process_attention_data()
-
-        # DEBUG: Exibir os últimos 10 registros processados
-        print("\n Dados antes de gerar o gráfico:")
-        print(data.tail(10))  # Últimos 10 registros para análise
-        print("\n ------  DADOS COMPLETOS - ANTES DE GERAR O GRAFICO:  --------")
-        print(data.to_string())  # Exibir todos os registros sem truncamento
+        # Obtém os dados processados do attention_rules.py (recalculados só quando o CSV ou as preferências mudam)
+        with stage("análise (process_attention_data, com cache)"):
+            data, software_usage_time, sound_impact_data = cached_attention_data(get_analysis_cache())
 
         if not data.empty:
             # Limpar gráfico anterior antes de renderizar o novo
             graph_placeholder.empty()
 
-            # Preparar os dados para o gráfico
-            timestamps = data.index
-            attention_levels = data["Atento (%)"]
-            attention_types = data["Tipo de Atenção"]
-
-            attention_colors = {
-                "Atenção": "#66C2A5",  # Verde suave
-                "Atenção Alternada": "#8DA0CB",  # Azul lavanda
-                "Atenção Sustentada": "#228B22",  # Verde escuro, enfatiza o alto foco
-                "Atenção Seletiva": "#FFD92F",  # Amarelo claro (atenção com ruidos de fundo)
-                "Distração": "#eb5f53",  # avermelhado
-                "Neutro": "#B3B3B3"  # Cinza neutro
-            }
+            # Intervalo exibido: em sessões longas, o usuário escolhe o trecho e o gráfico mostra mais detalhes nele
+            visible = select_timeline_range(data)
 
-
-            # Criar gráfico interativo com Plotly
-            fig = go.Figure()
-
-            # Adicionar linha principal do gráfico
-            fig.add_trace(go.Scatter(
-                x=timestamps,
-                y=attention_levels,
-                mode="lines+markers",
-                marker=dict(size=8, color="black", opacity=0.6),
-                line=dict(width=2, color="black"),
-                name="Nível de Atenção",
-                hoverinfo="skip"  # Isso remove o tooltip padrão da linha
-            ))
-
-            # Adicionar pontos coloridos e tooltips detalhados
-            for i, timestamp in enumerate(timestamps):
-                tipo_atencao = attention_types.iloc[i]
-                cor = attention_colors.get(tipo_atencao, "gray")
-
-                # Determinar corretamente o Estado de Atenção
-                porcentagem_atencao = data.iloc[i]["Atento (%)"]
-                porcentagem_distracao = data.iloc[i]["Distraído (%)"]
-
-                if porcentagem_atencao > porcentagem_distracao:
-                    estado = f"Atento ({porcentagem_atencao:.1f}%)"
-                else:
-                    estado = f"Distraído ({porcentagem_distracao:.1f}%)"
-
-                # DEBUG: Exibir informações antes de plotar
-                print(f"Plotando ponto -> Timestamp: {timestamp}, Atento (%): {porcentagem_atencao}, Tipo: {tipo_atencao}")
-
-                # Criar tooltip com detalhes do bloco de tempo
-                detalhes = (
-                    f"⏰ {timestamp.strftime('%H:%M:%S')}<br>"
-                    f"🎯 Estado: {estado}<br>"
-                    f"💻 Software Mais Usado: {data.iloc[i]['Software Mais Usado']}<br>"
-                    f"👀 Posição Mais Frequente: {data.iloc[i]['Posição Cabeça Mais Comum']}<br>"
-                    f"🔊 Som Predominante: {data.iloc[i]['Som Predominante']}<br>"
-                    f"🏷️ Tipo de Atenção: {tipo_atencao}"
-                )
-
-                # Adicionar ponto ao gráfico com tooltip
-                fig.add_trace(go.Scatter(
-                    x=[timestamp],
-                    y=[porcentagem_atencao],
-                    mode="markers",
-                    marker=dict(size=10, color=cor, line=dict(color="black", width=1)),
-                    name=tipo_atencao,
-                    text=detalhes,
-                    hoverinfo="text",
-                    showlegend=False  # Evita que as legendas se repitam
-                ))
-
-            # Configurar layout do gráfico
-            fig.update_layout(
-                title="Evolução da Atenção ao Longo do Tempo (Atualizado a cada 30 segundos)", #atualização a cada 30s
-                xaxis_title="Tempo",
-                yaxis_title="Estado de Atenção (%)",
-                yaxis=dict(range=[0, 105]),  # Pequena margem extra para evitar corte no 100%
-                hovermode="closest",
-                template="plotly_white"
-            )
+            # Criar gráfico interativo com Plotly (um único traço WebGL, reduzido quando há pontos demais)
+            fig = plot_attention_timeline(visible)
 
             # EXPLICAÇÃO DOS TIPOS DE ATENÇÃO EM UMA DIV ABAIXO DO GRÁFICO**
             st.markdown(
@@ -355,19 +331,255 @@ def analyze_data():
         else:
             st.warning("Ainda não há dados processados para análise.")
 
-        # Atualiza automaticamente a página a cada 30 segundos
-        #now = datetime.datetime.now()
-        #seconds = now.second
 
-        # Espera até o próximo ciclo de 00 ou 30 segundos
-        #sleep_time = 30 - seconds if seconds < 30 else 60 - seconds
-        #time.sleep(sleep_time)
-        #st.rerun()
+
+
+# Modo ao vivo da análise
+def get_live_analysis(csv_path):
+    """
+    Estado do modo ao vivo guardado na sessão do navegador: analisador incremental do CSV, totais dos blocos
+    finalizados e a figura da linha do tempo. É recriado se o CSV ou o conteúdo das preferências mudar.
+    """
+    preferences_digest, preferences = read_preferences()
+    key = (csv_path, preferences_digest)
+    live = st.session_state.get("live_analysis")
+    if live is None or live["key"] != key:
+        analyzer = StreamingAttentionAnalyzer(csv_path, preferences=preferences)
+        summary = StreamingSummary()
+        analyzer.subscribe(summary.add_blocks)
+        live = {"key": key, "analyzer": analyzer, "summary": summary, "figure": None, "points": 0, "since_rebuild": 0}
+        st.session_state["live_analysis"] = live
+    return live
+
+
+def extend_attention_timeline(live, new_blocks, max_points=TIMELINE_MAX_POINTS):
+    """
+    Acrescenta os blocos novos ao traço da figura do modo ao vivo, sem refazer os pontos anteriores.
+    Depois de max_points pontos, a figura é refeita com o LTTB a cada max_points // 10 blocos novos
+    (custo amortizado: a figura não cresce sem limite e não é refeita a cada atualização).
+    """
+    fig = live["figure"]
+    if fig is None or (live["points"] + len(new_blocks) > max_points and live["since_rebuild"] + len(new_blocks) >= max_points // 10):
+        blocks = live["analyzer"].blocks(include_open=False)
+        live["figure"] = plot_attention_timeline(blocks, max_points)
+        live["points"] = len(blocks)
+        live["since_rebuild"] = 0
+        return live["figure"]
+    if new_blocks.empty:
+        return fig
+
+    x, y, colors, customdata = timeline_arrays(new_blocks)
+    trace = fig.data[0]
+    trace.update(
+        x=np.concatenate([np.asarray(trace.x), x]),
+        y=np.concatenate([np.asarray(trace.y), y]),
+        customdata=np.concatenate([np.asarray(trace.customdata, dtype=object).reshape(-1, customdata.shape[1]), customdata]),
+        marker_color=np.concatenate([np.asarray(trace.marker.color, dtype=object), colors]),
+    )
+    live["points"] += len(new_blocks)
+    live["since_rebuild"] += len(new_blocks)
+    return fig
+
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_attention_view():
+    """
+    Reexecutado sozinho a cada LIVE_REFRESH_SECONDS: lê apenas as linhas novas do CSV, acrescenta os blocos
+    que fecharam à linha do tempo e atualiza os resumos a partir dos totais acumulados.
+    """
+    csv_path = get_latest_csv()
+    if csv_path is None:
+        st.warning("Nenhum arquivo CSV encontrado. Verifique se os dados estão sendo coletados.")
+        return
+
+    live = get_live_analysis(csv_path)
+    try:
+        with stage("modo ao vivo: blocos novos"):
+            new_blocks = live["analyzer"].poll()
+    except Exception as e:
+        st.error(f"Erro ao processar os dados: {e}")
+        return
+    fig = extend_attention_timeline(live, new_blocks)
+    summary = live["summary"]
+
+    st.caption(f"🔴 Ao vivo: {summary.blocks} blocos analisados. Última atualização: {datetime.datetime.now().strftime('%H:%M:%S')}")
+    if summary.blocks == 0:
+        st.info("Aguardando o primeiro bloco de 30 segundos ser concluído.")
+        return
+    st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2 = st.columns([1.7, 1])
+    with col1:
+        software_usage_time = live["analyzer"].software_usage_time()
+        if not software_usage_time.empty:
+            st.plotly_chart(plot_most_used_software(software_usage_time), use_container_width=True)
+    with col2:
+        fig_pie = plot_attention_pie_chart(summary.attention_means())
+        if fig_pie:
+            st.plotly_chart(fig_pie, use_container_width=True)
+
+    fig_sound = plot_sound_impact_chart(summary.sound_impact())
+    if fig_sound:
+        st.plotly_chart(fig_sound, use_container_width=True)
+
+
+
+
+# Histórico de todas as sessões
+def history_attention_view():
+    """
+    Linha do tempo e resumos de todas as sessões a partir dos agregados de rollups.py: cada execução só agrega
+    as sessões novas (ou o final das que cresceram), e o intervalo escolhido é lido na resolução mais detalhada
+    que cabe em TIMELINE_MAX_POINTS pontos (30 s, 5 min, 1 h ou 1 dia).
+    """
+    preferences_digest, preferences = read_preferences()
+    rollups = get_rollup_store(preferences_digest, preferences)
+    try:
+        with stage("histórico: sessões novas"):
+            session_store = SessionStore()
+            session_store.convert_directory(CSV_DIRECTORY, preferences)
+            rollups.update_from_store(session_store)
+    except Exception as e:
+        st.error(f"Erro ao atualizar o histórico: {e}")
+        return
+
+    time_range = rollups.time_range()
+    if time_range is None:
+        st.warning("Ainda não há sessões para o histórico.")
+        return
+    first, last = time_range[0].to_pydatetime(), time_range[1].to_pydatetime()
+    if last - first > datetime.timedelta(minutes=5):
+        start, end = st.slider(
+            "Intervalo exibido no histórico:",
+            min_value=first,
+            max_value=last,
+            value=(first, last),
+            step=datetime.timedelta(minutes=5),
+            format="DD/MM/YY HH:mm",
+        )
+    else:
+        start, end = first, last
+
+    level = choose_level(start, end, TIMELINE_MAX_POINTS)
+    with stage(f"histórico: leitura ({level})"):
+        frame = rollups.frame(level, start, end)
+        blocks = rollup_blocks(frame)
+    st.caption(f"📚 {len(blocks)} pontos de {LEVEL_LABELS[level]} entre {start:%d/%m/%Y %H:%M} e {end:%d/%m/%Y %H:%M}.")
+
+    fig = plot_attention_timeline(blocks)
+    fig.update_layout(title=f"Evolução da Atenção no Histórico (um ponto a cada {LEVEL_LABELS[level]})")
+    st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2 = st.columns([1.7, 1])
+    with col1:
+        software_usage_time = rollup_software_usage(frame)
+        if not software_usage_time.empty:
+            st.plotly_chart(plot_most_used_software(software_usage_time), use_container_width=True)
+    with col2:
+        fig_pie = plot_attention_pie_chart(rollup_attention_means(frame))
+        if fig_pie:
+            st.plotly_chart(fig_pie, use_container_width=True)
+
+    fig_sound = plot_sound_impact_chart(rollup_sound_impact(frame))
+    if fig_sound:
+        st.plotly_chart(fig_sound, use_container_width=True)
+
+
+
+
+# Gráfico da evolução da atenção ao longo do tempo
+def select_timeline_range(data, max_points=TIMELINE_MAX_POINTS):
+    """
+    Quando a sessão tem mais blocos do que o gráfico mostra em detalhe, exibe um seletor de intervalo
+    e retorna apenas os blocos do trecho escolhido (com todos os detalhes se couberem em max_points).
+    """
+    if len(data) <= max_points:
+        return data
+    first, last = data.index[0].to_pydatetime(), data.index[-1].to_pydatetime()
+    start, end = st.slider(
+        "Intervalo exibido na linha do tempo:",
+        min_value=first,
+        max_value=last,
+        value=(first, last),
+        step=datetime.timedelta(seconds=30),
+        format="DD/MM HH:mm",
+    )
+    return data.loc[start:end]
+
+
+@profiled("gráfico: linha do tempo da atenção")
+def plot_attention_timeline(data, max_points=TIMELINE_MAX_POINTS):
+    """
+    Gera a linha do tempo da atenção como um único traço WebGL (Scattergl): as cores dos pontos vêm de um array
+    e o tooltip de customdata, sem um traço por bloco. Com mais de max_points blocos, mantém os pontos
+    escolhidos pelo LTTB (preserva picos e vales); escolher um intervalo menor mostra todos os blocos dele.
+    """
+    total_blocks = len(data)
+    data = downsample_frame(data, "Atento (%)", max_points)
+    x, y, colors, customdata = timeline_arrays(data)
+
+    fig = go.Figure(go.Scattergl(
+        x=x,
+        y=y,
+        mode="lines+markers",
+        line=dict(width=2, color="black"),
+        marker=dict(size=10, color=colors, line=dict(color="black", width=1)),
+        customdata=customdata,
+        hovertemplate=(
+            "⏰ %{x|%H:%M:%S}<br>"
+            "🎯 Estado: %{customdata[0]}<br>"
+            "💻 Software Mais Usado: %{customdata[1]}<br>"
+            "👀 Posição Mais Frequente: %{customdata[2]}<br>"
+            "🔊 Som Predominante: %{customdata[3]}<br>"
+            "🏷️ Tipo de Atenção: %{customdata[4]}<extra></extra>"
+        ),
+        name="Nível de Atenção",
+        showlegend=False,
+    ))
+
+    title = "Evolução da Atenção ao Longo do Tempo (Atualizado a cada 30 segundos)" #atualização a cada 30s
+    if len(data) < total_blocks:
+        title += f"<br><sup>{len(data)} de {total_blocks} blocos exibidos; selecione um intervalo menor para ver todos</sup>"
+
+    # Configurar layout do gráfico
+    fig.update_layout(
+        title=title,
+        xaxis_title="Tempo",
+        yaxis_title="Estado de Atenção (%)",
+        yaxis=dict(range=[0, 105]),  # Pequena margem extra para evitar corte no 100%
+        hovermode="closest",
+        template="plotly_white"
+    )
+    return fig
+
+
+def timeline_arrays(data):
+    """Arrays do traço da linha do tempo: datas, "Atento (%)", cor de cada ponto e customdata do tooltip."""
+    attention = data["Atento (%)"]
+    distraction = data["Distraído (%)"]
+    attention_types = data["Tipo de Atenção"].astype(object)
+
+    # Estado de atenção de cada bloco (maior porcentagem entre atento e distraído)
+    state = "Atento (" + attention.map("{:.1f}".format).astype(str) + "%)"
+    distracted = ~(attention > distraction)
+    state[distracted] = "Distraído (" + distraction[distracted].map("{:.1f}".format).astype(str) + "%)"
+
+    customdata = pd.concat([
+        state,
+        data["Software Mais Usado"].astype(object),
+        data["Posição Cabeça Mais Comum"].astype(object),
+        data["Som Predominante"].astype(object),
+        attention_types,
+    ], axis=1).to_numpy()
+
+    colors = attention_types.map(attention_colors).fillna("gray").to_numpy()
+    return data.index.to_numpy(), attention.to_numpy(), colors, customdata
 
 
 
 
 # Criar gráfico de barras para softwares mais usados
+@profiled("gráfico: softwares mais usados")
 def plot_most_used_software(software_usage_time):
     """
     Gera um gráfico de barras com os 3 softwares mais usados, mantendo um design mais limpo e profissional.
@@ -416,6 +628,7 @@ def plot_most_used_software(software_usage_time):
 
 
 # Grafico de pizza para distribuição de atenção e distração
+@profiled("gráfico: atenção x distração")
 def plot_attention_pie_chart(grouped):
     """
     Gera um gráfico de pizza mostrando a distribuição total de atenção e distração.
@@ -467,6 +680,7 @@ def plot_attention_pie_chart(grouped):
 
 
 # Criar gráfico de barras para impacto do som na atenção
+@profiled("gráfico: impacto do som")
 def plot_sound_impact_chart(sound_impact_data):
     """
     Gráfico de barras refinado para mostrar o impacto do som no estado de atenção.
@@ -521,6 +735,20 @@ def plot_sound_impact_chart(sound_impact_data):
 
 
 
+# Painel de Perfilamento
+def show_profiling_panel(profiler):
+    """Mostra o tempo de cada etapa da análise e dos gráficos medidos na execução atual da página."""
+    with st.expander(f"⏱️ Perfilamento: {profiler.total * 1000:.0f} ms nesta execução", expanded=False):
+        rows = profiler.summary()
+        if rows:
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        else:
+            st.write("Nenhuma etapa medida nesta execução.")
+        if profiler.profile_path:
+            st.write(f"cProfile salvo em `{profiler.profile_path}` (abra com `snakeviz` ou `python -m pstats`).")
+
+
+
 # Menu de Navegação
 def main_dashboard():
     # Mostrar o diretório atual no Streamlit Cloud
@@ -550,6 +778,10 @@ def main_dashboard():
             }
         )
 
+        # Modo de perfilamento (padrão: variável de ambiente ATTENTION_PROFILING)
+        profiling_on = st.toggle("Modo de perfilamento", value=profiling_enabled_by_env())
+        save_cprofile = st.checkbox("Salvar cProfile (.prof)", value=False, disabled=not profiling_on)
+
 
         # Conteúdo de cada aba
     if selected == "Configurar Preferências":
@@ -557,7 +789,10 @@ def main_dashboard():
     elif selected == "Iniciar Coleta de Dados":
         start_data_collection()
     elif selected == "Analisar Dados":
-        analyze_data()
+        with profiling_session(profiling_on, save_cprofile, name="dashboard") as profiler:
+            analyze_data()
+        if profiler is not None:
+            show_profiling_panel(profiler)
 
 
 
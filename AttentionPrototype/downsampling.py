@@ -0,0 +1,61 @@
+import numpy as np
+
+'''
+Redução de séries longas para os gráficos do dashboard, preservando o formato da curva.
+1.	Largest-Triangle-Three-Buckets (lttb_indices): divide a série em faixas e, em cada faixa, mantém o ponto
+	que forma o maior triângulo com o ponto escolhido na faixa anterior e a média da faixa seguinte.
+	Picos e vales isolados são mantidos, ao contrário de uma média ou de pegar um ponto a cada N.
+2.	Redução de um DataFrame indexado por tempo a no máximo max_points linhas (downsample_frame).
+'''
+
+
+# 1. Largest-Triangle-Three-Buckets
+def lttb_indices(x, y, max_points):
+    """
+    Posições dos pontos mantidos pelo LTTB (sempre incluem o primeiro e o último ponto).
+    x, y: arrays numéricos de mesmo tamanho, com x crescente (datas podem ser passadas como int64).
+    Retorna: array de posições crescentes, com no máximo max_points elementos.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if max_points >= n or n <= 2:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1])[:max(max_points, 0)]
+
+    # Faixas do meio (o primeiro e o último ponto ficam fora delas)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Média da faixa seguinte (para a última faixa, o último ponto)
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        # Área (x2) do triângulo entre o ponto anterior, cada candidato da faixa e a média da faixa seguinte
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+# 2. Redução de um DataFrame
+def downsample_frame(frame, column, max_points):
+    """
+    Mantém no máximo max_points linhas do DataFrame (índice de datas crescente), escolhidas pelo LTTB sobre `column`.
+    As linhas mantidas são linhas reais (não médias), então as demais colunas continuam consistentes.
+    """
+    if len(frame) <= max_points:
+        return frame
+    x = frame.index.asi8 if hasattr(frame.index, "asi8") else np.arange(len(frame))
+    return frame.iloc[lttb_indices(x, frame[column].to_numpy(), max_points)]
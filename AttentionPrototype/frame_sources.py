@@ -0,0 +1,142 @@
+import glob
+import os
+import cv2
+import numpy as np
+
+'''
+Fontes de frames para o HeadService.
+1.	Câmera ao vivo (CameraSource), o comportamento original do módulo de cabeça.
+2.	Arquivo de vídeo gravado (VideoFileSource).
+3.	Pasta de imagens (ImageDirectorySource).
+4.	Frames em memória, de uma lista ou gerador de arrays NumPy (ArraySource).
+Todas seguem a interface do cv2.VideoCapture usada pelo HeadService: read() → (sucesso, frame BGR) e release().
+As fontes gravadas entregam os frames o mais rápido possível, sem esperar o tempo real do vídeo,
+para medir o desempenho da estimativa de pose sem uma webcam.
+'''
+
+
+class FrameSource:
+    """Interface comum das fontes de frames."""
+
+    live = False  # True para fontes em tempo real (câmera)
+
+    def read(self):
+        """Retorna (True, frame BGR) ou (False, None) quando não há frame."""
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def __iter__(self):
+        """Percorre os frames até a fonte acabar."""
+        while True:
+            success, frame = self.read()
+            if not success:
+                return
+            yield frame
+
+
+# 1. Câmera
+class CameraSource(FrameSource):
+    """Webcam (ou outro dispositivo de captura) pelo índice do OpenCV."""
+
+    live = True
+
+    def __init__(self, index=1):
+        self.cap = cv2.VideoCapture(index)
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+# 2. Arquivo de Vídeo
+class VideoFileSource(FrameSource):
+    """Frames de um vídeo gravado. loop=True recomeça do início ao chegar no fim."""
+
+    def __init__(self, path, loop=False):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+
+    def read(self):
+        success, frame = self.cap.read()
+        if not success and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.cap.read()
+        return success, frame
+
+    def release(self):
+        self.cap.release()
+
+
+# 3. Pasta de Imagens
+class ImageDirectorySource(FrameSource):
+    """Imagens de uma pasta, em ordem alfabética. Arquivos que não podem ser lidos são ignorados."""
+
+    extensions = (".jpg", ".jpeg", ".png", ".bmp")
+
+    def __init__(self, directory, loop=False):
+        self.paths = sorted(
+            path for path in glob.glob(os.path.join(directory, "*"))
+            if path.lower().endswith(self.extensions)
+        )
+        if not self.paths:
+            raise FileNotFoundError(f"Nenhuma imagem encontrada em {directory}.")
+        self.loop = loop
+        self.position = 0
+
+    def read(self):
+        attempts = 0
+        while attempts < len(self.paths):
+            if self.position >= len(self.paths):
+                if not self.loop:
+                    return False, None
+                self.position = 0
+            path = self.paths[self.position]
+            self.position += 1
+            attempts += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return True, frame
+        return False, None
+
+
+# 4. Frames em Memória
+class ArraySource(FrameSource):
+    """Frames de uma lista ou gerador de arrays NumPy (altura × largura × 3, BGR, uint8)."""
+
+    def __init__(self, frames):
+        self._frames = iter(frames)
+
+    def read(self):
+        frame = next(self._frames, None)
+        if frame is None:
+            return False, None
+        return True, frame
+
+    @classmethod
+    def noise(cls, count, height=480, width=640, seed=0):
+        """Frames aleatórios (sem rosto), para medir o custo do pipeline quando não há detecção."""
+        rng = np.random.default_rng(seed)
+        return cls(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8) for _ in range(count))
+
+
+
+
+def open_frame_source(source, loop=False):
+    """
+    Cria a fonte adequada a partir de uma descrição:
+    número inteiro (ou texto numérico) → câmera; pasta → imagens; arquivo → vídeo; FrameSource → ela mesma.
+    """
+    if isinstance(source, FrameSource):
+        return source
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return CameraSource(int(source))
+    if os.path.isdir(source):
+        return ImageDirectorySource(source, loop)
+    return VideoFileSource(source, loop)
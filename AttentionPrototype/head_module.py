@@ -2,108 +2,262 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import time
+from collections import Counter
+from frame_sources import CameraSource, open_frame_source
+from metrics import NULL_METRICS
 
 
 #baseado em: https://github.com/niconielsen32
 #artigo: https://medium.com/@jaykumaran2217/real-time-head-pose-estimation-facemesh-with-mediapipe-and-opencv-a-comprehensive-guide-b63a2f40b7c6
 
 
+# Marcos do Face Mesh usados na estimativa da pose, na ordem em que o loop original os encontrava
+# (índices crescentes): nariz (1), cantos dos olhos (33, 263), cantos da boca (61, 291) e queixo (199)
+POSE_LANDMARKS = (1, 33, 61, 199, 263, 291)
+
+NO_FACE = "Sem Detecção de Rosto"
+NO_FRAME = "No Frame Captured"
+THUMBNAIL_SIZE = (32, 24)  # Miniatura em tons de cinza usada para detectar movimento entre frames
+
+
+def classify_head_angles(x, y):
+    """Determina a posição da cabeça com base nos ângulos (x: inclinação vertical, y: rotação horizontal)."""
+    if y < -5:
+        return "Olhando para a Esquerda"
+    elif y > 5:
+        return "Olhando para a Direita"
+    elif x < -3:
+        return "Olhando para Baixo"
+    elif x > 8:
+        return "Olhando para Cima"
+    else:
+        return "Olhando para Frente"
+
+
+def majority_pose(votes):
+    """Posição mais votada entre os frames; em caso de empate, vence a do frame mais recente entre as empatadas."""
+    counts = Counter(votes)
+    best = max(counts.values())
+    for pose in reversed(votes):
+        if counts[pose] == best:
+            return pose
+
+
 class HeadService:
-    def __init__(self):
-        """Inicializa os serviços necessários para o processamento da cabeça."""
+    def __init__(self, inference_width=None, frame_source=None, frames_per_tick=1, motion_threshold=None,
+                 max_pose_reuse=12, no_face_limit=None, max_backoff_ticks=8, metrics=None):
+        """
+        Inicializa os serviços necessários para o processamento da cabeça.
+        frame_source: de onde vêm os frames (ver frame_sources.open_frame_source); padrão: webcam 1.
+        inference_width: largura (em pixels) para a qual o frame é reduzido antes do Face Mesh
+                         (None: usa a resolução da câmera). As coordenadas dos marcos continuam
+                         calculadas na resolução original, então os ângulos ficam na mesma escala.
+
+        Amostragem adaptativa (run_head_module); com os valores padrão, cada chamada processa um único frame:
+        frames_per_tick: frames analisados a cada chamada; o resultado é a posição mais votada entre eles.
+        motion_threshold: diferença média (0-255) entre miniaturas abaixo da qual a cena é considerada parada
+                          e a última posição é reaproveitada sem rodar o Face Mesh (None: desativado).
+        max_pose_reuse: quantas vezes seguidas a posição pode ser reaproveitada antes de forçar o Face Mesh.
+        no_face_limit: após essa quantidade de chamadas seguidas sem rosto, as próximas chamadas são puladas
+                       (recuo que dobra a cada repetição, até max_backoff_ticks); movimento na cena encerra o recuo.
+        metrics: CollectorMetrics que recebe a duração da captura ("head_capture"), do Face Mesh ("face_mesh") e do PnP ("pnp").
+        """
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
             min_detection_confidence=0.5, min_tracking_confidence=0.5
         )
         self.drawing_spec = mp.solutions.drawing_utils.DrawingSpec(thickness=1, circle_radius=1)
-        self.cap = cv2.VideoCapture(1) # Abre a captura de vídeo da webcam
+        self.cap = open_frame_source(frame_source) if frame_source is not None else CameraSource(1) # Abre a captura de vídeo da webcam
         self.latest_result = None # Armazena o resultado mais recente
+        self.inference_width = inference_width
+
+        # Arrays reaproveitados a cada frame (evita criar listas e arrays novos por frame)
+        self._face_2d = np.empty((len(POSE_LANDMARKS), 2), dtype=np.float64)
+        self._face_3d = np.empty((len(POSE_LANDMARKS), 3), dtype=np.float64)
+        self._dist_matrix = np.zeros((4, 1), dtype=np.float64)  # The distortion parameters
+        self._cam_matrices = {}  # (altura, largura) → matriz de câmera
+
+        # Amostragem adaptativa
+        self.frames_per_tick = frames_per_tick
+        self.motion_threshold = motion_threshold
+        self.max_pose_reuse = max_pose_reuse
+        self.no_face_limit = no_face_limit
+        self.max_backoff_ticks = max_backoff_ticks
+        self._reference_thumbnail = None  # Miniatura do último frame que passou pelo Face Mesh
+        self._reference_pose = None  # Posição calculada nesse frame
+        self._pose_reuses = 0
+        self._no_face_streak = 0
+        self._backoff_ticks = 0
+        self._backoff_remaining = 0
+        self.stats = {"frames": 0, "mesh_runs": 0, "motion_skips": 0, "backoff_skips": 0}
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.metrics.add_collector(lambda: {f"head_{name}": value for name, value in self.stats.items()})
+
+
+    def camera_matrix(self, img_h, img_w):
+        """Matriz de câmera para a resolução, calculada uma única vez por resolução."""
+        cam_matrix = self._cam_matrices.get((img_h, img_w))
+        if cam_matrix is None:
+            focal_length = 1 * img_w
+            cam_matrix = np.array([[focal_length, 0, img_h / 2],
+                                   [0, focal_length, img_w / 2],
+                                   [0, 0, 1]])
+            self._cam_matrices[(img_h, img_w)] = cam_matrix
+        return cam_matrix
+
+
+    def prepare_image(self, image):
+        """Reduz o frame (se configurado), espelha para a visão de selfie e converte de BGR para RGB."""
+        if self.inference_width is not None and image.shape[1] > self.inference_width:
+            scale = self.inference_width / image.shape[1]
+            image = cv2.resize(image, (self.inference_width, round(image.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
+        image.flags.writeable = False  # To improve performance
+        return image
+
+
+    def detect_landmarks(self, image):
+        """Executa o Face Mesh em um frame BGR. Retorna os marcos do primeiro rosto ou None se não houver rosto."""
+        with self.metrics.time("face_mesh"):
+            results = self.face_mesh.process(self.prepare_image(image))
+        if not results.multi_face_landmarks:
+            return None
+        return results.multi_face_landmarks[0].landmark
+
+
+    def solve_head_pose(self, landmarks, img_h, img_w):
+        """Calcula os ângulos da cabeça a partir dos marcos (PnP) e retorna a posição da cabeça."""
+        started = time.perf_counter()
+        # Coleta apenas os marcos faciais necessários, acessando-os diretamente pelo índice
+        face_2d, face_3d = self._face_2d, self._face_3d
+        for row, idx in enumerate(POSE_LANDMARKS):
+            lm = landmarks[idx]
+            x, y = int(lm.x * img_w), int(lm.y * img_h)
+            face_2d[row, 0] = face_3d[row, 0] = x
+            face_2d[row, 1] = face_3d[row, 1] = y
+            face_3d[row, 2] = lm.z
+
+        # Resolve o problema PnP para calcular ângulos
+        success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, self.camera_matrix(img_h, img_w), self._dist_matrix)
+        # Get rotational matrix (Rodrigues retorna a matriz e o jacobiano)
+        rmat, _ = cv2.Rodrigues(rot_vec)
+        # Get angles (RQDecomp3x3 retorna os ângulos em graus e as matrizes da decomposição)
+        angles, *_ = cv2.RQDecomp3x3(rmat)
+
+        # Calcula ângulos de inclinação (pitch, yaw)
+        # Como o modelo 3D usa o z normalizado do Face Mesh (quase plano), os graus saem pequenos (~0,01 por grau de giro);
+        # o fator 360 da implementação de referência os leva à escala dos limites de classify_head_angles
+        # (ex.: a cabeça girada ~10° resulta em y ≈ 5)
+        x = angles[0] * 360
+        y = angles[1] * 360
+        self.metrics.observe("pnp", time.perf_counter() - started)
+        return classify_head_angles(x, y)
+
 
+    def estimate_head_pose(self, image):
+        """Estima a posição da cabeça em um frame BGR da câmera."""
+        img_h, img_w = image.shape[:2]  # Dimensões do frame original (as coordenadas dos marcos usam essa escala)
+        landmarks = self.detect_landmarks(image)
+        if landmarks is None:
+            return NO_FACE
+        return self.solve_head_pose(landmarks, img_h, img_w)
+
+
+    def read_frame(self):
+        """Lê um frame da fonte, medindo o tempo de captura."""
+        with self.metrics.time("head_capture"):
+            return self.cap.read()
 
     def process_frame(self):
         """Processa um frame da câmera."""
-        success, image = self.cap.read()
+        success, image = self.read_frame()
         if not success:
-            return "No Frame Captured"
+            return NO_FRAME
+        return self.estimate_head_pose(image)
 
-        start = time.time()  # Corrigido: adicionado parênteses
+    # Amostragem adaptativa
+    def _adaptive(self):
+        return self.frames_per_tick > 1 or self.motion_threshold is not None or self.no_face_limit is not None
 
-        # Flip the image horizontally for a later selfie-view display
-        # Also convert the color space from BGR to RGB
-        image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
+    def thumbnail(self, image):
+        """Miniatura em tons de cinza do frame, barata de comparar com a anterior."""
+        small = cv2.resize(image, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
 
-        # To improve performance
-        image.flags.writeable = False
+    def _scene_changed(self, thumbnail):
+        if self._reference_thumbnail is None:
+            return True
+        return np.abs(thumbnail - self._reference_thumbnail).mean() >= self.motion_threshold
 
-        # Get the result
-        results = self.face_mesh.process(image)
+    def _pose_for_frame(self, image):
+        """Posição da cabeça em um frame, reaproveitando a última quando a cena não mudou."""
+        self.stats["frames"] += 1
+        thumbnail = None
+        if self.motion_threshold is not None:
+            thumbnail = self.thumbnail(image)
+            if (not self._scene_changed(thumbnail) and self._reference_pose is not None
+                    and self._pose_reuses < self.max_pose_reuse):
+                self._pose_reuses += 1
+                self.stats["motion_skips"] += 1
+                return self._reference_pose
 
-        if not results.multi_face_landmarks:
-            return "Sem Detecção de Rosto"
+        pose = self.estimate_head_pose(image)
+        self.stats["mesh_runs"] += 1
+        self._reference_thumbnail = thumbnail
+        self._reference_pose = pose
+        self._pose_reuses = 0
+        return pose
 
-        # To improve performance
-        image.flags.writeable = True
+    def _in_backoff(self):
+        """Verifica se a chamada atual deve ser pulada por causa de ausências de rosto seguidas."""
+        if self._backoff_remaining <= 0:
+            return False
+        if self.motion_threshold is not None:
+            success, image = self.read_frame()
+            if success and self._scene_changed(self.thumbnail(image)):
+                self._backoff_remaining = 0  # Algo mudou na cena (alguém pode ter voltado): volta a processar
+                return False
+        self._backoff_remaining -= 1
+        self.stats["backoff_skips"] += 1
+        return True
 
-        # Convert the color space from RGB to BGR
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    def _update_backoff(self, pose):
+        if self.no_face_limit is None:
+            return
+        if pose != NO_FACE:
+            self._no_face_streak = 0
+            self._backoff_ticks = 0
+            return
+        self._no_face_streak += 1
+        if self._no_face_streak >= self.no_face_limit:
+            self._backoff_ticks = min(max(1, self._backoff_ticks * 2), self.max_backoff_ticks)
+            self._backoff_remaining = self._backoff_ticks
 
-        for face_landmarks in results.multi_face_landmarks:
-            face_2d = []
-            face_3d = []
-            img_h, img_w, _ = image.shape  # Obtém dimensões do frame
+    def sample_tick(self):
+        """Analisa frames_per_tick frames (com detecção de movimento e recuo sem rosto) e retorna a posição mais votada."""
+        if self._in_backoff():
+            return NO_FACE
 
-            # Coleta os marcos faciais necessários para análise
-            for idx, lm in enumerate(face_landmarks.landmark):
-                if idx in [33, 263, 1, 61, 291, 199]:
-                    x, y = int(lm.x * img_w), int(lm.y * img_h)
-                    # Get the 2D Coordinates
-                    face_2d.append([x, y])
-                    # Get the 3D Coordinates
-                    face_3d.append([x, y, lm.z])
+        votes = []
+        for _ in range(self.frames_per_tick):
+            success, image = self.read_frame()
+            if success:
+                votes.append(self._pose_for_frame(image))
+        if not votes:
+            return NO_FRAME
 
-            # Converte para array NumPy
-            face_2d = np.array(face_2d, dtype=np.float64)  
-            face_3d = np.array(face_3d, dtype=np.float64)
+        pose = majority_pose(votes)
+        self._update_backoff(pose)
+        return pose
 
-            # Matriz de câmera
-            focal_length = 1 * img_w
-            cam_matrix = np.array([[focal_length, 0, img_h / 2],
-                                   [0, focal_length, img_w / 2],
-                                   [0, 0, 1]])
-             # The distortion parameters
-            dist_matrix = np.zeros((4, 1), dtype=np.float64)
-
-            # Resolve o problema PnP para calcular ângulos
-            success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, dist_matrix)
-             # Get rotational matrix
-            rmat = cv2.Rodrigues(rot_vec)
-            # Get angles
-            angles = cv2.RQDecomp3x3(rmat)
-
-            # Calcula ângulos de inclinação (pitch, yaw, roll)
-            x = angles[0] * 360
-            y = angles[1] * 360
-            z = angles[2] * 360
-
-            # Determina a posição da cabeça com base nos ângulos
-            if y < -5:
-                return "Olhando para a Esquerda"
-            elif y > 5:
-                return "Olhando para a Direita"
-            elif x < -3:
-                return "Olhando para Baixo"
-            elif x > 8:
-                return "Olhando para Cima"
-            else:
-                return "Olhando para Frente"
-            
     def run_head_module(self):
         """Executa o módulo de cabeça e atualiza o resultado mais recente."""
-        self.latest_result = self.process_frame()  # Processa um frame da webcam
+        if self._adaptive():
+            self.latest_result = self.sample_tick()  # Vários frames, com detecção de movimento e recuo
+        else:
+            self.latest_result = self.process_frame()  # Processa um frame da webcam
         return self.latest_result  # Retorna o resultado mais recente
 
     def stop(self):
         """Libera os recursos usados pelo módulo."""
         self.cap.release()  # Libera a captura de vídeo
-        
-
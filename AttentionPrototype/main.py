@@ -1,77 +1,105 @@
+import os
 import threading
 from audio_module import AudioService  # Importa a classe AudioService
-from window_module import WindowService # Importa a classe WindowService do Módulo de janela ativa
+from window_module import FocusTraceWriter, WindowService # Importa a classe WindowService do Módulo de janela ativa
 from head_module import HeadService  # Importa a classe HeadService do módulo de vídeo
-import csv
+from metrics import CollectorMetrics, MetricsExporter
 import time
 from audio_groups import map_to_group
+from sensor_pipeline import SensorPipeline
+from session_schema import make_session_row
+from session_writer import SessionCsvWriter
 
 
-# Gera um nome de arquivo com timestamp para cada nova execução
-timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")  # Formato: "2024-01-29_12-45-30"
-csv_filename = f"RawMultimodalData_{timestamp}.csv"
-csv_path = f"/Users/cassianosouza/Projects/MediaPipe-audio/data/{csv_filename}"
+# Pasta onde os arquivos RawMultimodalData_<data e hora>.csv são criados (um novo por execução e por dia)
+csv_directory = "/Users/cassianosouza/Projects/MediaPipe-audio/data"
 
-# Cria o novo arquivo com cabeçalho
-with open(csv_path, mode="w", newline="") as csv_file:
-    csv_writer = csv.writer(csv_file)
-    csv_writer.writerow(["Timestamp", "AudioClass", "AudioScore", "AudioGroup", "ActiveWindow", "URL", "HeadPose"])
+
+SAMPLING_INTERVAL = 5  # Segundos entre cada linha gravada no CSV
+
+# Métricas do coletor (latência de cada etapa, período do loop e amostras descartadas)
+METRICS_FILE = os.path.join(csv_directory, "collector_metrics.json")  # Reescrito a cada METRICS_INTERVAL segundos (.prom: texto do Prometheus)
+METRICS_INTERVAL = 30
+METRICS_PORT = None  # Ex.: 9464 para servir http://127.0.0.1:9464/metrics (None: sem servidor)
+
+# Trocas de janela (aplicativo ou domínio) gravadas em JSONL ao lado do CSV, uma linha por troca
+WINDOW_EVENTS_PREFIX = "WindowFocusEvents_"
+
+# Valores gravados quando um sensor não tem leitura recente (travado ou ainda iniciando)
+NO_AUDIO = {"AudioClass": "Sem Áudio", "AudioScore": 0.0, "AudioGroup": map_to_group("Sem Áudio")}
+NO_WINDOW = {"Janela Ativa": None, "URL": None}
+NO_HEAD_POSE = "No Frame Captured"
 
 
 
 
 def main():
     """Função principal que gerencia a execução paralela."""
+    audio_service = None
+    window_service = None
+    head_service = None
+    pipeline = None
+    writer = None
+    exporter = None
+    focus_trace = None
     try:
-        audio_service = AudioService() # Instancia a classe AudioService
-        audio_service.startEngine()  # Inicializa o serviço de áudio
-        window_service = WindowService()  # Inicializa o serviço de janelas
-        head_service = HeadService()  # Inicializa o serviço de cabeça
-        
-        while True:
-            print("Iniciando processo principal...")
-
-            # Processamento do audio
-            print("processando o audio...")
-            audio_service.processorAudio()
-            audio_service.result_ready.wait() # Espera o resultado estar pronto
-            audio_result = audio_service.latest_result[0].classifications[0]
-            audio_class = audio_result.categories[0].category_name
-            audio_score = audio_result.categories[0].score
-            print(audio_service.latest_result)
-
-            # Mapeia a classe para seu grupo funcional
-            audio_group = map_to_group(audio_class)
+        metrics = CollectorMetrics(target_period=SAMPLING_INTERVAL)
+        audio_service = AudioService(metrics=metrics) # Instancia a classe AudioService
+        audio_service.startEngine(max_results=-1)  # Inicializa o serviço de áudio (scores de todas as classes)
+        audio_service.start_continuous()  # Classifica o microfone em segundo plano, janela após janela
+        window_service = WindowService(metrics=metrics)  # Inicializa o serviço de janelas
+        # Cada troca detectada nas consultas do sensor de janela (uma por amostra) é gravada no JSONL
+        focus_trace = FocusTraceWriter(os.path.join(csv_directory, f"{WINDOW_EVENTS_PREFIX}{time.strftime('%Y-%m-%d_%H-%M-%S')}.jsonl"))
+        window_service.add_listener(focus_trace)
+        # Inicializa o serviço de cabeça: 3 frames por leitura (voto da maioria), Face Mesh só quando a cena muda
+        # e recuo após 3 leituras seguidas sem rosto
+        head_service = HeadService(frames_per_tick=3, motion_threshold=4.0, no_face_limit=3, metrics=metrics)
+
+        # Cada sensor roda na sua própria thread; o amostrador junta as leituras mais recentes a cada 5 segundos
+        pipeline = SensorPipeline(tick=SAMPLING_INTERVAL, metrics=metrics)
+        pipeline.add_sensor("window", window_service.get_active_app, interval=SAMPLING_INTERVAL, timeout=2 * SAMPLING_INTERVAL, default=NO_WINDOW)
+        pipeline.add_sensor("head", head_service.run_head_module, interval=SAMPLING_INTERVAL / 2, timeout=2 * SAMPLING_INTERVAL, default=NO_HEAD_POSE)
+        pipeline.start()
+
+        # Gravação em segundo plano, em lotes (o arquivo não é reaberto a cada amostra)
+        writer = SessionCsvWriter(csv_directory, rotation="daily", flush_rows=12, flush_interval=SAMPLING_INTERVAL,
+                                  metrics=metrics).start()
+        print(f"Gravando em {writer.current_path}")
+        exporter = MetricsExporter(metrics, METRICS_FILE, METRICS_INTERVAL, port=METRICS_PORT).start()
+        print(f"Sensores iniciados em {threading.active_count() - 1} threads.")
+
+        for sample_time, sample in pipeline.samples():
+            # Áudio: média dos scores de todas as janelas classificadas desde o tick anterior (não bloqueia)
+            audio_result = audio_service.aggregate_since_last_tick() or NO_AUDIO
+            audio_class, audio_score, audio_group = audio_result["AudioClass"], audio_result["AudioScore"], audio_result["AudioGroup"]
+            window_data = sample["window"]
+            head_pose = sample["head"]
             print(f"Classificação do áudio: {audio_class}, Grupo: {audio_group}, Score: {audio_score}")
-
-            # Processamento da janela
-            print("processando a janela ativa...")
-            window_data = window_service.get_active_app()
-            print(f"Janela ativa: {window_data['Janela Ativa']}, URL: {window_data['URL']}, Timestamp: {window_data['Timestamp']}")
-
-            # Processamento do vídeo
-            print("processando o vídeo...")
-            head_pose = head_service.run_head_module()  # Chama a função para obter a posição da cabeça
+            print(f"Janela ativa: {window_data['Janela Ativa']}, URL: {window_data['URL']}")
             print(f"Posição da cabeça: {head_pose}")
 
-
-
             # Salva dados no CSV
-            with open(csv_path, mode="a", newline="") as csv_file:
-                csv_writer = csv.writer(csv_file)
-                timestamp = time.strftime("%H:%M:%S %d/%m/%Y")
-                csv_writer.writerow([timestamp, audio_class, audio_score, audio_group, window_data['Janela Ativa'], window_data['URL'], head_pose])
-
-            # Tempo entre cada iteração do loop principal
-            time.sleep(5) 
+            writer.write(make_session_row(audio_class, audio_score, audio_group, window_data['Janela Ativa'], window_data['URL'], head_pose, sample_time))
 
     except KeyboardInterrupt:
         print("Execução interrompida pelo usuário.")
     except Exception as e:
         print(f"Erro ao iniciar threads: {e}")
     finally:
-        head_service.stop()  # Libera recursos do módulo de cabeça
+        if pipeline is not None:
+            pipeline.stop()  # Para as threads dos sensores
+        if audio_service is not None:
+            audio_service.stop()  # Para a classificação contínua e a gravação
+        if window_service is not None:
+            window_service.stop()  # Libera o provedor da janela ativa
+        if focus_trace is not None:
+            focus_trace.close()  # Fecha o arquivo de trocas de janela
+        if writer is not None:
+            writer.close()  # Grava as linhas pendentes
+        if head_service is not None:
+            head_service.stop()  # Libera recursos do módulo de cabeça
+        if exporter is not None:
+            exporter.stop()  # Grava as métricas finais
 
 if __name__ == "__main__":
     main()
-
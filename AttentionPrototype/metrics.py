@@ -0,0 +1,327 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+'''
+Instrumentação do coletor (main.py): onde o tempo de cada amostra é gasto.
+1.	Histograma de latência com faixas fixas, no formato do Prometheus (LatencyHistogram).
+2.	Registro das métricas do coletor (CollectorMetrics):
+        latência por etapa (espera do áudio, inferência, janela ativa, captura da câmera, Face Mesh, PnP, gravação do CSV);
+        período do loop de amostragem e desvio em relação ao período alvo;
+        contadores (ex.: amostras descartadas), também lidos de outros objetos no momento da exportação.
+3.	Exportação: arquivo reescrito periodicamente (JSON ou texto do Prometheus) e servidor HTTP local opcional.
+Quem recebe metrics=None usa NULL_METRICS, que não mede nada.
+'''
+
+
+# Faixas (em segundos) dos histogramas de latência das etapas
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Faixas do período do loop, em múltiplos do período alvo
+PERIOD_BUCKET_FACTORS = (0.5, 0.8, 0.9, 0.95, 0.99, 1.01, 1.05, 1.1, 1.2, 1.5, 2.0, 3.0)
+
+# Etapas medidas pelos serviços do coletor
+STAGES = ("audio_wait", "audio_inference", "window_lookup", "head_capture", "face_mesh", "pnp", "csv_write")
+
+
+# 1. Histograma de Latência
+class LatencyHistogram:
+    """Contagem de observações por faixa (limites superiores em segundos), com soma, mínimo e máximo."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Última posição: acima da maior faixa (+Inf)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            self.min = seconds if self.min is None else min(self.min, seconds)
+            self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def quantile(self, q):
+        """Estimativa do quantil q (0-1), interpolando dentro da faixa onde ele cai."""
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = q * self.count
+            cumulative = 0
+            for index, bucket_count in enumerate(self.counts):
+                if bucket_count and cumulative + bucket_count >= rank:
+                    lower = self.buckets[index - 1] if index > 0 else 0.0
+                    upper = self.buckets[index] if index < len(self.buckets) else self.max
+                    lower, upper = max(lower, self.min), min(upper, self.max)
+                    return lower + (upper - lower) * (rank - cumulative) / bucket_count
+                cumulative += bucket_count
+            return self.max
+
+    def summary(self):
+        """Contagem, média, p50, p95 e máximo (em milissegundos)."""
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count * 1000, 3),
+            "p50_ms": round(self.quantile(0.5) * 1000, 3),
+            "p95_ms": round(self.quantile(0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+    def cumulative_counts(self):
+        """Pares (limite, contagem acumulada), como nas linhas _bucket do Prometheus."""
+        with self._lock:
+            cumulative, pairs = 0, []
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), self.counts):
+                cumulative += bucket_count
+                pairs.append((bound, cumulative))
+            return pairs
+
+
+
+
+# 2. Registro das Métricas
+class CollectorMetrics:
+    """
+    Métricas do coletor, seguras entre threads.
+    target_period: período alvo do loop de amostragem (em segundos), usado para o desvio e as faixas do período.
+    """
+
+    def __init__(self, target_period=5.0):
+        self.target_period = target_period
+        self.started_at = time.time()
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+        self.loop_period = LatencyHistogram(tuple(target_period * factor for factor in PERIOD_BUCKET_FACTORS))
+        self.loop_drift = LatencyHistogram()  # |período - alvo| de cada tick
+        self.last_drift = None  # Atraso da última amostra em relação ao horário agendado (segundos)
+        self.counters = {}
+        self._collectors = []
+        self._last_tick = None
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """Registra a duração de uma etapa (etapas novas são criadas na primeira observação)."""
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, LatencyHistogram())
+        histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """Mede o bloco: with metrics.time("csv_write"): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_tick(self, scheduled_at=None, now=None):
+        """
+        Registra uma amostra do loop principal (relógio time.monotonic).
+        scheduled_at: horário em que a amostra estava agendada, para medir o atraso (desvio) do loop.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            previous, self._last_tick = self._last_tick, now
+            if scheduled_at is not None:
+                self.last_drift = now - scheduled_at
+        if previous is not None:
+            period = now - previous
+            self.loop_period.observe(period)
+            self.loop_drift.observe(abs(period - self.target_period))
+
+    def add_collector(self, collect):
+        """
+        Registra uma função chamada a cada exportação que retorna um dict nome → valor
+        (ex.: contadores mantidos por outros objetos, como writer.dropped_rows).
+        """
+        self._collectors.append(collect)
+
+    def collected_values(self):
+        values = dict(self.counters)
+        for collect in self._collectors:
+            try:
+                values.update(collect())
+            except Exception as e:
+                print(f"Erro ao coletar métricas: {e}")
+        return values
+
+    def snapshot(self):
+        """Resumo de todas as métricas, serializável em JSON."""
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "target_period_s": self.target_period,
+            "stages": {stage: histogram.summary() for stage, histogram in self.stages.items()},
+            "loop_period": self.loop_period.summary(),
+            "loop_drift": self.loop_drift.summary(),
+            "last_drift_ms": None if self.last_drift is None else round(self.last_drift * 1000, 3),
+            "counters": self.collected_values(),
+        }
+
+    def to_prometheus(self, prefix="attention_collector"):
+        """Todas as métricas no formato de texto do Prometheus."""
+        lines = []
+
+        def histogram_lines(name, histogram, labels=""):
+            separator = "," if labels else ""
+            for bound, cumulative in histogram.cumulative_counts():
+                le = "+Inf" if bound == float("inf") else repr(round(bound, 6))
+                lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {histogram.sum}")
+            lines.append(f"{name}_count{suffix} {histogram.count}")
+
+        name = f"{prefix}_stage_latency_seconds"
+        lines += [f"# HELP {name} Duração de cada etapa do coletor.", f"# TYPE {name} histogram"]
+        for stage, histogram in self.stages.items():
+            histogram_lines(name, histogram, f'stage="{stage}"')
+
+        for metric, histogram, help_text in (
+            ("loop_period_seconds", self.loop_period, "Intervalo entre amostras consecutivas."),
+            ("loop_drift_seconds", self.loop_drift, "Diferença absoluta entre o intervalo e o período alvo."),
+        ):
+            name = f"{prefix}_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            histogram_lines(name, histogram)
+
+        name = f"{prefix}_target_period_seconds"
+        lines += [f"# TYPE {name} gauge", f"{name} {self.target_period}"]
+        if self.last_drift is not None:
+            name = f"{prefix}_last_drift_seconds"
+            lines += [f"# TYPE {name} gauge", f"{name} {self.last_drift}"]
+
+        for counter, value in sorted(self.collected_values().items()):
+            name = f"{prefix}_{counter}"
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class NullMetrics:
+    """Substituto que não mede nada, usado quando nenhuma instância de CollectorMetrics é informada."""
+
+    def observe(self, stage, seconds):
+        pass
+
+    @contextmanager
+    def time(self, stage):
+        yield
+
+    def increment(self, name, value=1):
+        pass
+
+    def record_tick(self, scheduled_at=None, now=None):
+        pass
+
+    def add_collector(self, collect):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+
+
+# 3. Exportação
+def write_metrics_file(metrics, path):
+    """Grava as métricas em um arquivo temporário e o troca pelo definitivo (leitores nunca veem arquivo pela metade)."""
+    if path.endswith(".prom"):
+        content = metrics.to_prometheus()
+    else:
+        content = json.dumps(metrics.snapshot(), ensure_ascii=False, indent=2)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class MetricsExporter:
+    """
+    Reescreve o arquivo de métricas a cada `interval` segundos numa thread e, se port for informado,
+    serve o texto do Prometheus em http://host:port/metrics (por padrão, só na máquina local).
+    """
+
+    def __init__(self, metrics, path=None, interval=30.0, port=None, host="127.0.0.1"):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.port = port
+        self.host = host
+        self._server = None
+        self._threads = []
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if self.path is not None:
+            thread = threading.Thread(target=self._write_loop, name="metrics-file", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.port is not None:
+            self._server = ThreadingHTTPServer((self.host, self.port), _metrics_handler(self.metrics))
+            thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            print(f"Métricas em http://{self.host}:{self._server.server_address[1]}/metrics")
+        return self
+
+    def _write_loop(self):
+        while not self._stop_event.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            write_metrics_file(self.metrics, self.path)
+        except OSError as e:
+            print(f"Erro ao gravar as métricas em {self.path}: {e}")
+
+    def stop(self):
+        """Para o servidor e a thread de gravação, gravando o arquivo uma última vez."""
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+        if self.path is not None:
+            self.write()
+
+
+def _metrics_handler(metrics):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Sem uma linha no terminal a cada consulta
+
+    return MetricsHandler
@@ -0,0 +1,195 @@
+import json
+import os
+from collections import deque
+import numpy as np
+import pandas as pd
+
+'''
+Camada de preferências do usuário.
+1.	Leitura e gravação do user_preferences.json (load_user_preferences, save_user_preferences).
+2.	Forma compilada das preferências, pronta para as regras de atenção (CompiledPreferences).
+3.	Cache das preferências compiladas, invalidado quando o arquivo muda (get_preferences).
+'''
+
+
+PREFERENCES_FILE = "user_preferences.json"
+
+DEFAULT_PREFERENCES = {
+    "Foco": ["Microsoft Excel", "GitHub Desktop"],
+    "Contexto": {
+        "UsandoFones": False,
+        "PreferenciaMusica": "Não afeta meu foco"
+    },
+    "Monitores": {"Monitor 1": "Frente"}
+}
+
+
+# 1. Carregar e Salvar Preferências do Usuário
+def load_user_preferences(preferences_file=PREFERENCES_FILE):
+    """
+    Carrega as preferências do usuário a partir do JSON.
+    Se o arquivo não existir, cria um com valores padrão.
+    """
+
+    # Se o arquivo não existir, cria um padrão
+    if not os.path.exists(preferences_file):
+        with open(preferences_file, "w", encoding="utf-8") as f:
+            json.dump(DEFAULT_PREFERENCES, f, indent=4)
+        print("⚠️ Arquivo user_preferences.json não encontrado! Criando arquivo com configurações padrão.")
+
+    # Agora tenta carregar o arquivo
+    try:
+        with open(preferences_file, "r", encoding="utf-8") as f:
+            preferences = json.load(f)
+        return preferences
+    except (FileNotFoundError, json.JSONDecodeError):
+        print("Erro crítico ao carregar user_preferences.json. Usando configurações padrão.")
+        return DEFAULT_PREFERENCES
+
+
+def save_user_preferences(preferences, preferences_file=PREFERENCES_FILE):
+    """Salva as preferências no JSON e descarta a versão compilada em cache."""
+    with open(preferences_file, "w") as f:
+        json.dump(preferences, f, indent=4)
+    _preferences_cache.pop(preferences_file, None)
+
+
+
+
+# 2. Preferências Compiladas
+class FocusURLMatcher:
+    """
+    Verifica se uma URL contém algum dos domínios de foco (FocoURLs).
+    Os domínios são indexados em um autômato de múltiplos padrões (Aho-Corasick), então cada URL é
+    percorrida uma única vez, não importa quantos domínios existam. O resultado de cada URL distinta
+    fica memorizado, já que uma sessão tem poucas URLs diferentes que se repetem milhares de vezes.
+    """
+
+    max_cached_urls = 10000  # Limite da memória de URLs já verificadas
+
+    def __init__(self, domains):
+        self.domains = tuple(domains)
+        self._cache = {}
+        self._matches_everything = "" in self.domains  # Um domínio vazio está contido em qualquer URL
+        self._build_automaton()
+
+    def _build_automaton(self):
+        """Monta a árvore de prefixos dos domínios e os links de falha do autômato."""
+        self._transitions = [{}]  # Estado → {caractere: próximo estado}
+        self._is_match = [False]  # Estado termina algum domínio (diretamente ou via link de falha)
+        for domain in self.domains:
+            state = 0
+            for char in domain:
+                next_state = self._transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions[state][char] = next_state
+                    self._transitions.append({})
+                    self._is_match.append(False)
+                state = next_state
+            self._is_match[state] = True
+
+        # Links de falha em largura: o maior sufixo do estado que também é prefixo de algum domínio
+        self._fail = [0] * len(self._transitions)
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._transitions[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._transitions[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._transitions[fallback].get(char, 0)
+                self._is_match[next_state] = self._is_match[next_state] or self._is_match[self._fail[next_state]]
+                queue.append(next_state)
+
+    def _scan(self, url):
+        """Percorre a URL no autômato e para no primeiro domínio encontrado."""
+        transitions, fail, is_match = self._transitions, self._fail, self._is_match
+        state = 0
+        for char in url:
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            if is_match[state]:
+                return True
+        return False
+
+    def matches(self, url):
+        """Retorna True se a URL não for vazia e contiver algum domínio de foco."""
+        if not url or not isinstance(url, str):
+            return False
+        result = self._cache.get(url)
+        if result is None:
+            result = self._matches_everything or self._scan(url)
+            if len(self._cache) >= self.max_cached_urls:
+                self._cache.clear()
+            self._cache[url] = result
+        return result
+
+    def match_column(self, urls):
+        """
+        Verifica uma coluna inteira de URLs: decide uma vez por URL distinta e propaga o resultado para as linhas.
+        Retorna: array booleano do NumPy (valores ausentes são False).
+        """
+        codes, uniques = pd.factorize(urls)
+        lookup = np.array([self.matches(url) for url in uniques] + [False], dtype=bool)
+        return lookup[codes]
+
+
+class CompiledPreferences:
+    """
+    Preferências do usuário em uma forma pronta para as regras de atenção:
+    conjuntos (frozenset) para consultas rápidas e o verificador de URLs de foco já montado.
+    O acesso por chave (preferences["Foco"]) continua retornando os valores originais do JSON.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.focus_apps = frozenset(raw["Foco"])
+        self.focus_urls = FocusURLMatcher(raw.get("FocoURLs", []))
+        self.monitor_positions = frozenset(raw.get("Monitores", {}).values())
+        self.using_headphones = raw["Contexto"]["UsandoFones"]
+        self.music_preference = raw["Contexto"]["PreferenciaMusica"]
+
+    def __getitem__(self, key):
+        return self.raw[key]
+
+    def get(self, key, default=None):
+        return self.raw.get(key, default)
+
+
+def compile_preferences(preferences):
+    """Retorna a forma compilada das preferências (sem recompilar se elas já estiverem compiladas)."""
+    if isinstance(preferences, CompiledPreferences):
+        return preferences
+    return CompiledPreferences(preferences)
+
+
+
+
+# 3. Cache das Preferências
+_preferences_cache = {}  # Caminho do arquivo → (assinatura do arquivo, preferências compiladas)
+
+
+def _file_signature(preferences_file):
+    """Data de modificação e tamanho do arquivo, usados para detectar alterações."""
+    try:
+        stat = os.stat(preferences_file)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_preferences(preferences_file=PREFERENCES_FILE):
+    """
+    Retorna as preferências compiladas, lendo o arquivo apenas quando ele muda.
+    A cada chamada, só a data de modificação do arquivo é consultada.
+    """
+    signature = _file_signature(preferences_file)
+    cached = _preferences_cache.get(preferences_file)
+    if cached is not None and signature is not None and cached[0] == signature:
+        return cached[1]
+
+    compiled = CompiledPreferences(load_user_preferences(preferences_file))
+    _preferences_cache[preferences_file] = (_file_signature(preferences_file), compiled)
+    return compiled
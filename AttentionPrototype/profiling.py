@@ -0,0 +1,144 @@
+import cProfile
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+'''
+Modo de perfilamento da análise e do dashboard.
+1.	Ativação: variável de ambiente ATTENTION_PROFILING=1 (padrão do seletor na barra lateral do dashboard).
+2.	Sessão de perfilamento (profiling_session): mede cada etapa marcada com stage() ou @profiled na thread atual
+	e, opcionalmente, grava um arquivo .prof do cProfile (abrir com snakeviz ou pstats).
+3.	Saída de depuração (debug_print): só aparece com o perfilamento ativo; fora dele, a análise não imprime nada.
+Sem uma sessão ativa, stage() e @profiled não medem nada (custo de uma consulta a uma variável da thread).
+Cada sessão do Streamlit roda em sua própria thread, então as medições de visitantes diferentes não se misturam.
+'''
+
+
+PROFILING_ENV = "ATTENTION_PROFILING"  # "1", "true" ou "sim" ativam o perfilamento
+PROFILE_DIRECTORY_ENV = "ATTENTION_PROFILE_DIR"  # Pasta dos arquivos .prof (padrão: profiles/)
+DEFAULT_PROFILE_DIRECTORY = "profiles"
+
+_local = threading.local()
+
+
+# 1. Ativação
+def profiling_enabled_by_env():
+    """True se a variável de ambiente ATTENTION_PROFILING pede o perfilamento."""
+    return os.environ.get(PROFILING_ENV, "").strip().lower() in ("1", "true", "sim", "yes", "on")
+
+
+def profile_directory():
+    return os.environ.get(PROFILE_DIRECTORY_ENV, DEFAULT_PROFILE_DIRECTORY)
+
+
+
+
+# 2. Sessão de Perfilamento
+class Profiler:
+    """Durações das etapas de uma execução, na ordem em que começaram, com a profundidade de cada uma."""
+
+    def __init__(self):
+        self.records = []  # (etapa, segundos, profundidade)
+        self.profile_path = None  # Arquivo .prof gravado ao final da sessão (se pedido)
+        self.started_at = time.perf_counter()
+        self.total = None
+        self._depth = 0
+
+    @contextmanager
+    def stage(self, name):
+        index = len(self.records)
+        self.records.append((name, 0.0, self._depth))  # Reservada na ordem de início (etapas internas logo abaixo)
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.records[index] = (name, time.perf_counter() - started, self._depth)
+
+    def summary(self):
+        """Uma linha por etapa (etapas internas recuadas), com duração em ms e porcentagem do total."""
+        total = self.total if self.total is not None else time.perf_counter() - self.started_at
+        rows = []
+        for name, seconds, depth in self.records:
+            rows.append({
+                "Etapa": "    " * depth + name,
+                "Tempo (ms)": round(seconds * 1000, 2),
+                "% do Total": round(100 * seconds / total, 1) if total > 0 else 0.0,
+            })
+        return rows
+
+
+def current_profiler():
+    """Profiler da sessão ativa na thread atual (ou None)."""
+    return getattr(_local, "profiler", None)
+
+
+@contextmanager
+def profiling_session(enabled=True, save_cprofile=False, name="analise"):
+    """
+    Ativa o perfilamento na thread atual durante o bloco. Produz o Profiler (ou None se enabled=False).
+    save_cprofile: também executa o cProfile e grava <pasta>/<name>_<data e hora>.prof ao final.
+    """
+    if not enabled:
+        yield None
+        return
+
+    profiler = Profiler()
+    previous = current_profiler()
+    _local.profiler = profiler
+
+    cprofile = None
+    if save_cprofile:
+        cprofile = cProfile.Profile()
+        try:
+            cprofile.enable()
+        except ValueError as e:  # Outro perfilador já ativo no processo
+            print(f"cProfile indisponível: {e}")
+            cprofile = None
+    try:
+        yield profiler
+    finally:
+        profiler.total = time.perf_counter() - profiler.started_at
+        _local.profiler = previous
+        if cprofile is not None:
+            cprofile.disable()
+            directory = profile_directory()
+            os.makedirs(directory, exist_ok=True)
+            profiler.profile_path = os.path.join(directory, f"{name}_{time.strftime('%Y-%m-%d_%H-%M-%S')}.prof")
+            cprofile.dump_stats(profiler.profile_path)
+
+
+def stage(name):
+    """Mede o bloco como uma etapa da sessão de perfilamento ativa: with stage("leitura do CSV"): ..."""
+    profiler = current_profiler()
+    return nullcontext() if profiler is None else profiler.stage(name)
+
+
+def profiled(name):
+    """Decorador que mede cada chamada da função como uma etapa (ex.: a construção de um gráfico)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = current_profiler()
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+
+
+# 3. Saída de Depuração
+def debug_enabled():
+    return current_profiler() is not None or profiling_enabled_by_env()
+
+
+def debug_print(*args, **kwargs):
+    """print() que só aparece com o perfilamento ativo (sessão na thread atual ou variável de ambiente)."""
+    if debug_enabled():
+        print(*args, **kwargs)
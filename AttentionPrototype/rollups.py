@@ -0,0 +1,415 @@
+import json
+import math
+import os
+import threading
+import numpy as np
+import pandas as pd
+from attention_rules import (
+    BLOCK_COLUMNS,
+    aggregate_blocks,
+    analyze_attention_in_blocks,
+    classify_blocks,
+    classify_state_vectorized,
+)
+from preferences import compile_preferences, get_preferences
+from session_store import STORE_DIRECTORY
+
+'''
+Agregados pré-calculados da atenção em várias resoluções (30 s → 5 min → 1 h → dia).
+1.	Contagens somáveis de cada bloco de 30 s (block_rollup), tiradas dos blocos de analyze_attention_in_blocks:
+	amostras (total, atentas e distraídas), trocas de software, olhadas para baixo, segundos de cada software,
+	amostras de cada posição da cabeça, blocos de cada som predominante (com a soma da distração) e de cada tipo de atenção.
+	Como tudo é soma, um ponto de 5 min é a soma dos seus 10 blocos, um de 1 h a soma dos seus 12 pontos de 5 min, etc.
+2.	Armazenamento das resoluções (RollupStore), atualizado só com o que chegou de novo: sessões novas entram inteiras
+	e, de uma sessão que cresceu, só os blocos a partir do último (que pode ter ficado incompleto) são refeitos.
+	Fica gravado em data/store/rollups/ e vale para um conteúdo do user_preferences.json (hash em meta.json).
+3.	Escolha da resolução (choose_level): a mais detalhada cujos pontos no intervalo visível cabem no gráfico,
+	ou seja, uma semana ou um mês são lidos já agregados em vez de reagregar milhões de amostras.
+4.	Visões no formato dos gráficos do dashboard: blocos da linha do tempo, uso dos softwares, médias e impacto do som.
+'''
+
+
+LEVELS = ("30s", "5min", "1h", "1D")  # Da mais detalhada (blocos da análise) para a mais agregada
+LEVEL_LABELS = {"30s": "30 segundos", "5min": "5 minutos", "1h": "1 hora", "1D": "1 dia"}
+ROLLUP_DIRECTORY = os.path.join(STORE_DIRECTORY, "rollups")
+ROLLUP_VERSION = 1
+CONTEXT_BLOCKS = 3  # Blocos anteriores usados por classify_blocks (atenção sustentada)
+
+# Colunas somáveis de cada ponto; as demais são contagens por valor, com o prefixo do grupo
+TOTAL_COLUMNS = [
+    "Amostras", "Amostras Atento", "Amostras Distraído", "Blocos", "Soma Atento (%)", "Soma Distraído (%)",
+    "Trocas de Software", "Looking Down Count",
+]
+SOFTWARE_PREFIX = "Software|"  # Segundos de uso
+HEAD_PREFIX = "Cabeça|"  # Amostras
+SOUND_PREFIX = "Som|"  # Blocos em que o som predominou
+SOUND_DISTRACTION_PREFIX = "Distração Som|"  # Soma de "Distraído (%)" desses blocos
+TYPE_PREFIX = "Tipo|"  # Blocos de cada tipo de atenção
+
+
+# 1. Contagens Somáveis dos Blocos
+def _counts_by_block(block, values, n_blocks, weights=None):
+    """Matriz (blocos x valores distintos) com a quantidade (ou a soma dos pesos) de cada valor em cada bloco."""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    n_values = max(len(uniques), 1)
+    valid = codes >= 0
+    counts = np.bincount(
+        block[valid] * n_values + codes[valid],
+        weights=None if weights is None else weights[valid],
+        minlength=n_blocks * n_values,
+    )
+    return counts.reshape(n_blocks, n_values)[:, :len(uniques)], [str(value) for value in uniques]
+
+
+def block_rollup(data, grouped, sample_seconds=5):
+    """
+    Converte os blocos de 30 s em contagens somáveis.
+    data: linhas analisadas (Timestamp como coluna ou índice, como fica depois de analyze_attention_in_blocks).
+    grouped: blocos dessas linhas (saída de analyze_attention_in_blocks, com o Tipo de Atenção).
+    sample_seconds: tempo que cada linha representa (5 segundos).
+    Retorna: DataFrame indexado pelo início de cada bloco, apenas com colunas somáveis.
+    """
+    if grouped.empty:
+        return pd.DataFrame(columns=TOTAL_COLUMNS, index=pd.DatetimeIndex([], name="Timestamp"), dtype=np.float64)
+
+    step = pd.Timedelta(LEVELS[0])
+    n_blocks = len(grouped)
+    timestamps = pd.DatetimeIndex(data.index if "Timestamp" not in data.columns else data["Timestamp"])
+    has_time = ~timestamps.isna()
+    block = np.asarray((timestamps[has_time] - grouped.index[0]) // step, dtype=np.int64)
+    inside = (block >= 0) & (block < n_blocks)
+    rows = data[has_time][inside]
+    block = block[inside]
+
+    samples = np.bincount(block, minlength=n_blocks)
+    attentive_pct = np.nan_to_num(grouped["Atento (%)"].to_numpy(dtype=np.float64))
+    distracted_pct = np.nan_to_num(grouped["Distraído (%)"].to_numpy(dtype=np.float64))
+    columns = {
+        "Amostras": samples,
+        "Amostras Atento": np.rint(attentive_pct * samples / 100),  # Os percentuais vieram dessas contagens
+        "Amostras Distraído": np.rint(distracted_pct * samples / 100),
+        "Blocos": samples > 0,
+        "Soma Atento (%)": attentive_pct,
+        "Soma Distraído (%)": distracted_pct,
+        "Trocas de Software": grouped["Trocas de Software"].to_numpy(dtype=np.float64),
+        "Looking Down Count": grouped["Looking Down Count"].to_numpy(dtype=np.float64),
+    }
+
+    # Contagens por valor: softwares e posições da cabeça vêm das linhas; sons e tipos de atenção, dos blocos
+    block_numbers = np.arange(n_blocks)
+    groups = (
+        (SOFTWARE_PREFIX, _counts_by_block(block, rows["ActiveWindow"], n_blocks), sample_seconds),
+        (HEAD_PREFIX, _counts_by_block(block, rows["HeadPose"], n_blocks), 1),
+        (SOUND_PREFIX, _counts_by_block(block_numbers, grouped["Som Predominante"], n_blocks), 1),
+        (SOUND_DISTRACTION_PREFIX, _counts_by_block(block_numbers, grouped["Som Predominante"], n_blocks, distracted_pct), 1),
+        (TYPE_PREFIX, _counts_by_block(block_numbers, grouped["Tipo de Atenção"], n_blocks), 1),
+    )
+    for prefix, (counts, names), factor in groups:
+        for position, name in enumerate(names):
+            columns[prefix + name] = counts[:, position] * factor
+
+    rollup = pd.DataFrame(columns, index=grouped.index).astype(np.float64)
+    rollup.index.name = "Timestamp"
+    return rollup
+
+
+def _sorted_columns(columns):
+    """Totais primeiro e, dentro de cada grupo, valores em ordem alfabética (desempate igual ao de .mode())."""
+    totals = [column for column in TOTAL_COLUMNS if column in columns]
+    return totals + sorted(column for column in columns if column not in TOTAL_COLUMNS)
+
+
+
+
+# 2. Armazenamento das Resoluções
+class RollupStore:
+    """
+    Agregados de todas as sessões do armazenamento colunar, nas resoluções de LEVELS.
+    Seguro entre threads: o dashboard compartilha uma instância entre as sessões do navegador.
+    preferences: preferências usadas na análise; preferences_digest: hash do arquivo de preferências,
+    gravado junto dos agregados para descartá-los quando as preferências mudarem.
+    """
+
+    def __init__(self, root=ROLLUP_DIRECTORY, preferences=None, preferences_digest=None, switch_threshold=3, sample_seconds=5):
+        self.root = root
+        self.preferences = compile_preferences(preferences) if preferences is not None else get_preferences()
+        self.preferences_digest = preferences_digest
+        self.switch_threshold = switch_threshold
+        self.sample_seconds = sample_seconds
+        self.sessions = {}  # Nome da sessão → {"rows": linhas já agregadas, "tail": início do último bloco}
+        self.tails = {}  # Nome da sessão → contagens do último bloco (refeito quando a sessão cresce)
+        self._frames = {level: self._empty_frame() for level in LEVELS}
+        self._pending = {level: [] for level in LEVELS}  # Partes novas, juntadas na próxima leitura
+        self._lock = threading.RLock()
+
+    def _empty_frame(self):
+        return pd.DataFrame(columns=TOTAL_COLUMNS, index=pd.DatetimeIndex([], name="Timestamp"), dtype=np.float64)
+
+    def reset(self):
+        with self._lock:
+            self.sessions, self.tails = {}, {}
+            self._frames = {level: self._empty_frame() for level in LEVELS}
+            self._pending = {level: [] for level in LEVELS}
+
+    # Atualização
+    def add_blocks(self, rollup, sign=1):
+        """
+        Soma as contagens de blocos de 30 s (saída de block_rollup) em todas as resoluções.
+        sign=-1 subtrai (ex.: o último bloco de uma sessão antes de refazê-lo com as linhas novas).
+        """
+        if rollup.empty:
+            return
+        part = rollup if sign > 0 else -rollup
+        with self._lock:
+            for level in LEVELS:
+                if level != LEVELS[0]:
+                    part = part.groupby(part.index.floor(level)).sum()  # Cada resolução sai da anterior
+                self._pending[level].append(part)
+
+    def update_session(self, store, entry):
+        """
+        Agrega as linhas novas de uma sessão do armazenamento colunar (entry: item de store.sessions()).
+        Retorna: True se algo mudou.
+        """
+        name = entry["session"]
+        known = self.sessions.get(name)
+        if known is not None and known["rows"] == entry["rows"]:
+            return False
+
+        step = pd.Timedelta(LEVELS[0])
+        if known is None:
+            data = store.read_session(name)
+            grouped = analyze_attention_in_blocks(data, LEVELS[0], self.switch_threshold, self.preferences)
+            rollup = block_rollup(data, grouped, self.sample_seconds)
+        else:
+            # Refaz a partir do último bloco, lendo também os blocos anteriores que classify_blocks consulta
+            tail_start = pd.Timestamp(known["tail"])
+            context_start = max(tail_start - CONTEXT_BLOCKS * step, pd.Timestamp(entry["start"]).floor(LEVELS[0]))
+            data = store.read_session(name, context_start)
+            grouped = self._analyze_from(data, context_start)
+            rollup = block_rollup(data, grouped, self.sample_seconds)
+            rollup = rollup[rollup.index >= tail_start]
+
+        with self._lock:
+            if rollup.empty:
+                self.sessions[name] = {"rows": entry["rows"], "tail": None if known is None else known["tail"]}
+                return known is None
+            if known is not None and name in self.tails:
+                self.add_blocks(self.tails[name], sign=-1)
+            self.add_blocks(rollup)
+            self.tails[name] = rollup.iloc[[-1]]
+            self.sessions[name] = {"rows": entry["rows"], "tail": str(rollup.index[-1])}
+        return True
+
+    def _analyze_from(self, data, start):
+        """Mesma análise de analyze_attention_in_blocks, mas com os blocos começando em start."""
+        data["AttentionState"] = classify_state_vectorized(data, self.preferences)
+        grouped = aggregate_blocks(data, LEVELS[0], self.preferences.focus_apps, start=start)
+        grouped["Tipo de Atenção"] = classify_blocks(grouped, self.switch_threshold, preferences=self.preferences)
+        return grouped
+
+    def update_from_store(self, store):
+        """
+        Acrescenta as sessões novas e o final das sessões que cresceram desde a última chamada.
+        Se alguma sessão sumiu ou diminuiu (CSV substituído), os agregados são refeitos do zero.
+        Retorna: quantidade de sessões atualizadas (com root definido, os agregados são gravados se algo mudou).
+        """
+        with self._lock:
+            entries = store.sessions()
+            rows = {entry["session"]: entry["rows"] for entry in entries}
+            if any(rows.get(name, -1) < known["rows"] for name, known in self.sessions.items()):
+                self.reset()
+
+            changed = 0
+            for entry in entries:
+                if self.update_session(store, entry):
+                    changed += 1
+            if changed and self.root is not None:
+                self.save()
+            return changed
+
+    # Leitura
+    def _consolidate(self, level):
+        """Junta as partes novas ao DataFrame da resolução (somando os pontos que aparecem em mais de uma parte)."""
+        pending = self._pending[level]
+        if pending:
+            frame = pd.concat([self._frames[level]] + pending).fillna(0.0)
+            frame = frame.groupby(level=0).sum()
+            frame.index.name = "Timestamp"
+            self._frames[level] = frame[_sorted_columns(frame.columns)]
+            self._pending[level] = []
+        return self._frames[level]
+
+    def frame(self, level, start=None, end=None):
+        """Contagens da resolução com start <= ponto < end (o ponto que contém start também entra)."""
+        with self._lock:
+            frame = self._consolidate(level)
+        index = frame.index
+        mask = np.ones(len(index), dtype=bool)
+        if start is not None:
+            mask &= index >= pd.Timestamp(start).floor(level)
+        if end is not None:
+            mask &= index < pd.Timestamp(end)
+        return frame[mask]
+
+    def time_range(self):
+        """(início, fim) dos blocos com amostras, ou None se ainda não há dados."""
+        frame = self.frame(LEVELS[0])
+        frame = frame[frame["Amostras"] > 0]
+        if frame.empty:
+            return None
+        return frame.index[0], frame.index[-1] + pd.Timedelta(LEVELS[0])
+
+    # Gravação
+    def save(self):
+        """Grava cada resolução (.npz) e o meta.json numa pasta temporária e só depois a coloca no lugar."""
+        with self._lock:
+            temp_dir = self.root + ".tmp"
+            os.makedirs(temp_dir, exist_ok=True)
+            columns = {}
+            for level in LEVELS:
+                frame = self._consolidate(level)
+                columns[level] = list(frame.columns)
+                with open(os.path.join(temp_dir, f"{level}.npz"), "wb") as f:
+                    np.savez(f, index=frame.index.asi8, values=frame.to_numpy(dtype=np.float64))
+
+            meta = {
+                "version": ROLLUP_VERSION,
+                "preferences_digest": self.preferences_digest,
+                "columns": columns,
+                "sessions": self.sessions,
+                "tails": {name: tail.iloc[0].to_dict() for name, tail in self.tails.items()},
+            }
+            with open(os.path.join(temp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+            if os.path.exists(self.root):
+                for file_name in os.listdir(self.root):
+                    os.remove(os.path.join(self.root, file_name))
+                os.rmdir(self.root)
+            os.replace(temp_dir, self.root)
+
+    def load(self):
+        """
+        Lê os agregados gravados. Retorna False (e mantém tudo vazio) se não existirem
+        ou tiverem sido calculados com outras preferências ou outra versão do formato.
+        """
+        meta_path = os.path.join(self.root, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != ROLLUP_VERSION or meta.get("preferences_digest") != self.preferences_digest:
+                return False
+
+            frames = {}
+            for level in LEVELS:
+                with np.load(os.path.join(self.root, f"{level}.npz")) as arrays:
+                    index = pd.DatetimeIndex(arrays["index"].astype("datetime64[ns]"), name="Timestamp")
+                    frames[level] = pd.DataFrame(arrays["values"], index=index, columns=meta["columns"][level])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Erro ao carregar os agregados de {self.root}: {e}")
+            return False
+
+        with self._lock:
+            self.reset()
+            self._frames = frames
+            self.sessions = meta["sessions"]
+            self.tails = {
+                name: pd.DataFrame([values], index=pd.DatetimeIndex([self.sessions[name]["tail"]], name="Timestamp"))
+                for name, values in meta["tails"].items()
+            }
+        return True
+
+
+
+
+# 3. Escolha da Resolução
+def choose_level(start, end, max_points=2000):
+    """
+    Resolução para o intervalo visível: a mais detalhada em que o intervalo tem no máximo max_points pontos
+    (com 2000 pontos: até ~16 h em blocos de 30 s; até ~6,9 dias em pontos de 5 min, de modo que uma semana
+    inteira, 2016 pontos, já vai para 1 h; até ~83 dias em pontos de 1 h; acima disso, pontos de 1 dia).
+    """
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for level in LEVELS:
+        if math.ceil(span / pd.Timedelta(level)) <= max_points:
+            return level
+    return LEVELS[-1]
+
+
+
+
+# 4. Visões para o Dashboard
+def _group(frame, prefix, exclude=()):
+    """Colunas de um grupo (sem o prefixo), em ordem alfabética."""
+    columns = [column for column in frame.columns if column.startswith(prefix) and column[len(prefix):] not in exclude]
+    group = frame[columns]
+    group.columns = [column[len(prefix):] for column in columns]
+    return group
+
+
+def _most_frequent(frame, prefix, default, exclude=()):
+    """Valor com a maior contagem em cada ponto (empate: o primeiro em ordem alfabética); default se nenhum."""
+    group = _group(frame, prefix, exclude)
+    result = np.full(len(frame), default, dtype=object)
+    if group.shape[1] == 0:
+        return result
+    counts = group.to_numpy()
+    has_values = counts.max(axis=1) > 0
+    result[has_values] = np.asarray(group.columns, dtype=object)[counts[has_values].argmax(axis=1)]
+    return result
+
+
+def rollup_blocks(frame):
+    """
+    Converte as contagens de uma resolução nas colunas de analyze_attention_in_blocks (entrada da linha do tempo).
+    Percentuais são das amostras do ponto; software, posição da cabeça, som e tipo de atenção são os mais frequentes.
+    """
+    samples = frame["Amostras"].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        attentive_pct = frame["Amostras Atento"].to_numpy() / samples * 100
+        distracted_pct = frame["Amostras Distraído"].to_numpy() / samples * 100
+
+    blocks = pd.DataFrame({
+        "Atento (%)": attentive_pct,
+        "Distraído (%)": distracted_pct,
+        "Trocas de Software": frame["Trocas de Software"].to_numpy(dtype=np.int64),
+        "Software Mais Usado": _most_frequent(frame, SOFTWARE_PREFIX, "Desconhecido"),
+        "Posição Cabeça Mais Comum": _most_frequent(frame, HEAD_PREFIX, "Sem Detecção de Rosto"),
+        "Som Predominante": _most_frequent(frame, SOUND_PREFIX, "Irrelevante para Análise", exclude=("Irrelevante para Análise",)),
+        "Looking Down Count": frame["Looking Down Count"].to_numpy(dtype=np.int64),
+        "Tipo de Atenção": _most_frequent(frame, TYPE_PREFIX, "Neutro"),
+    }, index=frame.index)
+    return blocks[BLOCK_COLUMNS + ["Tipo de Atenção"]]
+
+
+def rollup_software_usage(frame):
+    """Tempo de uso de cada software em minutos (mesmo formato de calculate_software_usage)."""
+    seconds = _group(frame, SOFTWARE_PREFIX).sum()
+    minutes = (seconds[seconds > 0] / 60).sort_values(ascending=False, kind="stable").round(2)
+    return minutes.rename("count").rename_axis("ActiveWindow")
+
+
+def rollup_attention_means(frame):
+    """Média de "Atento (%)" e "Distraído (%)" dos blocos (entrada de plot_attention_pie_chart)."""
+    blocks = frame["Blocos"].sum()
+    if blocks == 0:
+        return pd.DataFrame(columns=["Atento (%)", "Distraído (%)"])
+    return pd.DataFrame({
+        "Atento (%)": [frame["Soma Atento (%)"].sum() / blocks],
+        "Distraído (%)": [frame["Soma Distraído (%)"].sum() / blocks],
+    })
+
+
+def rollup_sound_impact(frame, block_interval_seconds=30):
+    """Mesmo formato de calculate_sound_impact, a partir dos blocos e da distração somados por som."""
+    sound_blocks = _group(frame, SOUND_PREFIX, exclude=("Irrelevante para Análise",)).sum()
+    sound_blocks = sound_blocks[sound_blocks > 0].sort_values(ascending=False, kind="stable")
+    distraction = _group(frame, SOUND_DISTRACTION_PREFIX).sum().reindex(sound_blocks.index)
+    return pd.DataFrame({
+        "Som Predominante": list(sound_blocks.index),
+        "Tempo Total do Som (min)": (sound_blocks * block_interval_seconds / 60).to_numpy(),
+        "Distração Média (%)": (distraction / sound_blocks).to_numpy(),
+    })
@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import deque
+from metrics import NULL_METRICS
+
+'''
+Pipeline concorrente dos sensores do coletor (áudio, janela ativa e posição da cabeça).
+1.	Slot com o valor mais recente de cada sensor e um pequeno histórico circular (LatestValueSlot).
+2.	Thread de leitura contínua de cada sensor (SensorWorker).
+3.	Amostrador com período fixo que junta as leituras mais recentes de todos os sensores (SensorPipeline).
+Cada sensor roda no seu próprio ritmo: o período do loop principal deixa de ser a soma das latências
+dos sensores, e um sensor travado não bloqueia os demais (a leitura dele expira e vira o valor padrão).
+'''
+
+
+# 1. Valor Mais Recente de um Sensor
+class SensorReading:
+    """Uma leitura de sensor: valor, instante da captura (time.monotonic) e duração da leitura."""
+
+    __slots__ = ("value", "captured_at", "latency", "sequence")
+
+    def __init__(self, value, captured_at, latency, sequence):
+        self.value = value
+        self.captured_at = captured_at
+        self.latency = latency
+        self.sequence = sequence  # Número da leitura, para saber se houve leitura nova desde a última amostra
+
+    def age(self, now=None):
+        """Tempo (em segundos) desde a captura."""
+        return (time.monotonic() if now is None else now) - self.captured_at
+
+
+class LatestValueSlot:
+    """Guarda a leitura mais recente de um sensor e as últimas `history` leituras, com acesso seguro entre threads."""
+
+    def __init__(self, history=8):
+        self._lock = threading.Lock()
+        self._readings = deque(maxlen=history)
+        self._sequence = 0
+
+    def put(self, value, captured_at, latency):
+        with self._lock:
+            self._sequence += 1
+            self._readings.append(SensorReading(value, captured_at, latency, self._sequence))
+
+    def latest(self):
+        """Leitura mais recente (ou None se o sensor ainda não produziu nenhuma)."""
+        with self._lock:
+            return self._readings[-1] if self._readings else None
+
+    def history(self):
+        """Cópia das últimas leituras, da mais antiga para a mais recente."""
+        with self._lock:
+            return list(self._readings)
+
+
+
+
+# 2. Leitura Contínua de um Sensor
+class SensorWorker(threading.Thread):
+    """
+    Chama read_function repetidamente em uma thread própria e publica cada resultado no slot.
+    interval: tempo mínimo (em segundos) entre o início de duas leituras; 0 lê sem pausa
+              (para sensores que já controlam o próprio ritmo, como o áudio).
+    Erros de leitura são contados e mostrados, sem derrubar a thread.
+    """
+
+    error_pause = 0.5  # Pausa mínima após um erro, para um sensor com falha não ocupar a CPU
+
+    def __init__(self, name, read_function, interval=1.0, history=8):
+        super().__init__(name=f"sensor-{name}", daemon=True)
+        self.sensor_name = name
+        self.read_function = read_function
+        self.interval = interval
+        self.slot = LatestValueSlot(history)
+        self.errors = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            interval = self.interval
+            try:
+                value = self.read_function()
+            except Exception as e:
+                self.errors += 1
+                interval = max(interval, self.error_pause)
+                print(f"Erro no sensor {self.sensor_name}: {e}")
+            else:
+                finished = time.monotonic()
+                self.slot.put(value, finished, finished - started)
+
+            # Espera o restante do intervalo, acordando imediatamente se a thread for parada
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0:
+                self._stop_event.wait(remaining)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+
+
+# 3. Amostragem com Período Fixo
+class SensorPipeline:
+    """
+    Junta os sensores em amostras alinhadas em um período fixo (tick).
+    A cada tick, usa a leitura mais recente de cada sensor; se ela for mais antiga que o timeout
+    do sensor (ou ainda não existir), usa o valor padrão do sensor.
+    """
+
+    def __init__(self, tick=5.0, metrics=None):
+        self.tick = tick
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.workers = {}
+        self.timeouts = {}
+        self.defaults = {}
+        self.missed_ticks = 0  # Ticks pulados porque o consumidor das amostras atrasou
+        self.stale_samples = {}  # Sensor → quantas amostras usaram o valor padrão
+        self._stop_event = threading.Event()
+        self.metrics.add_collector(self._metric_values)
+
+    def _metric_values(self):
+        values = {"missed_ticks": self.missed_ticks}
+        for name, count in self.stale_samples.items():
+            values[f"stale_samples_{name}"] = count
+        return values
+
+    def add_sensor(self, name, read_function, interval=1.0, timeout=None, default=None, history=8):
+        """
+        Registra um sensor.
+        interval: intervalo entre leituras do sensor.
+        timeout: idade máxima (em segundos) de uma leitura para ainda ser usada; padrão: dois ticks.
+        default: valor usado quando não há leitura recente.
+        """
+        self.workers[name] = SensorWorker(name, read_function, interval, history)
+        self.timeouts[name] = timeout if timeout is not None else 2 * self.tick
+        self.defaults[name] = default
+        self.stale_samples[name] = 0
+
+    def start(self):
+        for worker in self.workers.values():
+            worker.start()
+
+    def stop(self, join_timeout=2.0):
+        """Para o amostrador e as threads dos sensores (sem esperar indefinidamente por um sensor travado)."""
+        self._stop_event.set()
+        for worker in self.workers.values():
+            worker.stop()
+        for worker in self.workers.values():
+            if worker.is_alive():
+                worker.join(join_timeout)
+
+    def sample(self):
+        """Retorna um dict com o valor mais recente (ou o padrão, se expirado) de cada sensor."""
+        now = time.monotonic()
+        values = {}
+        for name, worker in self.workers.items():
+            reading = worker.slot.latest()
+            if reading is None or reading.age(now) > self.timeouts[name]:
+                self.stale_samples[name] += 1
+                values[name] = self.defaults[name]
+            else:
+                values[name] = reading.value
+        return values
+
+    def samples(self):
+        """
+        Gera uma amostra a cada tick, alinhada a um relógio fixo (os atrasos não se acumulam).
+        Se o consumidor demorar mais que um tick, os ticks perdidos são pulados e contados em missed_ticks.
+        Produz: (timestamp em segundos desde 1970, dict de valores por sensor).
+        """
+        next_tick = time.monotonic() + self.tick
+        while not self._stop_event.is_set():
+            delay = next_tick - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+
+            self.metrics.record_tick(scheduled_at=next_tick)
+            yield time.time(), self.sample()
+
+            next_tick += self.tick
+            now = time.monotonic()
+            if now >= next_tick:
+                missed = int((now - next_tick) // self.tick) + 1
+                self.missed_ticks += missed
+                next_tick += missed * self.tick
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from audio_groups import class_to_group
+from preferences import compile_preferences, get_preferences
+from session_schema import TIMESTAMP_FORMAT, detect_schema_version
+
+'''
+Leitura dos arquivos RawMultimodalData_*.csv.
+As colunas de texto que se repetem milhares de vezes por sessão são carregadas como categóricas
+(dicionário de valores + códigos inteiros), com conjuntos de categorias fixos e conhecidos:
+    - AudioClass: classes mapeadas em audio_groups.class_to_group.
+    - AudioGroup: grupos funcionais de audio_groups (mais "Não Classificado").
+    - HeadPose: rótulos gerados pelo head_module.
+    - ActiveWindow: softwares de foco das preferências do usuário.
+Valores fora desses conjuntos são acrescentados ao final das categorias, sem perda de dados.
+Os arquivos v1 (Timestamp em texto) e v2 (TimestampMs + TZ) são lidos para o mesmo formato, com
+Timestamp em hora local (ver session_schema.py).
+'''
+
+
+AUDIO_CLASS_CATEGORIES = sorted(class_to_group)
+AUDIO_GROUP_CATEGORIES = sorted(set(class_to_group.values()) | {"Não Classificado"})
+HEAD_POSE_CATEGORIES = [
+    "Olhando para Frente", "Olhando para a Esquerda", "Olhando para a Direita",
+    "Olhando para Cima", "Olhando para Baixo", "Sem Detecção de Rosto",
+    "No Frame Captured", "No Face Detected",
+]
+NO_URL = "Nenhuma URL"  # Identificador usado quando não há URL (janela diferente do Safari)
+
+# Tipos usados diretamente pelo pd.read_csv (evita criar uma string Python por célula)
+SESSION_CSV_DTYPES = {
+    "Timestamp": "object",
+    "TimestampMs": "int64",
+    "TZ": "category",
+    "AudioClass": "category",
+    "AudioScore": "float32",
+    "AudioGroup": "category",
+    "ActiveWindow": "category",
+    "URL": "category",
+    "HeadPose": "category",
+}
+
+
+def _with_known_categories(column, known):
+    """Fixa as categorias da coluna: primeiro as conhecidas, depois as observadas que não estavam na lista."""
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype("category")
+    known_set = set(known)
+    extra = sorted((value for value in column.cat.categories if value not in known_set), key=str)
+    return column.cat.set_categories(list(known) + extra)
+
+
+_V1_SEPARATORS = np.frombuffer(b":: //\x00", dtype=np.uint8)  # Bytes fixos do formato v1 (posições 2, 5, 8, 11, 14) e o fim do texto
+
+
+def parse_v1_timestamps(values):
+    """
+    Converte timestamps do esquema v1 ("%H:%M:%S %d/%m/%Y") de uma só vez, lendo os dígitos
+    de cada posição fixa do texto como bytes, sem interpretar data por data.
+    Se algum valor não estiver exatamente nesse formato, usa pd.to_datetime com o formato explícito.
+    Retorna: array datetime64[ns].
+    """
+    values = np.asarray(values, dtype=object)
+    try:
+        raw = values.astype("S20")  # Um byte a mais que o formato para detectar textos longos demais
+    except (UnicodeEncodeError, ValueError):
+        raw = None
+
+    if raw is not None and len(raw):
+        chars = raw.view(np.uint8).reshape(len(raw), 20)
+        digits = chars[:, [0, 1, 3, 4, 6, 7, 9, 10, 12, 13, 15, 16, 17, 18]].astype(np.int32) - ord("0")
+        separators = chars[:, [2, 5, 8, 11, 14, 19]]
+        well_formed = (
+            ((digits >= 0) & (digits <= 9)).all()
+            and (separators == _V1_SEPARATORS).all()
+        )
+        if well_formed:
+            hours = digits[:, 0] * 10 + digits[:, 1]
+            minutes = digits[:, 2] * 10 + digits[:, 3]
+            seconds = digits[:, 4] * 10 + digits[:, 5]
+            day = digits[:, 6] * 10 + digits[:, 7]
+            month = digits[:, 8] * 10 + digits[:, 9]
+            year = digits[:, 10] * 1000 + digits[:, 11] * 100 + digits[:, 12] * 10 + digits[:, 13]
+
+            month_start = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+            dates = month_start.astype("datetime64[D]") + (day - 1)
+            valid = (
+                (month >= 1) & (month <= 12) & (day >= 1)
+                & (dates.astype("datetime64[M]") == month_start)  # Dia existe no mês (ex.: 30/02 não)
+                & (hours < 24) & (minutes < 60) & (seconds < 60)
+            ).all()
+            if valid:
+                clock = (hours * 3600 + minutes * 60 + seconds).astype("timedelta64[s]")
+                return (dates + clock).astype("datetime64[ns]")
+
+    return pd.to_datetime(pd.Series(values), format=TIMESTAMP_FORMAT).to_numpy(dtype="datetime64[ns]")
+
+
+def _offset_minutes(tz):
+    """Converte um deslocamento "+HH:MM" (ou "+HHMM") em minutos; vazio ou ausente é tratado como UTC."""
+    if not isinstance(tz, str) or not tz:
+        return 0
+    sign = -1 if tz[0] == "-" else 1
+    digits = tz.lstrip("+-").replace(":", "")
+    return sign * (int(digits[:2]) * 60 + int(digits[2:] or 0))
+
+
+def parse_v2_timestamps(timestamp_ms, tz=None):
+    """
+    Converte TimestampMs (milissegundos UTC) + TZ do esquema v2 para a hora local, como no esquema v1.
+    O deslocamento é calculado uma vez por valor distinto de TZ (uma sessão costuma ter um ou dois).
+    Retorna: array datetime64[ns].
+    """
+    utc = np.asarray(timestamp_ms, dtype=np.int64).astype("datetime64[ms]")
+    if tz is None:
+        return utc.astype("datetime64[ns]")
+    codes, uniques = pd.factorize(tz)
+    offsets = np.array([_offset_minutes(value) for value in uniques] + [0], dtype=np.int64)
+    return (utc + offsets[codes].astype("timedelta64[m]")).astype("datetime64[ns]")
+
+
+def encode_session_columns(data, preferences=None):
+    """
+    Converte um DataFrame já lido do CSV (esquema v1 ou v2) para o formato usado na análise:
+    Timestamp como datetime em hora local, URL vazia como "Nenhuma URL", AudioScore em float32 e
+    AudioClass, AudioGroup, ActiveWindow, URL e HeadPose como categóricas com categorias fixas.
+    preferences: preferências do usuário (dict ou CompiledPreferences); se não informado, usa get_preferences().
+    """
+    preferences = compile_preferences(preferences) if preferences is not None else get_preferences()
+
+    if detect_schema_version(data.columns) == 2:
+        timestamps = parse_v2_timestamps(data["TimestampMs"], data["TZ"] if "TZ" in data.columns else None)
+        data = data.drop(columns=[column for column in ("TimestampMs", "TZ") if column in data.columns])
+        data.insert(0, "Timestamp", timestamps)
+    elif "Timestamp" in data.columns and not pd.api.types.is_datetime64_any_dtype(data["Timestamp"]):
+        data["Timestamp"] = parse_v1_timestamps(data["Timestamp"])
+    if "AudioScore" in data.columns:
+        data["AudioScore"] = data["AudioScore"].astype("float32")
+
+    known_categories = {
+        "AudioClass": AUDIO_CLASS_CATEGORIES,
+        "AudioGroup": AUDIO_GROUP_CATEGORIES,
+        "HeadPose": HEAD_POSE_CATEGORIES,
+        "ActiveWindow": sorted(preferences.focus_apps),
+        "URL": [NO_URL],
+    }
+    for column, known in known_categories.items():
+        if column in data.columns:
+            data[column] = _with_known_categories(data[column], known)
+
+    if "URL" in data.columns:
+        data["URL"] = data["URL"].fillna(NO_URL)  # Substituir valores vazios por um identificador padrão
+    return data
+
+
+def read_session_csv(csv_path, preferences=None):
+    """
+    Lê um arquivo RawMultimodalData_*.csv (esquema v1 ou v2) com as colunas de texto como categóricas e AudioScore em float32.
+    Retorna: DataFrame pronto para classify_state_vectorized e analyze_attention_in_blocks.
+    """
+    data = pd.read_csv(csv_path, dtype=SESSION_CSV_DTYPES)
+    return encode_session_columns(data, preferences)
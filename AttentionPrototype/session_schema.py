@@ -0,0 +1,61 @@
+import time
+
+'''
+Esquema das linhas gravadas nos arquivos RawMultimodalData_*.csv.
+1.	Versões do esquema e detecção da versão a partir do cabeçalho (detect_schema_version).
+2.	Montagem das linhas gravadas pelo main.py (make_session_row).
+
+Versões:
+    v1: Timestamp como texto "%H:%M:%S %d/%m/%Y" (hora local, sem fuso).
+    v2: TimestampMs (milissegundos desde 1970-01-01 UTC, inteiro) e TZ (deslocamento do fuso, ex.: "-03:00").
+        A hora local é TimestampMs + TZ, então a leitura não depende de interpretar datas em texto.
+As demais colunas são as mesmas nas duas versões.
+Este módulo não depende do pandas, para que o coletor (main.py) possa usá-lo sem carregar a análise.
+'''
+
+
+# 1. Versões do Esquema
+SCHEMA_VERSION = 2  # Versão gravada pelo main.py
+
+TIMESTAMP_FORMAT = "%H:%M:%S %d/%m/%Y"  # Formato do Timestamp no esquema v1
+DATA_COLUMNS = ["AudioClass", "AudioScore", "AudioGroup", "ActiveWindow", "URL", "HeadPose"]
+SESSION_HEADERS = {
+    1: ["Timestamp"] + DATA_COLUMNS,
+    2: ["TimestampMs", "TZ"] + DATA_COLUMNS,
+}
+SESSION_HEADER = SESSION_HEADERS[SCHEMA_VERSION]
+
+
+def detect_schema_version(columns):
+    """
+    Identifica a versão do esquema pelos nomes das colunas do cabeçalho.
+    Lança ValueError se o cabeçalho não corresponder a nenhuma versão conhecida.
+    """
+    columns = list(columns)
+    if "TimestampMs" in columns:
+        return 2
+    if "Timestamp" in columns:
+        return 1
+    raise ValueError(f"Cabeçalho de sessão desconhecido: {columns}")
+
+
+# 2. Linhas Gravadas pelo Coletor
+def utc_offset(timestamp=None):
+    """Deslocamento do fuso local em relação ao UTC no instante informado, no formato "+HH:MM"."""
+    local = time.localtime(timestamp)
+    offset_minutes = local.tm_gmtoff // 60
+    sign = "+" if offset_minutes >= 0 else "-"
+    hours, minutes = divmod(abs(offset_minutes), 60)
+    return f"{sign}{hours:02d}:{minutes:02d}"
+
+
+def make_session_row(audio_class, audio_score, audio_group, active_window, url, head_pose, timestamp=None):
+    """
+    Monta uma linha no esquema atual (v2).
+    timestamp: segundos desde 1970 (time.time()); se não informado, usa o instante atual.
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    return [
+        int(round(timestamp * 1000)), utc_offset(timestamp),
+        audio_class, audio_score, audio_group, active_window, url, head_pose,
+    ]
@@ -0,0 +1,206 @@
+import glob
+import json
+import os
+import numpy as np
+import pandas as pd
+from session_io import read_session_csv
+
+'''
+Armazenamento colunar das sessões coletadas.
+Cada RawMultimodalData_*.csv é convertido uma única vez para uma pasta com um arquivo .npy por coluna,
+ordenado pelo Timestamp. A leitura usa np.load(mmap_mode="r"), então pedir as amostras entre T1 e T2
+lê apenas as linhas desse intervalo, sem reinterpretar o CSV inteiro.
+
+Estrutura de cada sessão (<raiz>/<nome da sessão>/):
+    Timestamp.npy             datetime64[ns], em ordem crescente
+    AudioScore.npy            float32
+    <coluna>.codes.npy        códigos inteiros (int16) das colunas categóricas; -1 indica valor ausente
+    meta.json                 categorias de cada coluna, quantidade de linhas, início/fim e CSV de origem
+O arquivo <raiz>/index.json lista as sessões com início e fim, para descartar sessões fora do intervalo.
+'''
+
+
+STORE_DIRECTORY = os.path.join("data", "store")  # Relativo ao diretório onde o dashboard é executado
+CATEGORICAL_COLUMNS = ["AudioClass", "AudioGroup", "ActiveWindow", "URL", "HeadPose"]
+SESSION_COLUMNS = ["Timestamp", "AudioClass", "AudioScore", "AudioGroup", "ActiveWindow", "URL", "HeadPose"]
+
+
+class SessionStore:
+    """Conversor e leitor das sessões em formato colunar (arquivos .npy mapeados em memória)."""
+
+    def __init__(self, root=STORE_DIRECTORY):
+        self.root = root
+        self._index = None
+        self._meta = {}  # Nome da sessão → meta.json já lido
+
+    # Conversão
+    def convert_csv(self, csv_path, preferences=None, force=False):
+        """
+        Converte um CSV de sessão para o formato colunar.
+        Se a sessão já estiver convertida e o CSV não tiver mudado, nada é feito (a menos que force=True).
+        Retorna: nome da sessão no armazenamento.
+        """
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        session_dir = os.path.join(self.root, name)
+        source_mtime = os.path.getmtime(csv_path)
+
+        index = self._load_index()
+        entry = index.get(name)
+        if not force and entry is not None and entry["source_mtime"] == source_mtime:
+            return name
+
+        data = read_session_csv(csv_path, preferences)
+        data = data.sort_values("Timestamp", kind="stable").reset_index(drop=True)
+
+        # Grava em uma pasta temporária e só depois a move para o lugar final (sem sessões pela metade)
+        temp_dir = session_dir + ".tmp"
+        os.makedirs(temp_dir, exist_ok=True)
+        np.save(os.path.join(temp_dir, "Timestamp.npy"), data["Timestamp"].to_numpy(dtype="datetime64[ns]"))
+        np.save(os.path.join(temp_dir, "AudioScore.npy"), data["AudioScore"].to_numpy(dtype=np.float32))
+        categories = {}
+        for column in CATEGORICAL_COLUMNS:
+            values = data[column].astype("category")
+            np.save(os.path.join(temp_dir, f"{column}.codes.npy"), values.cat.codes.to_numpy(dtype=np.int16))
+            categories[column] = [str(category) for category in values.cat.categories]
+
+        meta = {
+            "rows": len(data),
+            "start": str(data["Timestamp"].min()) if len(data) else None,
+            "end": str(data["Timestamp"].max()) if len(data) else None,
+            "source": csv_path,
+            "source_mtime": source_mtime,
+            "categories": categories,
+        }
+        with open(os.path.join(temp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        if os.path.exists(session_dir):
+            for file_name in os.listdir(session_dir):
+                os.remove(os.path.join(session_dir, file_name))
+            os.rmdir(session_dir)
+        os.replace(temp_dir, session_dir)
+
+        index[name] = {key: meta[key] for key in ("rows", "start", "end", "source_mtime")}
+        self._save_index(index)
+        self._meta.pop(name, None)
+        return name
+
+    def convert_directory(self, csv_directory="data", preferences=None):
+        """Converte todos os RawMultimodalData_*.csv da pasta (apenas os novos ou alterados)."""
+        pattern = os.path.join(csv_directory, "RawMultimodalData_*.csv")
+        return [self.convert_csv(csv_path, preferences) for csv_path in sorted(glob.glob(pattern))]
+
+    # Leitura
+    def sessions(self):
+        """Retorna as sessões armazenadas com quantidade de linhas, início e fim, em ordem cronológica."""
+        index = self._load_index()
+        return sorted(
+            ({"session": name, **entry} for name, entry in index.items() if entry["rows"]),
+            key=lambda entry: entry["start"],
+        )
+
+    def read_session(self, name, start=None):
+        """
+        Lê uma sessão inteira.
+        start: lê apenas as amostras com Timestamp >= start (ex.: só o final de uma sessão que cresceu).
+        """
+        if start is None:
+            return self._read_rows(name, 0, None)
+        timestamps = np.load(self._path(name, "Timestamp.npy"), mmap_mode="r")
+        first = int(np.searchsorted(timestamps, pd.Timestamp(start).to_datetime64(), side="left"))
+        return self._read_rows(name, first, None)
+
+    def read_range(self, start=None, end=None):
+        """
+        Lê as amostras com start <= Timestamp < end de todas as sessões.
+        Só as sessões que se sobrepõem ao intervalo são abertas, e de cada uma só as linhas do intervalo são lidas.
+        start/end: datas (qualquer valor aceito por pd.Timestamp); None deixa o intervalo aberto daquele lado.
+        Retorna: DataFrame no mesmo formato de session_io.read_session_csv.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        parts = []
+        for entry in self.sessions():
+            if end is not None and pd.Timestamp(entry["start"]) >= end:
+                continue
+            if start is not None and pd.Timestamp(entry["end"]) < start:
+                continue
+
+            timestamps = np.load(self._path(entry["session"], "Timestamp.npy"), mmap_mode="r")
+            first = 0 if start is None else int(np.searchsorted(timestamps, start.to_datetime64(), side="left"))
+            last = len(timestamps) if end is None else int(np.searchsorted(timestamps, end.to_datetime64(), side="left"))
+            if last > first:
+                parts.append(self._read_rows(entry["session"], first, last))
+
+        if not parts:
+            return self._empty_frame()
+        return self._concat(parts)
+
+    # Funções internas
+    def _path(self, name, file_name):
+        return os.path.join(self.root, name, file_name)
+
+    def _load_index(self):
+        if self._index is None:
+            index_path = os.path.join(self.root, "index.json")
+            if os.path.exists(index_path):
+                with open(index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            else:
+                self._index = {}
+        return self._index
+
+    def _save_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        index_path = os.path.join(self.root, "index.json")
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(index_path + ".tmp", index_path)
+        self._index = index
+
+    def _load_meta(self, name):
+        if name not in self._meta:
+            with open(self._path(name, "meta.json"), "r", encoding="utf-8") as f:
+                self._meta[name] = json.load(f)
+        return self._meta[name]
+
+    def _read_rows(self, name, first, last):
+        """Lê as linhas [first, last) de uma sessão a partir dos arquivos mapeados em memória."""
+        meta = self._load_meta(name)
+        rows = slice(first, last)
+        data = {
+            "Timestamp": np.array(np.load(self._path(name, "Timestamp.npy"), mmap_mode="r")[rows]),
+            "AudioScore": np.array(np.load(self._path(name, "AudioScore.npy"), mmap_mode="r")[rows]),
+        }
+        for column in CATEGORICAL_COLUMNS:
+            codes = np.array(np.load(self._path(name, f"{column}.codes.npy"), mmap_mode="r")[rows])
+            data[column] = pd.Categorical.from_codes(codes, categories=meta["categories"][column])
+        return pd.DataFrame(data)[SESSION_COLUMNS]
+
+    def _concat(self, parts):
+        """Junta as partes de várias sessões, unindo as categorias de cada coluna."""
+        if len(parts) == 1:
+            return parts[0]
+        data = pd.concat([part[["Timestamp", "AudioScore"]] for part in parts], ignore_index=True)
+        for column in CATEGORICAL_COLUMNS:
+            data[column] = pd.api.types.union_categoricals([part[column] for part in parts])
+        return data[SESSION_COLUMNS]
+
+    def _empty_frame(self):
+        data = pd.DataFrame({
+            "Timestamp": pd.Series([], dtype="datetime64[ns]"),
+            "AudioScore": pd.Series([], dtype="float32"),
+        })
+        for column in CATEGORICAL_COLUMNS:
+            data[column] = pd.Categorical([])
+        return data[SESSION_COLUMNS]
+
+
+
+
+if __name__ == "__main__":
+    # Converte todos os CSVs da pasta de dados para o formato colunar
+    store = SessionStore()
+    converted = store.convert_directory()
+    print(f"{len(converted)} sessões disponíveis em {store.root}.")
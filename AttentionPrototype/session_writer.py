@@ -0,0 +1,317 @@
+import csv
+import glob
+import io
+import os
+import queue
+import threading
+import time
+from metrics import NULL_METRICS
+from session_schema import SESSION_HEADER
+
+'''
+Gravação das amostras do coletor nos arquivos RawMultimodalData_*.csv.
+1.	Fila limitada entre o loop de amostragem e uma thread de gravação (SessionCsvWriter.write).
+2.	Gravação em lotes: o lote é gravado quando atinge flush_rows linhas ou quando passa flush_interval segundos.
+3.	Segmentos: um arquivo novo por dia e/ou ao atingir max_bytes; o arquivo só aparece com o nome final
+	depois que o cabeçalho já foi gravado (arquivo temporário + os.replace).
+4.	Recuperação: linhas incompletas deixadas por uma queda são removidas ao iniciar (repair_partial_line).
+Cada lote é gravado com uma única escrita de linhas completas, então o arquivo nunca fica com meia linha
+enquanto o processo está vivo, e o arquivo não é reaberto a cada amostra.
+'''
+
+
+FSYNC_MODES = ("never", "batch", "close")  # never: o sistema decide; batch: após cada lote; close: ao fechar/rotacionar
+
+
+# 4. Recuperação de Arquivos Interrompidos
+def repair_partial_line(path):
+    """
+    Remove do final do arquivo uma linha sem quebra de linha (gravação interrompida por uma queda).
+    Retorna: quantidade de bytes removidos.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    with open(path, "r+b") as f:
+        position = size
+        while position > 0:
+            chunk_start = max(0, position - 65536)
+            f.seek(chunk_start)
+            chunk = f.read(position - chunk_start)
+            last_newline = chunk.rfind(b"\n")
+            if last_newline >= 0:
+                keep = chunk_start + last_newline + 1
+                break
+            position = chunk_start
+        else:
+            keep = 0
+        if keep < size:
+            f.truncate(keep)
+            f.flush()
+            os.fsync(f.fileno())
+    return size - keep
+
+
+def _fsync_directory(directory):
+    """Garante que a criação/renomeação de arquivos na pasta chegou ao disco (sem efeito onde não é suportado)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+
+
+class SessionCsvWriter:
+    """
+    Grava as linhas da sessão em segundo plano, em lotes, com rotação dos arquivos.
+    directory: pasta onde os segmentos são criados (RawMultimodalData_<data e hora>.csv).
+    rotation: "daily" para iniciar um arquivo novo a cada dia, ou None.
+    max_bytes: tamanho máximo de cada segmento (None: sem limite).
+    flush_rows / flush_interval: o lote é gravado ao atingir essa quantidade de linhas ou esse tempo (segundos).
+    fsync_mode: "never", "batch" ou "close" (ver FSYNC_MODES).
+    queue_size: linhas que podem aguardar gravação; com a fila cheia, write() espera até put_timeout e descarta a linha.
+    close_timeout: tempo máximo (segundos) que close() espera pela thread de gravação antes de desistir dela.
+    metrics: CollectorMetrics que recebe a duração de cada lote ("csv_write") e os contadores do gravador.
+    """
+
+    def __init__(self, directory, header=SESSION_HEADER, prefix="RawMultimodalData_", rotation="daily",
+                 max_bytes=None, flush_rows=50, flush_interval=1.0, fsync_mode="batch", queue_size=10000,
+                 put_timeout=1.0, close_timeout=10.0, metrics=None):
+        if fsync_mode not in FSYNC_MODES:
+            raise ValueError(f"fsync_mode deve ser um de {FSYNC_MODES}.")
+        self.directory = directory
+        self.header = list(header)
+        self.prefix = prefix
+        self.rotation = rotation
+        self.max_bytes = max_bytes
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync_mode = fsync_mode
+        self.put_timeout = put_timeout
+        self.close_timeout = close_timeout
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+        self.current_path = None  # Segmento sendo gravado
+        self.segments = []  # Todos os segmentos criados por este gravador
+        self.rows_written = 0
+        self.dropped_rows = 0  # Linhas descartadas (fila cheia ou lote que não pôde ser gravado)
+        self.flushes = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._segment_day = None
+        self._segment_size = 0
+        self._thread = None
+        self._closed = False
+        self._error = None
+        self._count_lock = threading.Lock()  # dropped_rows é atualizado pelo loop de amostragem e pela thread de gravação
+        self.metrics.add_collector(lambda: {"rows_written": self.rows_written, "dropped_rows": self.dropped_rows,
+                                            "flushes": self.flushes})
+
+    # 1. Fila de Linhas
+    def start(self):
+        """Repara segmentos interrompidos, cria o primeiro segmento e inicia a thread de gravação."""
+        os.makedirs(self.directory, exist_ok=True)
+        for temp_path in glob.glob(os.path.join(self.directory, f"{self.prefix}*.csv.tmp")):
+            os.remove(temp_path)  # Segmento que não chegou a ser publicado (queda antes do os.replace)
+        for path in glob.glob(os.path.join(self.directory, f"{self.prefix}*.csv")):
+            removed = repair_partial_line(path)
+            if removed:
+                print(f"⚠️ {removed} bytes de uma linha incompleta removidos de {path}.")
+
+        self._open_segment(time.time())
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, row):
+        """Coloca uma linha na fila de gravação. Retorna False se a linha foi descartada."""
+        if self._closed:
+            raise RuntimeError("O gravador já foi fechado.")
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._count_lock:
+                self.dropped_rows += 1
+            return False
+
+    def close(self):
+        """Grava as linhas pendentes, sincroniza o arquivo com o disco e encerra a thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            if self._thread.is_alive():
+                try:
+                    self._queue.put(_CLOSE, timeout=self.close_timeout)
+                except queue.Full:
+                    pass  # A thread não está consumindo a fila: o join abaixo decide
+                self._thread.join(self.close_timeout)
+            if self._thread.is_alive():
+                # Thread travada (ex.: disco sem responder): o arquivo continua com ela, sem fechar por baixo dela
+                print(f"A gravação do CSV não terminou em {self.close_timeout} s; "
+                      f"{self._queue.qsize()} linhas ainda na fila podem não ter sido gravadas.")
+                return
+            self._flush(self._drain_queue())  # Thread encerrada por um erro: grava aqui o que ficou na fila
+        self._close_segment()
+        if self._error is not None:
+            print(f"Erro na gravação do CSV: {self._error}")
+
+    def _drain_queue(self):
+        rows = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                return rows
+            if row is not _CLOSE:
+                rows.append(row)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # 2. Gravação em Lotes
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                row = None
+
+            if row is _CLOSE:
+                break
+            if row is not None:
+                batch.append(row)
+                # Junta ao lote o que já estiver na fila, sem esperar
+                while len(batch) < self.flush_rows:
+                    try:
+                        row = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if row is _CLOSE:
+                        self._flush(batch)
+                        return
+                    batch.append(row)
+
+            if len(batch) >= self.flush_rows or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        self._flush(batch)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        data = buffer.getvalue().encode("utf-8")
+
+        started = time.perf_counter()
+        try:
+            self._rotate_if_needed(time.time(), len(data))
+            self._write_all(data)
+            if self.fsync_mode == "batch":
+                os.fsync(self._file.fileno())
+        except OSError as e:
+            self._error = e
+            with self._count_lock:
+                self.dropped_rows += len(batch)
+            print(f"Erro ao gravar {len(batch)} linhas em {self.current_path}: {e}")
+            self._discard_partial_write()
+            return
+        self.metrics.observe("csv_write", time.perf_counter() - started)
+        self._segment_size += len(data)
+        self.rows_written += len(batch)
+        self.flushes += 1
+
+    def _discard_partial_write(self):
+        """Remove o que um lote com erro chegou a gravar, para o próximo lote não continuar uma linha pela metade."""
+        if self._file is None:
+            return
+        try:
+            self._file.truncate(self._segment_size)
+        except OSError:
+            pass  # Disco indisponível: o erro do lote já foi registrado em self._error
+
+    def _write_all(self, data):
+        """Grava todos os bytes (uma escrita pode gravar só parte deles)."""
+        view = memoryview(data)
+        while view:
+            written = self._file.write(view)
+            view = view[written:]
+
+    # 3. Segmentos
+    def _rotate_if_needed(self, now, incoming_bytes):
+        day = time.strftime("%Y-%m-%d", time.localtime(now))
+        new_day = self.rotation == "daily" and day != self._segment_day
+        too_big = (
+            self.max_bytes is not None
+            and self._segment_size > len(self._header_bytes())
+            and self._segment_size + incoming_bytes > self.max_bytes
+        )
+        if new_day or too_big:
+            self._close_segment()
+            self._open_segment(now)
+
+    def _header_bytes(self):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(self.header)
+        return buffer.getvalue().encode("utf-8")
+
+    def _segment_path(self, now):
+        """
+        Nome do novo segmento pela data e hora; se já existir um segmento no mesmo segundo, acrescenta _001, _002...
+        A ordem alfabética continua sendo a cronológica: "." vem antes de "_", e o número tem sempre 3 dígitos
+        (com "-1" o segmento seguinte ficaria antes do primeiro, pois "-" vem antes de ".").
+        """
+        stamp = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime(now))
+        path = os.path.join(self.directory, f"{self.prefix}{stamp}.csv")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{self.prefix}{stamp}_{suffix:03d}.csv")
+            suffix += 1
+        return path
+
+    def _open_segment(self, now):
+        """Cria o segmento com o cabeçalho em um arquivo temporário e só então o publica com o nome final."""
+        path = self._segment_path(now)
+        header = self._header_bytes()
+        with open(path + ".tmp", "wb") as f:
+            f.write(header)
+            f.flush()
+            if self.fsync_mode != "never":
+                os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        if self.fsync_mode != "never":
+            _fsync_directory(self.directory)
+
+        self._file = open(path, "ab", buffering=0)
+        self.current_path = path
+        self.segments.append(path)
+        self._segment_day = time.strftime("%Y-%m-%d", time.localtime(now))
+        self._segment_size = len(header)
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        if self.fsync_mode != "never":
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+
+_CLOSE = object()  # Marcador na fila para encerrar a thread de gravação
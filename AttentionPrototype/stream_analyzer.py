@@ -0,0 +1,280 @@
+import csv
+import io
+import os
+import pandas as pd
+from attention_rules import (
+    BLOCK_COLUMNS,
+    aggregate_blocks,
+    calculate_sound_impact,
+    classify_blocks,
+    classify_state_vectorized,
+    count_software_rows,
+)
+from preferences import compile_preferences, get_preferences
+from session_io import SESSION_CSV_DTYPES, encode_session_columns
+
+'''
+Análise incremental do CSV gerado em tempo real.
+1.	Leitor que acompanha o final do arquivo RawMultimodalData_*.csv (CsvTailReader).
+2.	Analisador que mantém o bloco de tempo aberto e os últimos blocos, emitindo os blocos finalizados (StreamingAttentionAnalyzer).
+3.	Totais acumulados dos blocos finalizados para os resumos do dashboard ao vivo (StreamingSummary).
+'''
+
+
+# 1. Leitor incremental do CSV
+class CsvTailReader:
+    """Lê apenas as linhas novas de um CSV, lembrando a posição (em bytes) onde a última leitura parou."""
+
+    def __init__(self, file_path, preferences=None):
+        self.file_path = file_path
+        self.preferences = preferences  # Usadas para as categorias de ActiveWindow (ver session_io)
+        self.offset = 0  # Posição em bytes até onde o arquivo já foi lido
+        self.header = None  # Nomes das colunas, lidos na primeira linha do arquivo
+        self.skipped_lines = 0  # Linhas malformadas descartadas (ex.: gravadas pela metade por uma queda do coletor)
+
+    def reset(self):
+        """Volta para o início do arquivo (ex.: quando ele é truncado ou substituído)."""
+        self.offset = 0
+        self.header = None
+
+    def read_new_rows(self, include_partial=False):
+        """
+        Lê as linhas completas adicionadas desde a última chamada.
+        Uma linha ainda sendo escrita (sem quebra de linha no final) fica para a próxima leitura.
+        include_partial: também lê a última linha sem quebra de linha (use apenas quando a coleta já terminou).
+        Retorna: DataFrame com as novas linhas no formato de session_io.read_session_csv (vazio se não houver linhas novas).
+        """
+        if not os.path.exists(self.file_path):
+            return pd.DataFrame()
+
+        # Se o arquivo diminuiu, ele foi recriado: recomeça do início
+        if os.path.getsize(self.file_path) < self.offset:
+            self.reset()
+
+        with open(self.file_path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+
+        if not include_partial:
+            last_newline = chunk.rfind(b"\n")
+            if last_newline < 0:
+                return pd.DataFrame()
+            chunk = chunk[:last_newline + 1]
+        if not chunk.strip():
+            return pd.DataFrame()
+        consumed = len(chunk)
+
+        # A primeira leitura contém o cabeçalho
+        if self.header is None:
+            header_line, _, chunk = chunk.partition(b"\n")
+            self.header = pd.read_csv(io.BytesIO(header_line), nrows=0).columns.to_list()
+            if not chunk:
+                self.offset += consumed
+                return pd.DataFrame()
+
+        data = self._parse_rows(chunk)
+        self.offset += consumed  # Só depois da leitura: um erro inesperado não faz as linhas serem puladas
+        return data
+
+    def _read_chunk(self, chunk):
+        data = pd.read_csv(io.BytesIO(chunk), header=None, names=self.header, dtype=SESSION_CSV_DTYPES, index_col=False)
+        return encode_session_columns(data, self.preferences)
+
+    def _parse_rows(self, chunk):
+        """
+        Converte as linhas lidas em DataFrame. Se o trecho não puder ser lido de uma vez (linha malformada),
+        testa linha por linha e lê de novo só as válidas, descartando e contando as inválidas.
+        """
+        try:
+            return self._read_chunk(chunk)
+        except ValueError as e:  # Inclui pd.errors.ParserError (quantidade de campos) e datas/números inválidos
+            error = e
+
+        valid_lines, skipped = [], 0
+        for line in chunk.splitlines(keepends=True):
+            if not line.strip():
+                continue
+            fields = next(csv.reader([line.decode("utf-8", errors="replace")]), [])
+            try:
+                if len(fields) != len(self.header):
+                    raise ValueError(f"{len(fields)} campos em vez de {len(self.header)}")
+                self._read_chunk(line)
+            except ValueError:
+                skipped += 1
+                continue
+            valid_lines.append(line)
+        self.skipped_lines += skipped
+        print(f"⚠️ {skipped} linha(s) malformada(s) ignorada(s) em {self.file_path}: {error}")
+        if not valid_lines:
+            return pd.DataFrame()
+        return self._read_chunk(b"".join(valid_lines))
+
+
+
+
+# 2. Analisador incremental em blocos de tempo
+class StreamingAttentionAnalyzer:
+    """
+    Analisa o CSV à medida que ele cresce: classifica apenas as linhas novas, mantém o bloco de tempo
+    aberto e os últimos 3 blocos (para a atenção sustentada) e emite cada bloco assim que ele fecha.
+    O resultado é o mesmo de analyze_attention_in_blocks aplicado ao arquivo inteiro.
+    """
+
+    def __init__(self, file_path, interval="30s", switch_threshold=3, preferences=None, interval_seconds=5):
+        self.preferences = compile_preferences(preferences) if preferences is not None else get_preferences()
+        self.reader = CsvTailReader(file_path, self.preferences)
+        self.interval = interval
+        self.step = pd.Timedelta(interval)
+        self.switch_threshold = switch_threshold
+        self.interval_seconds = interval_seconds  # Tempo que cada linha representa (5 segundos)
+
+        self.origin = None  # Meia-noite do primeiro dia (mesma origem do resample)
+        self.open_block_start = None  # Início do bloco de tempo ainda aberto
+        self.open_rows = []  # Linhas do bloco aberto
+        self.previous_blocks = []  # Últimos 3 blocos finalizados
+        self.finalized = []  # Blocos já finalizados
+        self.software_counts = {}  # Quantidade de linhas por software
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        """Registra uma função chamada com o DataFrame dos blocos finalizados sempre que algum bloco fecha."""
+        self.subscribers.append(callback)
+
+    def _block_start(self, timestamp):
+        """Retorna o início do bloco de tempo ao qual o timestamp pertence."""
+        return self.origin + ((timestamp - self.origin) // self.step) * self.step
+
+    def _empty_blocks(self):
+        return pd.DataFrame(columns=BLOCK_COLUMNS + ["Tipo de Atenção"], index=pd.DatetimeIndex([], name="Timestamp"))
+
+    def poll(self, include_partial=False):
+        """
+        Lê as linhas novas do CSV e fecha os blocos que terminaram.
+        include_partial: também lê a última linha sem quebra de linha (ver CsvTailReader.read_new_rows).
+        Retorna: DataFrame com os blocos finalizados nesta chamada (vazio se nenhum bloco fechou).
+        """
+        new_rows = self.reader.read_new_rows(include_partial)
+        if new_rows.empty:
+            return self._empty_blocks()
+
+        new_rows["AttentionState"] = classify_state_vectorized(new_rows, self.preferences)
+        for app, count in count_software_rows(new_rows, sort=False).items():
+            self.software_counts[app] = self.software_counts.get(app, 0) + int(count)
+
+        if self.open_block_start is None:
+            self.origin = new_rows["Timestamp"].min().normalize()
+            self.open_block_start = self._block_start(new_rows["Timestamp"].min())
+        self.open_rows.append(new_rows)
+
+        # Todos os blocos anteriores ao bloco da linha mais recente estão fechados
+        latest_block_start = self._block_start(new_rows["Timestamp"].max())
+        if latest_block_start <= self.open_block_start:
+            return self._empty_blocks()
+        return self._close_blocks(latest_block_start)
+
+    def flush(self):
+        """Lê o que restou do arquivo, fecha o bloco aberto (ex.: no fim da sessão) e retorna os blocos finalizados."""
+        closed = self.poll(include_partial=True)
+        if self.open_block_start is None or not any(len(rows) for rows in self.open_rows):
+            return closed
+        last_blocks = self._close_blocks(self.open_block_start + self.step)
+        return pd.concat([closed, last_blocks]) if len(closed) else last_blocks
+
+    def _close_blocks(self, until):
+        """Agrega, classifica e emite os blocos entre o bloco aberto e until (exclusivo)."""
+        pending = pd.concat(self.open_rows, ignore_index=True)
+        closed = (pending["Timestamp"] < until).to_numpy()
+
+        grouped = aggregate_blocks(pending[closed], self.interval, self.preferences.focus_apps, start=self.open_block_start, end=until)
+        grouped["Tipo de Atenção"] = classify_blocks(grouped, self.switch_threshold, self.previous_blocks, self.preferences)
+
+        self.open_rows = [pending[~closed]]
+        self.open_block_start = until
+        self.finalized.append(grouped)
+
+        for callback in self.subscribers:
+            callback(grouped)
+        return grouped
+
+    def blocks(self, include_open=True):
+        """
+        Retorna todos os blocos analisados até agora.
+        include_open: inclui o bloco ainda aberto, classificado provisoriamente (como faz a análise do arquivo inteiro).
+        """
+        if len(self.finalized) > 1:
+            self.finalized = [pd.concat(self.finalized)]
+        blocks = list(self.finalized)
+
+        if include_open and self.open_block_start is not None and any(len(rows) for rows in self.open_rows):
+            pending = pd.concat(self.open_rows, ignore_index=True)
+            provisional = aggregate_blocks(
+                pending, self.interval, self.preferences.focus_apps,
+                start=self.open_block_start, end=self.open_block_start + self.step
+            )
+            provisional["Tipo de Atenção"] = classify_blocks(provisional, self.switch_threshold, list(self.previous_blocks), self.preferences)
+            blocks.append(provisional)
+
+        if not blocks:
+            return self._empty_blocks()
+        return pd.concat(blocks) if len(blocks) > 1 else blocks[0].copy()
+
+    def software_usage_time(self):
+        """Tempo total de uso de cada software em minutos (mesmo resultado de calculate_software_usage)."""
+        counts = pd.Series(self.software_counts, dtype="int64", name="count").rename_axis("ActiveWindow")
+        counts = counts.sort_values(ascending=False, kind="stable")
+        return ((counts * self.interval_seconds) / 60).round(2)
+
+    def results(self):
+        """Retorna os mesmos 3 DataFrames de process_attention_data, sem reprocessar o arquivo inteiro."""
+        grouped = self.blocks()
+        return grouped, self.software_usage_time(), calculate_sound_impact(grouped)
+
+
+
+
+# 3. Totais Acumulados dos Blocos Finalizados
+class StreamingSummary:
+    """
+    Soma das porcentagens de atenção/distração e, por som predominante, a quantidade de blocos e a soma da distração.
+    Registrada com analyzer.subscribe(summary.add_blocks), é atualizada só com os blocos novos: os resumos
+    (pizza de atenção e impacto do som) não precisam percorrer a sessão inteira a cada atualização.
+    """
+
+    def __init__(self, block_interval_seconds=30):
+        self.block_interval_seconds = block_interval_seconds
+        self.blocks = 0  # Blocos com amostras (divisor das médias)
+        self.attention_sum = 0.0
+        self.distraction_sum = 0.0
+        self.sound_blocks = {}  # Som predominante → quantidade de blocos
+        self.sound_distraction_sum = {}  # Som predominante → soma de "Distraído (%)"
+
+    def add_blocks(self, grouped):
+        if grouped.empty:
+            return
+        self.blocks += int(grouped["Atento (%)"].notna().sum())  # Blocos vazios (sem amostras) ficam de fora das médias
+        self.attention_sum += float(grouped["Atento (%)"].sum())
+        self.distraction_sum += float(grouped["Distraído (%)"].sum())
+
+        relevant = grouped[grouped["Som Predominante"] != "Irrelevante para Análise"]
+        by_sound = relevant.groupby("Som Predominante", observed=True)["Distraído (%)"].agg(["size", "sum"])
+        for sound, (count, distraction) in by_sound.iterrows():
+            self.sound_blocks[sound] = self.sound_blocks.get(sound, 0) + int(count)
+            self.sound_distraction_sum[sound] = self.sound_distraction_sum.get(sound, 0.0) + float(distraction)
+
+    def attention_means(self):
+        """DataFrame de uma linha com a média de "Atento (%)" e "Distraído (%)" (entrada de plot_attention_pie_chart)."""
+        if self.blocks == 0:
+            return pd.DataFrame(columns=["Atento (%)", "Distraído (%)"])
+        return pd.DataFrame({
+            "Atento (%)": [self.attention_sum / self.blocks],
+            "Distraído (%)": [self.distraction_sum / self.blocks],
+        })
+
+    def sound_impact(self):
+        """Mesmo formato de calculate_sound_impact, calculado a partir dos totais."""
+        sounds = sorted(self.sound_blocks, key=lambda sound: -self.sound_blocks[sound])
+        return pd.DataFrame({
+            "Som Predominante": sounds,
+            "Tempo Total do Som (min)": [self.sound_blocks[sound] * self.block_interval_seconds / 60 for sound in sounds],
+            "Distração Média (%)": [self.sound_distraction_sum[sound] / self.sound_blocks[sound] for sound in sounds],
+        })
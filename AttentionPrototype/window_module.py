@@ -1,55 +1,294 @@
-import Quartz  # Biblioteca que fornece acesso a várias APIs de baixo nível do macOS
+import csv
+import json
+import threading
 import time
-import objc  # Biblioteca para interagir com APIs do macOS escritas em Objective-C
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
 from urllib.parse import urlparse  # Biblioteca padrão do Python para análise de URLs
+from metrics import NULL_METRICS
+from session_schema import TIMESTAMP_FORMAT, detect_schema_version
 
+try:
+    import Quartz  # Biblioteca que fornece acesso a várias APIs de baixo nível do macOS
+    import objc  # Biblioteca para interagir com APIs do macOS escritas em Objective-C
+except ImportError:  # Fora do macOS só os provedores de replay ficam disponíveis
+    Quartz = None
+    objc = None
 
-class WindowService:
-    """Classe para gerenciar a captura de informações sobre a janela ativa."""
+'''
+Serviço de janela ativa do coletor.
+1.	Extração do domínio da URL, memorizada por URL (extract_domain).
+2.	Provedores da janela ativa, com a mesma interface active_window() → (aplicativo, domínio):
+        QuartzWindowProvider: macOS, janela em primeiro plano pelo Quartz e URL do Safari por AppleScript
+                              compilado uma única vez;
+        TraceReplayProvider: reproduz uma gravação (JSONL ou CSV de sessão), para testar em qualquer sistema.
+3.	Eventos de troca de foco (WindowFocusChange), emitidos só quando o aplicativo ou o domínio mudam.
+4.	WindowService: consulta o provedor (sob demanda ou numa thread de observação) e mantém o estado atual;
+    get_active_app() continua retornando o dicionário com "Janela Ativa", "URL" e "Timestamp".
+5.	Gravação das trocas de janela em JSONL (FocusTraceWriter, registrado como listener do WindowService),
+	usada pelo coletor e por record_trace; o arquivo pode ser reproduzido com TraceReplayProvider.from_jsonl.
+'''
 
-    def extract_domain(self, url):
-        """ Extrai o domínio principal da URL, removendo subdomínios. """
-        try:
-            parsed_url = urlparse(url)
-            domain_parts = parsed_url.netloc.split(".")
-            if len(domain_parts) > 2:
-                return ".".join(domain_parts[-2:])  # Pega apenas o domínio principal (ex.: google.com)
-            return parsed_url.netloc
-        except Exception:
-            return ""
-    
-    def get_active_app(self):
-        """Obtém o nome do aplicativo ativo e, se for o Safari, também a URL da aba ativa."""
-        
-        # Declarando variáveis locais
-        active_app = None
-        active_url = None
 
-        # Obter o nome do aplicativo ativo
+# 1. Domínio da URL
+@lru_cache(maxsize=1024)
+def extract_domain(url):
+    """ Extrai o domínio principal da URL, removendo subdomínios. """
+    try:
+        parsed_url = urlparse(url)
+        domain_parts = parsed_url.netloc.split(".")
+        if len(domain_parts) > 2:
+            return ".".join(domain_parts[-2:])  # Pega apenas o domínio principal (ex.: google.com)
+        return parsed_url.netloc
+    except Exception:
+        return ""
+
+
+# 2. Provedores da Janela Ativa
+class WindowProvider:
+    """Interface comum dos provedores da janela ativa."""
+
+    def active_window(self):
+        """Retorna (nome do aplicativo ativo, domínio da aba ativa ou None)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# AppleScript para obter a URL da aba ativa no Safari
+SAFARI_URL_SCRIPT = '''
+tell application "Safari"
+    set currentTab to front document
+    return URL of currentTab
+end tell
+'''
+
+
+class QuartzWindowProvider(WindowProvider):
+    """Janela ativa no macOS: primeira janela da camada 0 na lista do Quartz (ordenada da frente para trás)."""
+
+    ignored_apps = ("Finder",)
+
+    def __init__(self):
+        if Quartz is None or objc is None:
+            raise RuntimeError("Quartz/objc não estão disponíveis: o provedor de janelas do macOS não pode ser usado.")
+        self._safari_script = None  # NSAppleScript compilado na primeira vez que o Safari fica ativo
+
+    def frontmost_app(self):
+        """Nome do aplicativo dono da janela em primeiro plano."""
         windows = Quartz.CGWindowListCopyWindowInfo(
             Quartz.kCGWindowListOptionOnScreenOnly | Quartz.kCGWindowListExcludeDesktopElements,
             Quartz.kCGNullWindowID
         )
         for window in windows:
-            if window.get('kCGWindowLayer') == 0 and window.get('kCGWindowOwnerName') != 'Finder':
-                active_app = window.get('kCGWindowOwnerName')
+            if window.get('kCGWindowLayer') == 0 and window.get('kCGWindowOwnerName') not in self.ignored_apps:
+                return window.get('kCGWindowOwnerName')  # A lista vem da frente para trás: a primeira é a ativa
+        return None
 
-        # Obter o URL da aba ativa no Safari
-        if active_app == "Safari":
-            # AppleScript para obter a URL da aba ativa no Safari
-            script = '''
-            tell application "Safari"
-                set currentTab to front document
-                return URL of currentTab
-            end tell
-            '''
-            # Executa o AppleScript usando a biblioteca objc
+    def safari_url(self):
+        """URL completa da aba ativa do Safari (None se não for possível obtê-la)."""
+        if self._safari_script is None:
             apple_script = objc.lookUpClass('NSAppleScript')
-            script_obj = apple_script.alloc().initWithSource_(script)
-            result, _ = script_obj.executeAndReturnError_(None)
-            if result:
-                full_url = result.stringValue()
-                active_url = self.extract_domain(full_url)  # Armazena apenas o domínio
+            script_obj = apple_script.alloc().initWithSource_(SAFARI_URL_SCRIPT)
+            script_obj.compileAndReturnError_(None)
+            self._safari_script = script_obj
+        result, _ = self._safari_script.executeAndReturnError_(None)
+        if result:
+            return result.stringValue()
+        return None
+
+    def active_window(self):
+        active_app = self.frontmost_app()
+        active_url = None
+        if active_app == "Safari":
+            full_url = self.safari_url()
+            if full_url:
+                active_url = extract_domain(full_url)  # Armazena apenas o domínio
+        return active_app, active_url
+
+
+class TraceReplayProvider(WindowProvider):
+    """
+    Reproduz uma gravação de janelas ativas: lista de (segundos desde o início, aplicativo, domínio).
+    speed=None: cada chamada avança uma entrada (o mais rápido possível, para testes e medições);
+    speed=1.0: tempo real (2.0: duas vezes mais rápido...), a partir da primeira chamada.
+    loop=True recomeça do início ao chegar no fim; senão a última entrada permanece ativa.
+    """
+
+    def __init__(self, entries, speed=None, loop=False, clock=time.monotonic):
+        self.entries = sorted(entries, key=lambda entry: entry[0])
+        if not self.entries:
+            raise ValueError("O trace não tem nenhuma entrada.")
+        self.speed = speed
+        self.loop = loop
+        self.clock = clock
+        self.position = 0
+        self._offsets = [entry[0] for entry in self.entries]
+        self._started_at = None
+
+    @property
+    def duration(self):
+        return self.entries[-1][0] - self.entries[0][0]
+
+    @property
+    def finished(self):
+        """True quando uma reprodução passo a passo (speed=None) sem loop já entregou a última entrada."""
+        return not self.loop and self.position >= len(self.entries)
+
+    def _entry_at(self, elapsed):
+        if self.loop and self.duration > 0:
+            elapsed %= self.duration
+        index = bisect_right(self._offsets, elapsed + self.entries[0][0]) - 1
+        self.position = max(index, 0)
+        return self.entries[self.position]
+
+    def active_window(self):
+        if self.speed is None:
+            if self.position >= len(self.entries):
+                if not self.loop:
+                    return self.entries[-1][1:]
+                self.position = 0
+            entry = self.entries[self.position]
+            self.position += 1
+            return entry[1:]
+
+        if self._started_at is None:
+            self._started_at = self.clock()
+        return self._entry_at((self.clock() - self._started_at) * self.speed)[1:]
+
+    @classmethod
+    def from_jsonl(cls, path, **kwargs):
+        """Trace gravado por record_trace: uma linha JSON por troca, com "t", "app" e "url"."""
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    event = json.loads(line)
+                    entries.append((float(event["t"]), event.get("app"), event.get("url")))
+        return cls(entries, **kwargs)
+
+    @classmethod
+    def from_session_csv(cls, path, **kwargs):
+        """Trace a partir das colunas ActiveWindow e URL de um CSV de sessão gravado pelo main.py (esquema 1 ou 2)."""
+        entries = []
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            schema_version = detect_schema_version(reader.fieldnames)
+            for row in reader:
+                if schema_version == 1:
+                    seconds = datetime.strptime(row["Timestamp"], TIMESTAMP_FORMAT).timestamp()
+                else:
+                    seconds = int(row["TimestampMs"]) / 1000
+                entries.append((seconds, row["ActiveWindow"] or None, row["URL"] or None))
+        if entries:
+            start = entries[0][0]
+            entries = [(seconds - start, app, url) for seconds, app, url in entries]
+        return cls(entries, **kwargs)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Escolhe o leitor pela extensão (.csv: sessão; demais: JSONL)."""
+        if str(path).lower().endswith(".csv"):
+            return cls.from_session_csv(path, **kwargs)
+        return cls.from_jsonl(path, **kwargs)
+
+
+def default_window_provider():
+    """Provedor do sistema atual (hoje, apenas macOS)."""
+    return QuartzWindowProvider()
+
+
+# 3. Eventos de Troca de Foco
+class WindowFocusChange:
+    """Troca do aplicativo ou do domínio ativo."""
+
+    __slots__ = ("app", "url", "previous_app", "previous_url", "changed_at", "sequence")
+
+    def __init__(self, app, url, previous_app, previous_url, changed_at, sequence):
+        self.app = app
+        self.url = url
+        self.previous_app = previous_app
+        self.previous_url = previous_url
+        self.changed_at = changed_at  # time.time() da consulta que detectou a troca
+        self.sequence = sequence
+
+    def __repr__(self):
+        return f"WindowFocusChange({self.previous_app!r}/{self.previous_url!r} → {self.app!r}/{self.url!r})"
+
+
+# 4. Serviço de Janela Ativa
+class WindowService:
+    """Classe para gerenciar a captura de informações sobre a janela ativa."""
+
+    def __init__(self, provider=None, history=256, metrics=None):
+        """
+        provider: de onde vem a janela ativa (padrão: Quartz, no macOS).
+        history: quantidade de eventos de troca de foco mantidos em memória.
+        metrics: CollectorMetrics que recebe a duração de cada consulta ao provedor ("window_lookup").
+        """
+        self.provider = provider if provider is not None else default_window_provider()
+        self.events = deque(maxlen=history)
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._current = (None, None)
+        self._sequence = 0
+        self._polled = False
+        self._watcher = None
+        self._stop_event = threading.Event()
+        self.stats = {"polls": 0, "changes": 0}
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.metrics.add_collector(lambda: {f"window_{name}": value for name, value in self.stats.items()})
+
+    def extract_domain(self, url):
+        """ Extrai o domínio principal da URL, removendo subdomínios. """
+        return extract_domain(url)
+
+    def add_listener(self, callback):
+        """Registra uma função chamada com cada WindowFocusChange (na thread que fez a consulta)."""
+        self._listeners.append(callback)
+
+    def poll(self):
+        """Consulta o provedor uma vez. Retorna o WindowFocusChange se a janela mudou, senão None."""
+        with self.metrics.time("window_lookup"):
+            current = tuple(self.provider.active_window())
+        with self._lock:
+            self.stats["polls"] += 1
+            previous = self._current
+            if self._polled and current == previous:
+                return None
+            self._polled = True
+            self._current = current
+            self._sequence += 1
+            self.stats["changes"] += 1
+            event = WindowFocusChange(current[0], current[1], previous[0], previous[1], time.time(), self._sequence)
+            self.events.append(event)
+
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Erro ao notificar troca de janela: {e}")
+        return event
+
+    def events_since(self, sequence):
+        """Eventos com número de sequência maior que `sequence` (ainda mantidos no histórico)."""
+        with self._lock:
+            return [event for event in self.events if event.sequence > sequence]
+
+    @property
+    def current_window(self):
+        """(aplicativo, domínio) da última consulta, sem consultar o provedor."""
+        with self._lock:
+            return self._current
+
+    def get_active_app(self):
+        """Obtém o nome do aplicativo ativo e, se for o Safari, também a URL da aba ativa."""
+        if self._watcher is None:
+            self.poll()  # Sem thread de observação: consulta sob demanda
+        active_app, active_url = self.current_window
 
         # Gerar o timestamp
         timestamp = time.strftime("%H:%M:%S %d/%m/%Y")
@@ -61,3 +300,86 @@ class WindowService:
             "Timestamp": timestamp
         }
 
+    def start_watching(self, interval=5.0):
+        """
+        Consulta o provedor a cada `interval` segundos numa thread, emitindo eventos só nas trocas.
+        Cada consulta ao Quartz (e, com o Safari em primeiro plano, ao AppleScript) tem custo: intervalos menores
+        que o período de amostragem detectam trocas mais cedo, mas consultam o sistema com a mesma frequência.
+        O coletor não usa esta thread: o sensor de janela do SensorPipeline já consulta uma vez por amostra.
+        """
+        if self._watcher is not None:
+            return self
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, args=(interval,), name="window-watcher", daemon=True)
+        self._watcher.start()
+        return self
+
+    def _watch_loop(self, interval):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Erro ao consultar a janela ativa: {e}")
+            self._stop_event.wait(interval)
+
+    def stop(self):
+        """Para a thread de observação e libera o provedor."""
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=2)
+            self._watcher = None
+        self.provider.close()
+
+
+# 5. Gravação de Trace
+class FocusTraceWriter:
+    """
+    Grava cada WindowFocusChange recebido em uma linha JSON: "t" (segundos desde a criação do arquivo),
+    "time" (data e hora da troca, em segundos desde a época), "app" e "url".
+    Uso: window_service.add_listener(FocusTraceWriter(path)). O arquivo é lido por TraceReplayProvider.from_jsonl.
+    """
+
+    def __init__(self, path, mode="w", clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.changes = 0
+        self._started_at = clock()
+        self._file = open(path, mode, encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps({
+            "t": round(self.clock() - self._started_at, 3),
+            "time": round(event.changed_at, 3),
+            "app": event.app,
+            "url": event.url,
+        }, ensure_ascii=False)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()  # Trocas são raras: cada uma vai para o disco logo (sobrevive a uma queda)
+            self.changes += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def record_trace(path, provider=None, duration=60, interval=0.5):
+    """
+    Grava em JSONL as trocas de janela observadas durante `duration` segundos, no formato lido por
+    TraceReplayProvider.from_jsonl. Retorna a quantidade de trocas gravadas.
+    """
+    window_service = WindowService(provider)
+    trace_writer = FocusTraceWriter(path)
+    window_service.add_listener(trace_writer)
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < duration:
+            window_service.poll()
+            time.sleep(interval)
+    finally:
+        window_service.stop()
+        trace_writer.close()
+    return trace_writer.changes
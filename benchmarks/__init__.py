@@ -0,0 +1,15 @@
+import os
+import sys
+
+'''
+Benchmarks dos caminhos críticos da análise de atenção.
+Os módulos do protótipo são importados pelo nome (como o Streamlit faz ao executar dashboard.py),
+então a pasta AttentionPrototype é adicionada ao sys.path aqui.
+'''
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROTOTYPE_DIRECTORY = os.path.join(REPO_ROOT, "AttentionPrototype")
+DATA_DIRECTORY = os.path.join(REPO_ROOT, "data")
+
+if PROTOTYPE_DIRECTORY not in sys.path:
+    sys.path.insert(0, PROTOTYPE_DIRECTORY)
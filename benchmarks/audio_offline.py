@@ -0,0 +1,57 @@
+import argparse
+import json
+import time
+import numpy as np
+import benchmarks  # noqa: F401  (adiciona AttentionPrototype ao sys.path)
+from audio_module import MODEL_SAMPLE_RATE, OfflineAudioClassifier, load_wav
+
+'''
+Medição da classificação de áudio offline (YAMNet em modo de clipes), sem placa de som.
+Reporta janelas/segundo e a distribuição dos grupos de áudio encontrados.
+Uso: python -m benchmarks.audio_offline --wav gravacao.wav --overlap 0.5
+     python -m benchmarks.audio_offline --seconds 600   (ruído branco sintético)
+'''
+
+
+def run_audio_benchmark(samples, sample_rate, overlapping_factor=0.5, repeat=3):
+    """Classifica o áudio `repeat` vezes e retorna o melhor tempo, janelas/segundo e os grupos encontrados."""
+    classifier = OfflineAudioClassifier()
+    try:
+        best, table = float("inf"), None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            table = classifier.classify(samples, sample_rate, overlapping_factor)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        classifier.close()
+
+    return {
+        "audio_seconds": round(len(samples) / sample_rate, 2),
+        "windows": len(table),
+        "overlapping_factor": overlapping_factor,
+        "seconds": round(best, 4),
+        "windows_per_sec": round(len(table) / best, 1) if best > 0 else None,
+        "groups": table["AudioGroup"].value_counts().to_dict(),
+    }
+
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede janelas/segundo da classificação de áudio offline.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--wav", default=None, help="Arquivo WAV (se não informado, usa ruído branco sintético).")
+    parser.add_argument("--seconds", type=float, default=300, help="Duração do ruído sintético.")
+    parser.add_argument("--overlap", type=float, default=0.5, help="Sobreposição entre janelas, em [0, 1).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições (vale o melhor tempo).")
+    args = parser.parse_args()
+
+    if args.wav:
+        samples, sample_rate = load_wav(args.wav)
+    else:
+        sample_rate = MODEL_SAMPLE_RATE
+        samples = np.random.default_rng(0).normal(0, 0.1, int(args.seconds * sample_rate)).astype(np.float32)
+
+    print(json.dumps(run_audio_benchmark(samples, sample_rate, args.overlap, args.repeat), ensure_ascii=False, indent=2))
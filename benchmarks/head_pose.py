@@ -0,0 +1,123 @@
+import argparse
+import json
+import time
+from collections import Counter
+import numpy as np
+import benchmarks  # noqa: F401  (adiciona AttentionPrototype ao sys.path)
+from frame_sources import ArraySource, open_frame_source
+from head_module import HeadService
+
+'''
+Medição da estimativa de pose da cabeça sobre uma fonte de frames (vídeo, pasta de imagens, câmera ou ruído).
+Para cada frame mede as etapas separadamente:
+    decode: leitura/decodificação do frame (FrameSource.read);
+    mesh:   preparação da imagem + Face Mesh (HeadService.detect_landmarks);
+    pnp:    marcos → ângulos → posição (HeadService.solve_head_pose), só quando há rosto.
+Um erro em um frame (ex.: na decodificação ou no PnP) é contado e registrado no resultado ("errors"),
+sem interromper a medição dos demais frames.
+Uso: python -m benchmarks.head_pose --source gravacao.mp4 --inference-width 320 --output head_pose.json
+'''
+
+
+MAX_ERROR_MESSAGES = 5  # Mensagens de erro guardadas no resultado (as demais só entram na contagem)
+
+
+def _latency_summary(samples):
+    """Média, mediana e percentil 95 (em milissegundos) de uma lista de durações em segundos."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+    }
+
+
+def run_head_pose_benchmark(source, max_frames=None, inference_width=None, warmup=5):
+    """
+    Processa os frames da fonte o mais rápido possível e mede o tempo de cada etapa.
+    warmup: frames iniciais processados mas não medidos (carregamento do modelo, caches).
+    Retorna: dict com frames/segundo, latência por etapa, distribuição das posições detectadas
+    e os erros por frame (quantidade por tipo e as primeiras mensagens).
+    """
+    head_service = HeadService(inference_width=inference_width, frame_source=source)
+    timings = {"decode": [], "mesh": [], "pnp": []}
+    poses = Counter()
+    errors = Counter()
+    error_messages = []
+    processed = 0
+    measured = 0
+    total_time = 0.0
+
+    try:
+        while max_frames is None or processed < max_frames + warmup:
+            started = time.perf_counter()
+            success, image = head_service.cap.read()
+            decoded = time.perf_counter()
+            if not success:
+                break
+
+            try:
+                img_h, img_w = image.shape[:2]
+                landmarks = head_service.detect_landmarks(image)
+                meshed = time.perf_counter()
+                pose = "Sem Detecção de Rosto" if landmarks is None else head_service.solve_head_pose(landmarks, img_h, img_w)
+                finished = time.perf_counter()
+            except Exception as e:  # Um frame com erro não interrompe a medição
+                processed += 1
+                errors[type(e).__name__] += 1
+                if len(error_messages) < MAX_ERROR_MESSAGES:
+                    error_messages.append(f"frame {processed}: {type(e).__name__}: {e}")
+                continue
+
+            processed += 1
+            if processed <= warmup:
+                continue
+            timings["decode"].append(decoded - started)
+            timings["mesh"].append(meshed - decoded)
+            if landmarks is not None:
+                timings["pnp"].append(finished - meshed)
+            total_time += finished - started
+            poses[pose] += 1
+            measured += 1
+    finally:
+        head_service.stop()
+
+    return {
+        "frames": measured,
+        "errors": {"count": sum(errors.values()), "by_type": dict(errors), "messages": error_messages},
+        "inference_width": inference_width,
+        "fps": round(measured / total_time, 2) if total_time > 0 else None,
+        "latency": {stage: _latency_summary(samples) for stage, samples in timings.items()},
+        "poses": dict(poses.most_common()),
+    }
+
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede frames/segundo e a latência de cada etapa da estimativa de pose da cabeça.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--source", default="noise", help="Vídeo, pasta de imagens, índice da câmera ou 'noise' (frames aleatórios).")
+    parser.add_argument("--frames", type=int, default=None, help="Quantidade máxima de frames medidos (padrão: a fonte inteira; 300 para 'noise').")
+    parser.add_argument("--inference-width", type=int, default=None, help="Largura usada no Face Mesh (padrão: resolução original).")
+    parser.add_argument("--warmup", type=int, default=5, help="Frames iniciais não medidos.")
+    parser.add_argument("--output", default=None, help="Arquivo JSON para salvar o resultado.")
+    args = parser.parse_args()
+
+    if args.source == "noise":
+        frames = args.frames or 300
+        source = ArraySource.noise(frames + args.warmup)
+    else:
+        frames = args.frames
+        source = open_frame_source(args.source)
+
+    result = run_head_pose_benchmark(source, frames, args.inference_width, args.warmup)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
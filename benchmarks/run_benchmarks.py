@@ -0,0 +1,180 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks import PROTOTYPE_DIRECTORY
+from benchmarks.synthetic import SessionCalibration, generate_session
+from attention_rules import (
+    analyze_attention_in_blocks,
+    calculate_software_usage,
+    calculate_sound_impact,
+    classify_state,
+    classify_state_vectorized,
+    count_software_switches,
+)
+from preferences import compile_preferences, load_user_preferences
+
+'''
+Benchmarks dos caminhos críticos da análise de atenção, sobre sessões sintéticas (benchmarks/synthetic.py).
+1.	Casos medidos: classificação de estados, blocos de tempo, trocas e uso dos softwares,
+	impacto do som e os gráficos do dashboard.
+2.	Medição: melhor tempo entre N repetições e pico de memória (tracemalloc, em uma execução separada).
+3.	Relatório em JSON com linhas/segundo de cada caso e tamanho de sessão.
+Uso: python -m benchmarks.run_benchmarks --sizes 1000 10000 100000 --output bench_results.json
+'''
+
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+ROW_WISE_MAX_ROWS = 100_000  # classify_state linha a linha fica impraticável acima disso
+PREFERENCES_PATH = os.path.join(PROTOTYPE_DIRECTORY, "user_preferences.json")
+
+# Os gráficos dependem do Streamlit e do Plotly, que podem não estar instalados na máquina de benchmark
+try:
+    from dashboard import plot_attention_pie_chart, plot_attention_timeline, plot_most_used_software, plot_sound_impact_chart
+except ImportError as e:
+    plot_attention_pie_chart = plot_attention_timeline = plot_most_used_software = plot_sound_impact_chart = None
+    FIGURES_UNAVAILABLE = str(e)
+else:
+    FIGURES_UNAVAILABLE = None
+
+
+# 1. Casos Medidos
+def build_cases(data, preferences):
+    """
+    Monta os casos de benchmark para uma sessão.
+    Cada caso é (nome, preparar, executar): preparar() gera os argumentos fora da medição
+    e executar(*argumentos) é a chamada medida. Retorna também o motivo de casos pulados.
+    """
+    grouped = analyze_attention_in_blocks(data.copy(), preferences=preferences)
+    software_usage_time = calculate_software_usage(data)
+    sound_impact_data = calculate_sound_impact(grouped)
+    focus_apps = preferences.focus_apps
+
+    cases = [
+        ("classify_state_vectorized", lambda: (data, preferences), classify_state_vectorized),
+        ("analyze_attention_in_blocks", lambda: (data.copy(), "30s", 3, preferences), analyze_attention_in_blocks),
+        ("count_software_switches", lambda: (data, focus_apps), count_software_switches),
+        ("calculate_software_usage", lambda: (data,), calculate_software_usage),
+        ("calculate_sound_impact", lambda: (grouped,), calculate_sound_impact),
+    ]
+    skipped = {}
+
+    if len(data) <= ROW_WISE_MAX_ROWS:
+        cases.append(("classify_state", lambda: (data,), lambda rows: rows.apply(classify_state, axis=1, preferences=preferences)))
+    else:
+        skipped["classify_state"] = f"sessão maior que {ROW_WISE_MAX_ROWS} linhas"
+
+    figure_cases = [
+        ("plot_attention_timeline", lambda: (grouped,), plot_attention_timeline),
+        ("plot_most_used_software", lambda: (software_usage_time,), plot_most_used_software),
+        ("plot_attention_pie_chart", lambda: (grouped,), plot_attention_pie_chart),
+        ("plot_sound_impact_chart", lambda: (sound_impact_data,), plot_sound_impact_chart),
+    ]
+    for name, prepare, run in figure_cases:
+        if FIGURES_UNAVAILABLE is None:
+            cases.append((name, prepare, run))
+        else:
+            skipped[name] = f"dependência ausente: {FIGURES_UNAVAILABLE}"
+
+    return cases, skipped
+
+
+# 2. Medição
+def time_case(prepare, run, repeat):
+    """Melhor tempo (em segundos) entre `repeat` execuções; a preparação dos argumentos não entra na medição."""
+    best = float("inf")
+    for _ in range(repeat):
+        args = prepare()
+        start = time.perf_counter()
+        run(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory_case(prepare, run):
+    """Pico de memória alocada (em bytes) durante uma execução, medido à parte para não distorcer o tempo."""
+    args = prepare()
+    tracemalloc.start()
+    try:
+        run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+# 3. Execução e Relatório
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3, seed=0, measure_memory=True):
+    """
+    Executa todos os casos para cada tamanho de sessão.
+    Retorna: lista de resultados (um dict por caso e tamanho).
+    """
+    calibration = SessionCalibration.from_directory()
+    preferences = compile_preferences(load_user_preferences(PREFERENCES_PATH))
+    results = []
+
+    for n_rows in sizes:
+        data = generate_session(n_rows, calibration, seed=seed)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            cases, skipped = build_cases(data, preferences)
+
+        for name, prepare, run in cases:
+            # As mensagens de DEBUG da análise iriam misturar-se ao relatório
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                seconds = time_case(prepare, run, repeat)
+                peak = peak_memory_case(prepare, run) if measure_memory else None
+            result = {
+                "benchmark": name,
+                "rows": n_rows,
+                "status": "ok",
+                "seconds": round(seconds, 6),
+                "rows_per_sec": round(n_rows / seconds, 1) if seconds > 0 else None,
+                "peak_memory_mb": round(peak / 2**20, 3) if peak is not None else None,
+            }
+            results.append(result)
+            print(f"{name:<30} {n_rows:>10} linhas  {seconds:>9.4f} s  "
+                  f"{result['rows_per_sec'] or 0:>14,.0f} linhas/s  {result['peak_memory_mb'] or 0:>9.1f} MB")
+
+        for name, reason in skipped.items():
+            results.append({"benchmark": name, "rows": n_rows, "status": "skipped", "reason": reason})
+            print(f"{name:<30} {n_rows:>10} linhas  pulado ({reason})")
+
+    return results
+
+
+def save_report(results, output_path):
+    """Grava os resultados em JSON, junto com as versões usadas, para comparar execuções."""
+    report = {
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "results": results,
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Resultados salvos em {output_path}.")
+
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede os caminhos críticos da análise de atenção em sessões sintéticas.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Quantidades de linhas das sessões geradas.")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições de cada caso (vale o melhor tempo).")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do gerador de sessões.")
+    parser.add_argument("--no-memory", action="store_true", help="Não mede o pico de memória (mais rápido).")
+    parser.add_argument("--output", default="bench_results.json", help="Arquivo JSON com os resultados.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeat, args.seed, measure_memory=not args.no_memory)
+    save_report(results, args.output)
@@ -0,0 +1,162 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from benchmarks import DATA_DIRECTORY
+from session_io import parse_v1_timestamps, parse_v2_timestamps
+from session_schema import SESSION_HEADERS, TIMESTAMP_FORMAT, detect_schema_version
+
+'''
+Gerador de sessões sintéticas calibrado nos CSVs de exemplo da pasta data/.
+A calibração aprende, a partir das sessões reais:
+    - a distribuição de cada coluna categórica (janela ativa + URL, posição da cabeça e classe de áudio);
+    - quanto tempo (em linhas) cada valor costuma se repetir antes de mudar (comprimento das sequências);
+    - a distribuição do AudioScore de cada grupo de áudio;
+    - o intervalo entre amostras consecutivas (5 ou 6 segundos).
+A geração é vetorizada e produz de mil a dezenas de milhões de linhas com o mesmo esquema do main.py.
+'''
+
+
+def _run_lengths(values):
+    """Retorna os valores de cada sequência de repetições e o comprimento dessas sequências."""
+    values = np.asarray(values, dtype=object)
+    if len(values) == 0:
+        return values, np.array([], dtype=np.int64)
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = values[1:] != values[:-1]
+    start_positions = np.flatnonzero(starts)
+    lengths = np.diff(np.append(start_positions, len(values)))
+    return values[start_positions], lengths
+
+
+class SessionCalibration:
+    """Distribuições aprendidas das sessões reais, usadas pelo gerador."""
+
+    def __init__(self, csv_paths):
+        sessions = [pd.read_csv(path) for path in csv_paths]
+        if not sessions:
+            raise ValueError("Nenhuma sessão encontrada para calibrar o gerador.")
+
+        for session in sessions:
+            session["URL"] = session["URL"].fillna("")
+            session["Window"] = session["ActiveWindow"].astype(str) + "\t" + session["URL"]
+
+        # Para cada coluna: valores das sequências e seus comprimentos, somando todas as sessões
+        self.runs = {}
+        for column in ("Window", "HeadPose", "AudioClass"):
+            run_values, run_lengths = [], []
+            for session in sessions:
+                values, lengths = _run_lengths(session[column].to_numpy())
+                run_values.append(values)
+                run_lengths.append(lengths)
+            self.runs[column] = (np.concatenate(run_values), np.concatenate(run_lengths))
+
+        # Grupo e scores observados para cada classe de áudio
+        all_rows = pd.concat(sessions, ignore_index=True)
+        self.audio_group = all_rows.groupby("AudioClass")["AudioGroup"].agg(lambda groups: groups.mode()[0]).to_dict()
+        self.audio_scores = {
+            group: scores.to_numpy(dtype=np.float32)
+            for group, scores in all_rows.groupby("AudioGroup")["AudioScore"]
+        }
+
+        # Intervalos entre amostras consecutivas (em segundos)
+        steps = []
+        for session in sessions:
+            if detect_schema_version(session.columns) == 2:
+                timestamps = parse_v2_timestamps(session["TimestampMs"], session.get("TZ"))
+            else:
+                timestamps = parse_v1_timestamps(session["Timestamp"])
+            steps.append(np.diff(timestamps).astype("timedelta64[s]").astype(np.int64))
+        self.steps = np.concatenate(steps).astype(np.int64)
+
+    @classmethod
+    def from_directory(cls, data_directory=DATA_DIRECTORY):
+        """Calibra o gerador com todos os RawMultimodalData_*.csv da pasta."""
+        return cls(sorted(glob.glob(os.path.join(data_directory, "RawMultimodalData_*.csv"))))
+
+
+def _sample_runs(rng, run_values, run_lengths, n_rows):
+    """Sorteia sequências (valor + comprimento) observadas até completar n_rows linhas."""
+    estimated_runs = int(n_rows / max(run_lengths.mean(), 1) * 1.2) + 16
+    picks = rng.integers(0, len(run_values), size=estimated_runs)
+    lengths = run_lengths[picks]
+    while lengths.sum() < n_rows:
+        extra = rng.integers(0, len(run_values), size=estimated_runs)
+        picks = np.concatenate([picks, extra])
+        lengths = run_lengths[picks]
+
+    # Trabalha com códigos inteiros para não criar milhões de objetos Python
+    categories, codes = np.unique(run_values, return_inverse=True)
+    return pd.Categorical.from_codes(np.repeat(codes[picks], lengths)[:n_rows], categories=categories)
+
+
+def _recode(values, labels):
+    """
+    Troca as categorias de um Categorical por novos rótulos (que podem se repetir), sem passar por objetos Python.
+    Rótulos vazios viram valores ausentes.
+    """
+    categories, label_codes = np.unique(np.asarray(labels, dtype=object), return_inverse=True)
+    if "" in categories:
+        empty_code = int(np.flatnonzero(categories == "")[0])
+        label_codes = np.where(label_codes == empty_code, -1, label_codes - (label_codes > empty_code))
+        categories = np.delete(categories, empty_code)
+    return pd.Categorical.from_codes(label_codes[values.codes], categories=categories)
+
+
+def generate_session(n_rows, calibration=None, seed=0, start="2025-02-17 08:00:00"):
+    """
+    Gera uma sessão sintética com n_rows linhas no formato do CSV gravado pelo main.py.
+    calibration: SessionCalibration (se não informada, é calculada a partir da pasta data/).
+    Retorna: DataFrame com Timestamp já convertido e as colunas de texto como categóricas.
+    """
+    calibration = calibration if calibration is not None else SessionCalibration.from_directory()
+    rng = np.random.default_rng(seed)
+
+    window = _sample_runs(rng, *calibration.runs["Window"], n_rows)
+    head_pose = _sample_runs(rng, *calibration.runs["HeadPose"], n_rows)
+    audio_class = _sample_runs(rng, *calibration.runs["AudioClass"], n_rows)
+
+    # Janela ativa e URL foram sorteadas juntas (a URL só existe quando o Safari está ativo)
+    window_parts = [value.split("\t", 1) for value in window.categories]
+    active_window = _recode(window, [part[0] for part in window_parts])
+    urls = _recode(window, [part[1] for part in window_parts])
+
+    # Grupo de áudio da classe sorteada e score sorteado entre os observados para esse grupo
+    group_of_class = np.array([calibration.audio_group[value] for value in audio_class.categories], dtype=object)
+    audio_group = _recode(audio_class, group_of_class)
+    audio_score = np.empty(n_rows, dtype=np.float32)
+    for group_code, group in enumerate(audio_group.categories):
+        rows = audio_group.codes == group_code
+        audio_score[rows] = rng.choice(calibration.audio_scores[group], size=int(rows.sum()))
+
+    steps = rng.choice(calibration.steps, size=n_rows)
+    steps[0] = 0
+    timestamps = pd.Timestamp(start) + pd.to_timedelta(np.cumsum(steps), unit="s")
+
+    return pd.DataFrame({
+        "Timestamp": timestamps,
+        "AudioClass": audio_class,
+        "AudioScore": audio_score,
+        "AudioGroup": audio_group,
+        "ActiveWindow": active_window,
+        "URL": urls,
+        "HeadPose": head_pose,
+    })
+
+
+def write_session_csv(path, n_rows, calibration=None, seed=0, schema_version=1, tz="-03:00"):
+    """
+    Gera uma sessão sintética e a grava no mesmo formato de RawMultimodalData_*.csv.
+    schema_version: 1 (Timestamp em texto) ou 2 (TimestampMs em UTC + TZ, usando o deslocamento tz).
+    """
+    data = generate_session(n_rows, calibration, seed)
+    if schema_version == 2:
+        sign = -1 if tz.startswith("-") else 1
+        hours, minutes = tz.lstrip("+-").split(":")
+        offset = pd.Timedelta(hours=int(hours), minutes=int(minutes)) * sign
+        data["TimestampMs"] = (data["Timestamp"] - offset).to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        data["TZ"] = tz
+    else:
+        data["Timestamp"] = data["Timestamp"].dt.strftime(TIMESTAMP_FORMAT)
+    data[SESSION_HEADERS[schema_version]].to_csv(path, index=False)
+    return path
@@ -0,0 +1,63 @@
+import argparse
+import glob
+import json
+import os
+import time
+import numpy as np
+from benchmarks import DATA_DIRECTORY
+from window_module import TraceReplayProvider, WindowService
+
+'''
+Medição do tratamento de trocas de janela sem macOS, reproduzindo gravações com o TraceReplayProvider.
+As gravações podem ser CSVs de sessão (colunas ActiveWindow e URL) ou traces JSONL gravados por record_trace.
+Cada entrada da gravação é consultada uma vez (o mais rápido possível) e o relatório mostra:
+    consultas e trocas de foco detectadas (eventos), ou seja, quantas linhas mudariam de fato;
+    custo por consulta do WindowService (provedor + detecção de troca + notificação).
+Uso: python -m benchmarks.window_switches --trace data/RawMultimodalData_2025-02-16_10-03-40.csv
+     python -m benchmarks.window_switches   (todas as sessões da pasta data/)
+'''
+
+
+def run_window_benchmark(trace_paths, repeat=3):
+    """Reproduz cada gravação `repeat` vezes e retorna consultas, trocas detectadas e o custo por consulta."""
+    polls, changes, best_times = 0, 0, []
+    for path in trace_paths:
+        best = float("inf")
+        for _ in range(repeat):
+            provider = TraceReplayProvider.from_file(path)
+            window_service = WindowService(provider, history=1)
+            window_service.add_listener(lambda change: None)
+            started = time.perf_counter()
+            while not provider.finished:
+                window_service.poll()
+            best = min(best, time.perf_counter() - started)
+        polls += window_service.stats["polls"]
+        changes += window_service.stats["changes"]
+        best_times.append(best)
+
+    total_time = float(np.sum(best_times))
+    return {
+        "traces": len(trace_paths),
+        "polls": polls,
+        "focus_changes": changes,
+        "changes_per_poll": round(changes / polls, 4) if polls else None,
+        "us_per_poll": round(total_time / polls * 1e6, 3) if polls else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede a detecção de trocas de janela reproduzindo gravações (CSV de sessão ou JSONL).",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--trace", nargs="*", default=None, help="Gravações a reproduzir (padrão: CSVs da pasta data/).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições de cada gravação (vale o melhor tempo).")
+    parser.add_argument("--output", default=None, help="Arquivo JSON para salvar o resultado.")
+    args = parser.parse_args()
+
+    trace_paths = args.trace or sorted(glob.glob(os.path.join(DATA_DIRECTORY, "RawMultimodalData_*.csv")))
+    result = run_window_benchmark(trace_paths, args.repeat)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)